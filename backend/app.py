@@ -59,10 +59,22 @@ app.register_blueprint(wc_bp, url_prefix='/api')
 from routers.report_routes import report_bp
 app.register_blueprint(report_bp, url_prefix='/api')
 
+# Register MRP routes
+from routers.mrp_routes import mrp_bp
+app.register_blueprint(mrp_bp, url_prefix='/api')
+
+# Register server-sent event stream
+from routers.event_routes import event_bp
+app.register_blueprint(event_bp, url_prefix='/api')
+
 # Initialize error handlers
 from middlewares.error_handler import init_error_handlers
 init_error_handlers(app)
 
+# Register CLI commands (flask <command>)
+from commands import init_commands
+init_commands(app)
+
 # MongoDB doesn't need table creation like SQLAlchemy
 # Collections are created automatically when first used
 
@@ -0,0 +1,122 @@
+import click
+from datetime import datetime
+
+def init_commands(app):
+    @app.cli.command('backfill-production-stats')
+    @click.option('--start', default=None, help='First day to rebuild (YYYY-MM-DD); defaults to all history')
+    @click.option('--end', default=None, help='Last day to rebuild (YYYY-MM-DD); defaults to all history')
+    def backfill_production_stats(start, end):
+        """Rebuild the daily production rollups from MO and WO history"""
+        from models.production_stats_model import DailyProductionStats
+        start_date = datetime.fromisoformat(start) if start else None
+        end_date = datetime.fromisoformat(end) if end else None
+        DailyProductionStats.rebuild(start_date, end_date)
+        click.echo('Daily production stats rebuilt')
+
+    @app.cli.command('backfill-stock-usage')
+    @click.option('--start', default=None, help='First month to rebuild (YYYY-MM-DD); defaults to all history')
+    @click.option('--end', default=None, help='Last month to rebuild (YYYY-MM-DD); defaults to all history')
+    def backfill_stock_usage(start, end):
+        """Rebuild the monthly stock usage rollup from the stock ledger"""
+        from models.stock_ledger_model import StockLedger
+        start_date = datetime.fromisoformat(start) if start else None
+        end_date = datetime.fromisoformat(end) if end else None
+        StockLedger.rebuild_monthly_usage(start_date, end_date)
+        click.echo('Monthly stock usage rebuilt')
+
+    @app.cli.command('rebuild-stock-balances')
+    def rebuild_stock_balances():
+        """Recompute the per-product stock balance counters from the stock ledger"""
+        from models.stock_ledger_model import StockLedger
+        StockLedger.rebuild_balances()
+        click.echo('Stock balance counters rebuilt')
+
+    @app.cli.command('backfill-oee')
+    @click.option('--start', default=None, help='First production day to rebuild (YYYY-MM-DD); defaults to all history')
+    @click.option('--end', default=None, help='Last production day to rebuild (YYYY-MM-DD); defaults to all history')
+    def backfill_oee(start, end):
+        """Rebuild the per-shift work center OEE rollup from WO and MO history"""
+        from models.oee_model import WorkCenterOEE, production_day
+        start_date = datetime.fromisoformat(start) if start else None
+        end_date = datetime.fromisoformat(end) if end else None
+        WorkCenterOEE.rebuild(start_date, end_date, final_before=production_day(datetime.utcnow()))
+        click.echo('Work center OEE rollup rebuilt')
+
+    @app.cli.command('migrate-entry-buckets')
+    def migrate_entry_buckets():
+        """Move embedded MO/WO history arrays into their bucket collections"""
+        from database import mongo
+        from models.entry_bucket_model import mo_history, wo_history
+        mos = mo_history.migrate(mongo.db.manufacturing_orders, ['material_consumptions', 'quality_checks'])
+        # Work orders already point at their MO, so the ID array is just dropped
+        mongo.db.manufacturing_orders.update_many({'work_orders': {'$exists': True}}, {'$unset': {'work_orders': ''}})
+        wos = wo_history.migrate(mongo.db.work_orders, ['materials_consumed', 'time_logs'])
+        click.echo(f'Migrated history of {mos} manufacturing orders and {wos} work orders')
+
+    @app.cli.command('backfill-wo-queue-fields')
+    def backfill_wo_queue_fields():
+        """Set priority_rank and the MO deadline on work orders created before the claim queue"""
+        from database import mongo, bump_version
+        from models.work_order import NO_DEADLINE
+        list(mongo.db.work_orders.aggregate([
+            {'$match': {'$or': [{'priority_rank': {'$exists': False}}, {'deadline': None}]}},
+            {'$lookup': {
+                'from': 'manufacturing_orders',
+                'localField': 'mo_id',
+                'foreignField': '_id',
+                'as': 'mo'
+            }},
+            {'$project': {
+                'priority_rank': {'$switch': {
+                    'branches': [
+                        {'case': {'$eq': ['$priority', 'high']}, 'then': 0},
+                        {'case': {'$eq': ['$priority', 'low']}, 'then': 2}
+                    ],
+                    'default': 1
+                }},
+                'deadline': {'$ifNull': [{'$arrayElemAt': ['$mo.deadline', 0]}, NO_DEADLINE]}
+            }},
+            {'$merge': {'into': 'work_orders', 'on': '_id', 'whenMatched': 'merge', 'whenNotMatched': 'discard'}}
+        ]))
+        bump_version('work_orders')
+        click.echo('Work order queue fields backfilled')
+
+    @app.cli.command('mrp-run')
+    @click.option('--bucket', default='week', show_default=True, type=click.Choice(['day', 'week', 'month']), help='Planning period size')
+    @click.option('--output', default=None, type=click.Path(dir_okay=False, writable=True), help='Write the full result as JSON to this file')
+    def mrp_run(bucket, output):
+        """Net material requirements across all open manufacturing orders"""
+        import json
+        import time
+        from services.mrp_service import run_mrp
+        started = time.perf_counter()
+        result = run_mrp(bucket=bucket)
+        elapsed = time.perf_counter() - started
+        if output:
+            with open(output, 'w') as f:
+                json.dump(result, f, indent=2, default=str)
+        shortages = [product for product in result['products'] if product['shortage'] > 0]
+        click.echo(f"{result['mo_count']} open MOs, {len(result['products'])} materials, "
+                   f"{len(shortages)} short ({elapsed:.2f}s)")
+        for product in shortages:
+            click.echo(f"  {product['name'] or product['product_id']}: short {product['shortage']:g} {product['unit'] or ''}")
+        for bom_id, error in result['errors'].items():
+            click.echo(f'  BOM {bom_id} skipped: {error}', err=True)
+
+    @app.cli.command('schedule-work-orders')
+    def schedule_work_orders():
+        """Plan all open work orders against finite work center capacity"""
+        import time
+        from services.scheduling_service import schedule_all
+        started = time.perf_counter()
+        scheduled, changed = schedule_all()
+        click.echo(f'{scheduled} work orders scheduled, {changed} changed ({time.perf_counter() - started:.2f}s)')
+
+    @app.cli.command('report-worker')
+    @click.option('--concurrency', default=2, show_default=True, help='Number of jobs processed in parallel')
+    @click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to wait when the queue is empty')
+    def report_worker(concurrency, poll_interval):
+        """Process queued report jobs until interrupted"""
+        from services.report_job_service import run_worker
+        click.echo(f'Report worker started with {concurrency} threads')
+        run_worker(app, concurrency, poll_interval)
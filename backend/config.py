@@ -13,4 +13,27 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_USERNAME')
-    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/odoo_manufacturing')
\ No newline at end of file
+    MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/odoo_manufacturing')
+    # Async report jobs: how long a finished report is reused, and how many
+    # threads run jobs inside the web process (0 when using `flask report-worker`)
+    REPORT_JOB_TTL_SECONDS = int(os.getenv('REPORT_JOB_TTL_SECONDS') or 900)
+    REPORT_JOB_INLINE_WORKERS = int(os.getenv('REPORT_JOB_INLINE_WORKERS') or 2)
+    # Report result cache: shared Redis backend if a URL is given, otherwise
+    # an in-process LRU. Entries also go stale as soon as their data changes.
+    REPORT_CACHE_URL = os.getenv('REPORT_CACHE_URL')
+    REPORT_CACHE_MAX_ENTRIES = int(os.getenv('REPORT_CACHE_MAX_ENTRIES') or 256)
+    REPORT_CACHE_TTL_SECONDS = int(os.getenv('REPORT_CACHE_TTL_SECONDS') or 300)
+
+    # Read whole months of the inventory usage report from the monthly rollup.
+    # Run `flask backfill-stock-usage` once before turning this on.
+    STOCK_USAGE_ROLLUP = os.getenv('STOCK_USAGE_ROLLUP') == 'True'
+    # Lifetime of the token that opens an event stream; it travels in the
+    # URL, so it is scoped to the stream and kept short
+    STREAM_TOKEN_SECONDS = int(os.getenv('STREAM_TOKEN_SECONDS') or 60)
+    # OEE shift calendar: the production day starts at OEE_DAY_START_HOUR (UTC)
+    # and is split into OEE_SHIFTS_PER_DAY shifts of OEE_SHIFT_HOURS each
+    OEE_DAY_START_HOUR = int(os.getenv('OEE_DAY_START_HOUR') or 6)
+    OEE_SHIFTS_PER_DAY = int(os.getenv('OEE_SHIFTS_PER_DAY') or 3)
+    OEE_SHIFT_HOURS = float(os.getenv('OEE_SHIFT_HOURS') or 8)
+    # The current production day's OEE rows are rebuilt on read at most this often
+    OEE_REFRESH_SECONDS = int(os.getenv('OEE_REFRESH_SECONDS') or 300)
@@ -1,7 +1,9 @@
 from flask import jsonify, request, render_template
 from models.bom_model import BOM, BOMItem, BOMOperation
 from models.product_model import Product
-from models.work_center import WorkCenter
+from services.bom_service import expand_bom, create_bom_document
+from services.bom_explosion_service import explode, requirement_rows, BOMCycleError
+from utils.pagination import get_page_args, cursor_headers
 
 def render_bom_create_page():
     return render_template('bom_create.html')
@@ -19,83 +21,41 @@ def create_bom():
     if BOM.find_by_bom_id(bom_id):
         return jsonify({'error': 'BOM ID already exists'}), 400
 
-    bom_obj = BOM.create(
-        bom_id=bom_id,
-        product_name=data['product_name']
-    )
-
-    for item in data['items']:
-        raw_material_name = item['raw_material']['name']
-        quantity = item['quantity']
-        unit = item['unit']
-
-        raw_material = Product.find_by_name_and_type(raw_material_name, 'raw')
-        if not raw_material:
-            raw_material_data = {
-                'name': raw_material_name,
-                'description': f'Raw material {raw_material_name}',
-                'type': 'raw_material',
-                'unit_of_measurement': unit,
-                'current_stock_level': 0
-            }
-            raw_material = Product.create(raw_material_data)
-
-        bom_obj.add_item(raw_material.to_dict()['id'], quantity, unit)
-
-    for operation in data['operations']:
-        operation_name = operation['operation_name']
-        work_center_name = operation['work_center']['name']
-        time_required = operation['time_required']
-
-        work_center = WorkCenter.find_by_name(work_center_name)
-        if not work_center:
-            work_center_data = {
-                'name': work_center_name,
-                'description': f'Work center {work_center_name}',
-                'hourly_cost': 0.0
-            }
-            work_center = WorkCenter.create(work_center_data)
-
-        bom_obj.add_operation(operation_name, work_center.to_dict()['id'], time_required)
+    # One bulk resolve per lookup collection, then a single insert of the whole BOM
+    bom_obj = create_bom_document(bom_id, data['product_name'], data['items'], data['operations'])
 
     return jsonify({'message': 'BOM created successfully', 'bom_id': bom_obj.to_dict()['id']}), 201
 
 def get_boms():
-    boms = BOM.get_all_boms()
-    return jsonify(boms), 200
+    limit, cursor = get_page_args()
+    boms = BOM.get_all_boms(limit=limit, cursor=cursor)
+    return jsonify(boms), 200, cursor_headers(boms)
 
 def get_bom(bom_id):
     bom = BOM.find_by_id(bom_id)
     if not bom:
         return jsonify({'error': 'BOM not found'}), 404
 
-    bom_data = bom.to_dict()
-
-    items = []
-    bom_items = BOMItem.find_by_bom_id(str(bom_data['id']))
-    for item in bom_items:
-        raw_material = Product.find_by_id(item['raw_material_id'])
-        items.append({
-            'raw_material': {'id': str(raw_material['_id']), 'name': raw_material['name']},
-            'quantity': item['quantity'],
-            'unit': item['unit']
-        })
-
-    operations = []
-    bom_operations = BOMOperation.find_by_bom_id(str(bom_data['id']))
-    for op in bom_operations:
-        work_center = WorkCenter.find_by_id(op['work_center_id'])
-        operations.append({
-            'work_center': {'id': str(work_center['_id']), 'name': work_center['name']},
-            'operation_name': op['operation_name'],
-            'duration': op['duration']
-        })
-
-    bom_data['items'] = items
-    bom_data['operations'] = operations
+    # Products and work centers are resolved in two batched queries
+    bom_data = expand_bom(bom.to_dict())
 
     return jsonify(bom_data), 200
 
+def explode_bom(bom_id):
+    try:
+        quantity = float(request.args.get('quantity', 1))
+        requirements = explode(bom_id, quantity)
+    except BOMCycleError as e:
+        return jsonify({'error': str(e), 'cycle': [str(node) for node in e.path]}), 422
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'bom_id': bom_id,
+        'quantity': quantity,
+        'requirements': requirement_rows(requirements)
+    }), 200
+
 def update_bom(bom_id):
     data = request.get_json()
     required_fields = ['bom_id', 'product_name', 'items', 'operations']
@@ -0,0 +1,16 @@
+from flask import Response, g, jsonify
+from config import Config
+from utils.event_bus import sse_stream
+from utils.jwt_helper import encode_stream_token
+
+def issue_stream_token():
+    return jsonify({'token': encode_stream_token(g.user), 'expires_in': Config.STREAM_TOKEN_SECONDS}), 200
+
+def stream_events():
+    # The generator outlives the request context, so it gets its own copy of the user
+    user = dict(g.user)
+    return Response(
+        sse_stream(user, expires_at=user.get('session_exp') or user.get('exp')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
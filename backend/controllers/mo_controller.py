@@ -2,6 +2,15 @@ from flask import request, jsonify, g
 from models.mo_model import ManufacturingOrder
 from models.bom_model import BOM
 from models.user_model import User
+from models.production_stats_model import DailyProductionStats
+from models.reservation_model import StockReservation
+from models.inventory_model import InsufficientStockError
+from services.bom_explosion_service import direct_requirements
+from services.atp_service import check_feasibility
+from services.wo_generation_service import create_mo_with_work_orders
+from models.work_order import WorkOrder
+from utils.pagination import get_page_args, cursor_headers, DEFAULT_PAGE_SIZE
+from bson.errors import InvalidId
 from datetime import datetime
 
 def create_mo():
@@ -43,71 +52,127 @@ def create_mo():
     if not assignee:
         return jsonify({'error': 'Assignee not found'}), 404
     
-    if not (assignee['role'].lower() in ['manufacturing manager', 'operator'] or 
-            'operator' in assignee['role'].lower() or 'manufacturing manager' in assignee['role'].lower()):
+    role = assignee.data['role'].lower()
+    if 'operator' not in role and 'manufacturing manager' not in role:
         return jsonify({'error': 'Assignee must be a Manufacturing Manager or Operator'}), 400
     
-    # Create manufacturing order
+    # Check every component against available-to-promise stock in one query.
+    # Only the BOM's own items are taken from stock, so those are what is
+    # checked and reserved; sub-assemblies are not exploded
+    allow_shortage = bool(data.get('allow_shortage'))
     try:
-        mo_data = {
-            'bom_id': str(data['bom_id']),
-            'quantity': quantity,
-            'schedule_start': schedule_start,
-            'deadline': deadline,
-            'assignee_id': str(data['assignee_id']),
-            'status': 'planned',
-            'product_name': bom['product_name']
-        }
-        
-        mo_id = ManufacturingOrder.create(mo_data)
-        mo = ManufacturingOrder.find_by_id(mo_id)
-        
+        requirements = direct_requirements(bom.data['_id'], quantity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    feasibility = check_feasibility(requirements)
+    if not feasibility['feasible'] and not allow_shortage:
+        return jsonify({'error': 'Insufficient stock for components', 'feasibility': feasibility}), 409
+    
+    # Create the manufacturing order together with its stock reservation,
+    # with one work order per BOM operation if asked
+    try:
+        mo, work_orders, reservations, shortages = create_mo_with_work_orders(
+            bom.data,
+            quantity,
+            schedule_start,
+            deadline,
+            data['assignee_id'],
+            wo_assignee_id=data.get('wo_assignee_id'),
+            requirements=requirements,
+            allow_shortage=allow_shortage,
+            generate_work_orders=bool(data.get('generate_work_orders')),
+            priority=data.get('priority', 'medium'),
+            notes=data.get('notes', '')
+        )
         return jsonify({
             'message': 'Manufacturing Order created successfully',
-            'id': str(mo['_id']),
-            'mo': mo
+            'id': str(mo.data['_id']),
+            'mo': mo.to_dict(),
+            'work_orders': [wo.to_dict() for wo in work_orders],
+            'reservations': [reservation.to_dict() for reservation in reservations],
+            'shortages': {str(product_id): quantity for product_id, quantity in shortages.items()}
         }), 201
-        
+    
+    except InsufficientStockError as e:
+        # Lost the stock to a concurrent MO between the check and the reservation
+        return jsonify({'error': str(e), 'feasibility': check_feasibility(requirements)}), 409
     except Exception as e:
         return jsonify({'error': f'Failed to create manufacturing order: {str(e)}'}), 500
 
+def check_mo_feasibility():
+    data = request.get_json() or {}
+    try:
+        quantity = float(data['quantity'])
+        requirements = direct_requirements(data['bom_id'], quantity)
+    except (KeyError, TypeError):
+        return jsonify({'error': 'bom_id and quantity are required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(check_feasibility(requirements)), 200
+
+def get_mo_reservations(mo_id):
+    try:
+        return jsonify({'reservations': StockReservation.find_by_mo(mo_id, status=request.args.get('status'))}), 200
+    except InvalidId:
+        return jsonify({'error': 'Invalid manufacturing order ID'}), 400
+
 def get_mos():
     try:
-        # Get query parameters
-        status = request.args.get('status')
-        assignee_id = request.args.get('assignee_id')
-        
-        # Get all manufacturing orders
-        mos = ManufacturingOrder.find_all()
-        
-        # Filter by status if provided
-        if status:
-            mos = [mo for mo in mos if mo['status'] == status]
-        
-        # Filter by assignee_id if provided
-        if assignee_id:
-            mos = [mo for mo in mos if str(mo['assignee_id']) == assignee_id]
+        # Translate query parameters into one indexed Mongo query
+        args = request.args
+        filters = {
+            'status': [v for v in args.get('status', '').split(',') if v],
+            'assignee_id': args.get('assignee_id'),
+            'priority': [v for v in args.get('priority', '').split(',') if v],
+            'bom_id': args.get('bom_id'),
+            'schedule_from': args.get('schedule_from'),
+            'schedule_to': args.get('schedule_to'),
+            'deadline_from': args.get('deadline_from'),
+            'deadline_to': args.get('deadline_to'),
+            'created_from': args.get('created_from'),
+            'created_to': args.get('created_to')
+        }
+        sort = args.get('sort', '-created_at')
+        sort_field = sort.lstrip('-')
+        direction = -1 if sort.startswith('-') else 1
+        fields = [f for f in args.get('fields', '').split(',') if f] or None
+        limit, cursor = get_page_args()
+        
+        mos = ManufacturingOrder.query(
+            filters,
+            sort_field=sort_field,
+            direction=direction,
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
         
         return jsonify({
             'manufacturing_orders': mos,
-            'total': len(mos)
+            'total': len(mos),
+            'next_cursor': mos.next_cursor
         }), 200
         
+    except (ValueError, InvalidId) as e:
+        return jsonify({'error': f'Invalid filter: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to fetch manufacturing orders: {str(e)}'}), 500
 
 def get_mo(mo_id):
+    # Include the first page of work orders; the rest via /work-orders
+    limit, _ = get_page_args()
     try:
         mo = ManufacturingOrder.find_by_id(mo_id)
         if not mo:
             return jsonify({'error': 'Manufacturing Order not found'}), 404
             
-        # Include work orders with operator details
-        work_orders = ManufacturingOrder.get_work_orders(str(mo['_id']))
+        work_orders = WorkOrder.find_by_mo_id(mo.data['_id'], limit=limit)
         
-        mo['work_orders'] = work_orders
+        mo_dict = mo.to_dict()
+        mo_dict['work_orders'] = work_orders
+        mo_dict['work_orders_next_cursor'] = work_orders.next_cursor
         
-        return jsonify(mo), 200
+        return jsonify(mo_dict), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to fetch manufacturing order: {str(e)}'}), 500
@@ -128,17 +193,16 @@ def update_mo_status(mo_id):
         if new_status not in valid_statuses:
             return jsonify({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
             
-        update_data = {
-            'status': new_status,
-            'updated_at': datetime.utcnow()
-        }
-        
-        ManufacturingOrder.update_by_id(str(mo['_id']), update_data)
-        updated_mo = ManufacturingOrder.find_by_id(mo_id)
+        old_status = mo.update_status(new_status, notes=data.get('notes'))
+        if new_status == 'completed' and old_status != 'completed':
+            DailyProductionStats.record_mo_completion(mo.data)
+            StockReservation.release_for_mo(mo.data['_id'], status='consumed')
+        elif new_status == 'cancelled' and old_status != 'cancelled':
+            StockReservation.release_for_mo(mo.data['_id'])
         
         return jsonify({
             'message': 'Manufacturing Order status updated successfully',
-            'mo': updated_mo
+            'mo': mo.to_dict()
         }), 200
         
     except Exception as e:
@@ -150,12 +214,30 @@ def get_mo_work_orders(mo_id):
         if not mo:
             return jsonify({'error': 'Manufacturing Order not found'}), 404
             
-        work_orders = ManufacturingOrder.get_work_orders(str(mo['_id']))
+        limit, cursor = get_page_args()
+        work_orders = WorkOrder.find_by_mo_id(mo.data['_id'], limit=limit, cursor=cursor)
             
         return jsonify({
             'work_orders': work_orders,
-            'total': len(work_orders)
+            'total': mo.data.get('total_wo_count', len(work_orders)),
+            'next_cursor': work_orders.next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': f'Failed to fetch work orders: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to fetch work orders: {str(e)}'}), 500
+
+def get_mo_history(mo_id, kind):
+    mo = ManufacturingOrder.find_by_id(mo_id)
+    if not mo:
+        return jsonify({'error': 'Manufacturing Order not found'}), 404
+    limit, cursor = get_page_args(DEFAULT_PAGE_SIZE)
+    try:
+        if kind == 'quality_checks':
+            entries = ManufacturingOrder.get_quality_checks(mo.data['_id'], limit=limit, cursor=cursor)
+        else:
+            entries = ManufacturingOrder.get_material_consumptions(mo.data['_id'], limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({kind: entries, 'next_cursor': entries.next_cursor}), 200, cursor_headers(entries)
\ No newline at end of file
@@ -0,0 +1,11 @@
+from flask import request, jsonify
+from services.mrp_service import run_mrp
+
+def get_mrp_run():
+    try:
+        result = run_mrp(bucket=request.args.get('bucket', 'week'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if request.args.get('shortages_only') == 'true':
+        result['products'] = [product for product in result['products'] if product['shortage'] > 0]
+    return jsonify(result), 200
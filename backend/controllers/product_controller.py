@@ -1,5 +1,6 @@
 from flask import request, jsonify
 from models.product_model import Product
+from utils.pagination import get_page_args, cursor_headers
 
 def create_product():
     data = request.get_json()
@@ -20,7 +21,8 @@ def create_product():
     return jsonify({'message': 'Product created', 'id': str(product_id)}), 201
 
 def get_products():
-    products = Product.find_all()
+    limit, cursor = get_page_args()
+    products = Product.find_all(limit=limit, cursor=cursor)
     result = [{
         'id': str(p['id']),
         'name': p['name'],
@@ -28,4 +30,4 @@ def get_products():
         'unit': p['unit'],
         'created_at': p['created_at'].isoformat()
     } for p in products]
-    return jsonify(result), 200
\ No newline at end of file
+    return jsonify(result), 200, cursor_headers(products)
\ No newline at end of file
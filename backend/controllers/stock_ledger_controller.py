@@ -1,8 +1,10 @@
 from flask import request, jsonify
 from models.stock_ledger_model import StockLedger
+from utils.pagination import get_page_args, cursor_headers
 
 def get_stock_ledger(product_id):
-    ledgers = StockLedger.find_by_product_id(product_id)
+    limit, cursor = get_page_args()
+    ledgers = StockLedger.find_by_product_id(product_id, limit=limit, cursor=cursor)
     result = [{
         'date': l['created_at'].isoformat(),
         'product_id': l['product_id'],
@@ -11,4 +13,4 @@ def get_stock_ledger(product_id):
         'stock_out': l['stock_out'],
         'balance': l['balance']
     } for l in ledgers]
-    return jsonify(result), 200
\ No newline at end of file
+    return jsonify(result), 200, cursor_headers(ledgers)
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import request, jsonify, g
 from models.user_model import User
 from utils.password_helper import hash_password, verify_password
 from validators.auth_validator import validate_email, validate_password
+from utils.pagination import get_page_args
 
 def get_user_profile():
     """Get current user's profile information"""
@@ -19,8 +20,9 @@ def get_user_profile():
 
 def get_all_users():
     """Get all users (Admin only)"""
+    limit, cursor = get_page_args()
     try:
-        users = User.get_all_users()
+        users = User.get_all_users(limit=limit, cursor=cursor)
         users_list = [{
             'id': str(user['id']),
             'username': user['username'],
@@ -30,7 +32,8 @@ def get_all_users():
         
         return jsonify({
             'users': users_list,
-            'total': len(users_list)
+            'total': len(users_list),
+            'next_cursor': users.next_cursor
         }), 200
     except Exception as e:
         print(f"Error in get_all_users: {e}") # Added for debugging
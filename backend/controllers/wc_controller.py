@@ -1,5 +1,9 @@
 from flask import request, jsonify
 from models import WorkCenter
+from models.mo_model import to_datetime
+from services.utilization_service import get_utilization as compute_utilization
+from services.oee_service import get_work_center_oee, get_plant_oee
+from utils.pagination import get_page_args, cursor_headers
 
 # Role decorators are applied at route level, not needed here
 def create_workcenter():
@@ -24,8 +28,9 @@ def create_workcenter():
     return jsonify({'message': 'Work center created successfully', 'id': str(wc.data['_id'])}), 201
 
 def get_workcenters():
-    workcenters = WorkCenter.find_all()
-    return jsonify(workcenters)
+    limit, cursor = get_page_args()
+    workcenters = WorkCenter.find_all(limit=limit, cursor=cursor)
+    return jsonify(workcenters), 200, cursor_headers(workcenters)
 
 def get_workcenter(id):
     wc = WorkCenter.find_by_id(id)
@@ -50,9 +55,40 @@ def update_workcenter(id):
     return jsonify({'message': 'Work center updated successfully'})
 
 def get_utilization(id):
-    # Placeholder: Implement actual utilization calculation here (e.g., based on work orders)
-    # For now, returning dummy data
-    return jsonify({
-        'rate': 75,  # Example utilization rate in %
-        'downtime_hours': 2  # Example downtime hours
-    })
\ No newline at end of file
+    wc = WorkCenter.find_by_id(id)
+    if not wc:
+        return jsonify({'error': 'Work center not found'}), 404
+    try:
+        utilization = compute_utilization(
+            wc.data,
+            start=to_datetime(request.args.get('start')),
+            end=to_datetime(request.args.get('end'))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(utilization)
+
+def get_oee(id):
+    wc = WorkCenter.find_by_id(id)
+    if not wc:
+        return jsonify({'error': 'Work center not found'}), 404
+    try:
+        oee = get_work_center_oee(
+            wc.data,
+            start=to_datetime(request.args.get('start')),
+            end=to_datetime(request.args.get('end')),
+            by=request.args.get('by', 'day')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(oee)
+
+def get_all_oee():
+    try:
+        oee = get_plant_oee(
+            start=to_datetime(request.args.get('start')),
+            end=to_datetime(request.args.get('end'))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(oee)
@@ -1,12 +1,14 @@
 from flask import request, jsonify, g
+from bson import ObjectId
 
 from models.mo_model import ManufacturingOrder
 from models.user_model import User
 from controllers.inventory_controller import update_inventory_on_completion
-from models.stock_ledger_model import StockLedger
-from models.inventory_model import Inventory
-from models import WorkOrder
-from models.product_model import Product
+from services.consumption_service import consume_materials
+from services.scheduling_service import schedule_all, reschedule_work_order, schedule_new_work_orders
+from models import WorkOrder, WorkCenter, DailyProductionStats
+from models.reservation_model import StockReservation
+from utils.pagination import get_page_args, cursor_headers, DEFAULT_PAGE_SIZE
 from flask import g
 
 def create_wo(mo_id):
@@ -18,13 +20,18 @@ def create_wo(mo_id):
     if not mo:
         return jsonify({'error': 'MO not found'}), 404
 
-    wo_data = {
-        'mo_id': mo_id,
-        'assigned_to': data['assigned_to']
-    }
-    
-    wo_id = WorkOrder.create(wo_data)
-    return jsonify({'message': 'WO created', 'id': str(wo_id)}), 201
+    wo = WorkOrder.create(
+        mo.data['_id'],
+        data.get('operation_id'),
+        assigned_to=data['assigned_to'],
+        work_center=data.get('work_center'),
+        planned_duration=data.get('planned_duration', 60),
+        priority=data.get('priority', mo.data.get('priority', 'medium')),
+        deadline=mo.data.get('deadline')
+    )
+    mo.add_work_order(wo.data['_id'])
+    schedule_new_work_orders([wo.data['_id']])
+    return jsonify({'message': 'WO created', 'id': str(wo.data['_id'])}), 201
 
 def update_wo_status(wo_id):
     data = request.get_json()
@@ -35,65 +42,102 @@ def update_wo_status(wo_id):
     if not wo:
         return jsonify({'error': 'WO not found'}), 404
 
-    old_status = wo['status']
-    update_data = {
-        'status': data['status'],
-        'comments': data.get('comments', wo['comments'])
-    }
+    previous_start = wo.data.get('scheduled_start')
+    old_status = wo.update_status(data['status'], notes=data.get('comments'))
+    if old_status is None:
+        return jsonify({'error': 'WO not found'}), 404
+
+    error = _after_transition(wo, old_status, data['status'], previous_start)
+    if error:
+        return error
+    return jsonify({'message': 'WO updated'}), 200
 
-    WorkOrder.update_by_id(str(wo['_id']), update_data)
+
+def _after_transition(wo, old_status, new_status, previous_start):
+    """Follow-up of a WO status change: MO counters and status, material
+    consumption and MO completion, rescheduling. Returns an error response
+    or None."""
+    # Move the MO's completed counter and read it back in one step
+    mo = ManufacturingOrder.record_wo_transition(wo.data['mo_id'], old_status, new_status)
+    if not mo:
+        return jsonify({'error': 'MO not found'}), 404
 
     # If newly completed, consume proportional raw materials
-    if data['status'] == 'completed' and old_status != 'completed':
-        mo = ManufacturingOrder.find_by_id(wo['mo_id'])
-        work_orders = ManufacturingOrder.get_work_orders(str(mo['_id']))
-        num_wos = len(work_orders)
+    if new_status == 'completed' and old_status != 'completed':
+        num_wos = mo.data.get('total_wo_count', 0)
         if num_wos == 0:
             return jsonify({'error': 'No work orders'}), 500
 
-        # Proportional consumption
-        portion = 1.0 / num_wos
-        for comp in mo['required_components']:
-            item_name = comp['item']
-            quantity_to_consume = comp['quantity'] * portion
-
-            # Update inventory
-            inv = Inventory.find_by_item_name(item_name)
-            if inv:
-                new_quantity = inv['stock_quantity'] - quantity_to_consume
-                Inventory.update_by_id(str(inv['_id']), {'stock_quantity': new_quantity})
-
-            # Update ledger
-            product = Product.find_by_name(item_name)
-            if product:
-                last_ledger = StockLedger.find_last_by_product_id(str(product['_id']))
-                previous_balance = last_ledger['balance'] if last_ledger else 0
-                new_balance = previous_balance - quantity_to_consume
-                
-                ledger_data = {
-                    'product_id': str(product['_id']),
-                    'reference': f'WO-{str(wo["_id"])}',
-                    'stock_in': 0,
-                    'stock_out': quantity_to_consume,
-                    'balance': new_balance
-                }
-                StockLedger.create(ledger_data)
-
-    # Check if all WOs for MO are completed
-    work_orders = ManufacturingOrder.get_work_orders(str(mo['_id']))
-    all_completed = all(w['status'] == 'completed' for w in work_orders)
-    if all_completed:
-        ManufacturingOrder.update_by_id(str(mo['_id']), {'status': 'completed'})
-        # Update inventory for finished product
-        update_inventory_on_completion(mo)
+        # Proportional consumption, batched into one transaction
+        consume_materials(wo.data, mo.data, 1.0 / num_wos)
+        DailyProductionStats.record_wo_completion(wo.data)
 
-    return jsonify({'message': 'WO updated'}), 200
+        # Complete the MO once its last WO is done
+        if mo.data['completed_wo_count'] >= num_wos:
+            completed_mo = ManufacturingOrder.complete_if_all_work_orders_done(mo.data['_id'])
+            if completed_mo:
+                # Update inventory for finished product
+                update_inventory_on_completion(completed_mo)
+                DailyProductionStats.record_mo_completion(completed_mo.data)
+                StockReservation.release_for_mo(completed_mo.data['_id'], status='consumed')
+
+    # Starting, finishing or cancelling a WO frees or shifts its slot
+    if new_status != old_status:
+        reschedule_work_order(wo.data['_id'], previous_start=previous_start, work_center=wo.data.get('work_center'))
+    return None
 
 
 def get_assigned_work_orders():
-    work_orders = WorkOrder.find_by_assigned_to(g.user['id'])
-    return jsonify(work_orders), 200
+    limit, cursor = get_page_args()
+    work_orders = WorkOrder.find_by_assignee_id(g.user['id'], limit=limit, cursor=cursor)
+    return jsonify(work_orders), 200, cursor_headers(work_orders)
 
 def get_work_orders():
-    work_orders = WorkOrder.find_all()
-    return jsonify(work_orders), 200
\ No newline at end of file
+    limit, cursor = get_page_args()
+    work_orders = WorkOrder.get_all_work_orders(limit=limit, cursor=cursor)
+    return jsonify(work_orders), 200, cursor_headers(work_orders)
+
+
+def schedule_work_orders():
+    scheduled, changed = schedule_all()
+    return jsonify({'message': 'Work orders scheduled', 'scheduled': scheduled, 'changed': changed}), 200
+
+def reschedule_wo(wo_id):
+    wo = WorkOrder.find_by_id(wo_id)
+    if not wo:
+        return jsonify({'error': 'WO not found'}), 404
+    scheduled, changed = reschedule_work_order(wo.data['_id'])
+    return jsonify({'message': 'Work order rescheduled', 'scheduled': scheduled, 'changed': changed}), 200
+
+def get_wo_history(wo_id, kind):
+    wo = WorkOrder.find_by_id(wo_id)
+    if not wo:
+        return jsonify({'error': 'WO not found'}), 404
+    limit, cursor = get_page_args(DEFAULT_PAGE_SIZE)
+    try:
+        if kind == 'time_logs':
+            entries = WorkOrder.get_time_logs(wo.data['_id'], limit=limit, cursor=cursor)
+        else:
+            entries = WorkOrder.get_materials_consumed(wo.data['_id'], limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({kind: entries, 'next_cursor': entries.next_cursor}), 200, cursor_headers(entries)
+
+def claim_next_work_order():
+    data = request.get_json() or {}
+    if not data.get('work_center'):
+        return jsonify({'error': 'Missing work_center'}), 400
+    wc = WorkCenter.find_by_id(data['work_center']) if ObjectId.is_valid(data['work_center']) else None
+    wc = wc or WorkCenter.find_by_name(data['work_center'])
+    if not wc:
+        return jsonify({'error': 'Work center not found'}), 404
+
+    # Work orders reference their center by ID or, on older rows, by name
+    refs = [ref for ref in (str(wc.data['_id']), wc.data.get('name')) if ref]
+    wo = WorkOrder.claim_next(refs, g.user['id'])
+    if not wo:
+        return jsonify({'message': 'No pending work orders', 'work_order': None}), 200
+    error = _after_transition(wo, 'pending', 'in_progress', wo.data.get('scheduled_start'))
+    if error:
+        return error
+    return jsonify({'message': 'WO claimed', 'work_order': wo.to_dict()}), 200
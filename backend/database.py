@@ -1,6 +1,7 @@
 from flask_pymongo import PyMongo
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from datetime import datetime
+from utils.pagination import paginate
 import os
 
 # Initialize PyMongo
@@ -13,6 +14,49 @@ def get_db():
     """Get the MongoDB database instance"""
     return mongo.db
 
+_transactions_supported = None
+
+def supports_transactions():
+    """Whether the connected deployment accepts multi-document transactions"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        client = mongo.cx
+        client.admin.command('ping')
+        topology = client.topology_description.topology_type_name
+        _transactions_supported = topology in ('ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+    return _transactions_supported
+
+def run_in_transaction(callback):
+    """Run ``callback(session)`` inside a multi-document transaction.
+    
+    Standalone servers cannot run transactions, so there the callback is
+    called with ``session=None`` and its writes are applied one by one.
+    """
+    if not supports_transactions():
+        return callback(None)
+    with mongo.cx.start_session() as session:
+        return session.with_transaction(callback)
+
+def bump_version(*collections):
+    """Record that ``collections`` changed so reads cached against them go stale.
+    
+    Call after the write is durable (after commit when inside a transaction),
+    otherwise a reader could cache pre-write data under the new version.
+    """
+    if len(collections) == 1:
+        mongo.db.data_versions.update_one({'_id': collections[0]}, {'$inc': {'version': 1}}, upsert=True)
+        return
+    mongo.db.data_versions.bulk_write([
+        UpdateOne({'_id': name}, {'$inc': {'version': 1}}, upsert=True) for name in collections
+    ], ordered=False)
+
+def get_versions(collections):
+    """Current write version of each collection, in one query"""
+    versions = {name: 0 for name in collections}
+    for doc in mongo.db.data_versions.find({'_id': {'$in': list(collections)}}):
+        versions[doc['_id']] = doc.get('version', 0)
+    return versions
+
 def init_db(app):
     """Initialize MongoDB with Flask app"""
     mongo.init_app(app)
@@ -37,14 +81,56 @@ def init_db(app):
         # Manufacturing Orders collection indexes
         db.manufacturing_orders.create_index("order_number", unique=True)
         db.manufacturing_orders.create_index("status")
+        # Compound indexes for /api/mos filters (equality, then sort, then range)
+        db.manufacturing_orders.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+        db.manufacturing_orders.create_index([("assignee_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
+        db.manufacturing_orders.create_index([("bom_id", 1), ("created_at", -1), ("_id", -1)])
+        db.manufacturing_orders.create_index([("priority", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
+        db.manufacturing_orders.create_index([("status", 1), ("schedule_start", 1), ("_id", 1)])
+        db.manufacturing_orders.create_index([("status", 1), ("deadline", 1), ("_id", 1)])
         
         # Inventory collection indexes
         db.inventory.create_index("product_id")
         db.inventory.create_index("location")
+        db.inventory.create_index("item_name")
+        
+        # Stock reservations held for manufacturing orders
+        db.stock_reservations.create_index([("mo_id", 1), ("status", 1)])
+        db.stock_reservations.create_index("release_token", sparse=True)
         
         # Stock Ledger collection indexes
         db.stock_ledger.create_index("product_id")
         db.stock_ledger.create_index("transaction_date")
+        db.stock_ledger.create_index([("product_id", 1), ("seq", -1)])
+        db.stock_ledger.create_index([("created_at", 1), ("product_id", 1)])
+        db.monthly_stock_usage.create_index([("month", 1), ("product_id", 1)], unique=True)
+        
+        # Daily production rollups, one row per (day, work center)
+        db.daily_production_stats.create_index([("day", 1), ("work_center", 1)], unique=True)
+        
+        # Report jobs, deduplicated by parameter hash
+        db.report_jobs.create_index("param_hash", unique=True)
+        db.report_jobs.create_index([("status", 1), ("created_at", 1)])
+        
+        # Keyset pagination indexes: (filter field, sort field, _id)
+        db.stock_ledger.create_index([("created_at", -1), ("_id", -1)])
+        db.stock_ledger.create_index([("product_id", 1), ("created_at", -1), ("_id", -1)])
+        db.manufacturing_orders.create_index([("created_at", -1), ("_id", -1)])
+        db.work_orders.create_index([("created_at", -1), ("_id", -1)])
+        db.work_orders.create_index([("mo_id", 1), ("created_at", -1), ("_id", -1)])
+        db.work_orders.create_index([("assigned_to", 1), ("created_at", -1), ("_id", -1)])
+        db.work_orders.create_index([("status", 1), ("created_at", -1), ("_id", -1)])
+        db.work_orders.create_index([("assigned_to", 1), ("status", 1), ("end_time", 1)])
+        db.work_orders.create_index([("status", 1), ("work_center", 1), ("scheduled_start", 1)])
+        db.work_orders.create_index([("work_center", 1), ("start_time", 1)])
+        db.work_orders.create_index([("work_center", 1), ("status", 1), ("priority_rank", 1), ("deadline", 1), ("_id", 1)])
+        db.work_center_daily_usage.create_index([("work_center_id", 1), ("day", 1)], unique=True)
+        db.work_orders.create_index([("status", 1), ("end_time", 1)])
+        db.work_center_oee.create_index([("work_center", 1), ("day", 1), ("shift", 1)], unique=True)
+        db.work_center_oee.create_index([("day", 1)])
+        db.work_center_oee_days.create_index([("day", 1)], unique=True)
+        db.mo_entry_buckets.create_index([("parent_id", 1), ("kind", 1), ("_id", -1)])
+        db.wo_entry_buckets.create_index([("parent_id", 1), ("kind", 1), ("_id", -1)])
 
 class MongoDocument:
     """Base class for MongoDB documents with common methods"""
@@ -55,14 +141,10 @@ class MongoDocument:
         return collection.find_one({"_id": document_id})
     
     @classmethod
-    def find_all(cls, collection, filter_dict=None, limit=None, skip=None):
-        """Find all documents with optional filter"""
-        cursor = collection.find(filter_dict or {})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        return list(cursor)
+    def find_all(cls, collection, filter_dict=None, limit=None, cursor=None, sort_field='_id', direction=1):
+        """Find all documents with optional filter, paginated by cursor"""
+        return paginate(collection, filter_dict, sort_field=sort_field, direction=direction,
+                        limit=limit, cursor=cursor)
     
     @classmethod
     def insert_one(cls, collection, document):
@@ -15,7 +15,8 @@ def token_required(f):
 
         token = auth_header.split(' ')[1]
         payload = decode_jwt(token)
-        if not payload:
+        # Scoped tokens (event stream) are not session tokens
+        if not payload or payload.get('scope'):
             return jsonify({'error': 'Unauthorized', 'message': 'Invalid or expired token'}), 401
 
         # Store user info in Flask's g object for the current request
@@ -23,6 +24,34 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def stream_token_required(f):
+    """
+    Like token_required, but also accepts a stream token (see
+    ``encode_stream_token``) as a ``token`` query parameter, since browser
+    EventSource connections cannot send headers. Session JWTs are only
+    accepted in the header, so they never end up in a URL.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth_header = request.headers.get('Authorization')
+        if auth_header and auth_header.startswith('Bearer '):
+            payload = decode_jwt(auth_header.split(' ')[1])
+            if payload and payload.get('scope'):
+                payload = None
+        elif request.args.get('token'):
+            payload = decode_jwt(request.args['token'])
+            if payload and payload.get('scope') != 'events':
+                payload = None
+        else:
+            return jsonify({'error': 'Unauthorized', 'message': 'Valid token is required'}), 401
+
+        if not payload:
+            return jsonify({'error': 'Unauthorized', 'message': 'Invalid or expired token'}), 401
+
+        g.user = payload
+        return f(*args, **kwargs)
+    return decorated
+
 def role_required(allowed_roles):
     """
     Decorator that checks if the authenticated user has one of the allowed roles.
@@ -60,7 +89,7 @@ def auth_middleware(roles=None):
 
             token = auth_header.split(' ')[1]
             payload = decode_jwt(token)
-            if not payload:
+            if not payload or payload.get('scope'):
                 return jsonify({'error': 'Invalid token'}), 401
 
             if roles and payload.get('role') not in roles:
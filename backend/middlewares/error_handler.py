@@ -1,6 +1,11 @@
 from flask import jsonify
+from utils.pagination import InvalidCursor
 
 def init_error_handlers(app):
+    @app.errorhandler(InvalidCursor)
+    def invalid_cursor(error):
+        return jsonify({'error': str(error)}), 400
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Not found'}), 404
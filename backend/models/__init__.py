@@ -9,6 +9,9 @@ from .inventory_model import Inventory
 from .stock_ledger_model import StockLedger
 from .work_center import WorkCenter
 from .work_order import WorkOrder
+from .production_stats_model import DailyProductionStats
+from .reservation_model import StockReservation
+from .oee_model import WorkCenterOEE
 
 
-__all__ = ['mongo', 'User', 'OtpToken', 'Product', 'ManufacturingOrder', 'BOM', 'BOMItem', 'BOMOperation', 'Inventory', 'StockLedger', 'WorkCenter', 'WorkOrder']
\ No newline at end of file
+__all__ = ['mongo', 'User', 'OtpToken', 'Product', 'ManufacturingOrder', 'BOM', 'BOMItem', 'BOMOperation', 'Inventory', 'StockLedger', 'WorkCenter', 'WorkOrder', 'DailyProductionStats', 'StockReservation', 'WorkCenterOEE']
\ No newline at end of file
@@ -1,4 +1,5 @@
-from database import mongo, MongoDocument
+from database import mongo, MongoDocument, bump_version
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
 
@@ -30,11 +31,13 @@ class BOM:
             'product_name': product_name,
             'items': items or [],
             'operations': operations or [],
+            'version': 1,  # bumped on every structural change
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
             'is_active': True
         }
         result = mongo.db.boms.insert_one(bom_data)
+        bump_version('boms')
         bom_data['_id'] = result.inserted_id
         return cls(bom_data)
     
@@ -65,18 +68,17 @@ class BOM:
         return cls(bom_data).to_dict() if bom_data else None
     
     @classmethod
-    def get_all_boms(cls, limit=None, skip=None):
+    def get_all_boms(cls, limit=None, cursor=None):
         """Get all BOMs with pagination"""
-        cursor = mongo.db.boms.find({})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        boms = []
-        for bom_data in cursor:
-            boms.append(cls(bom_data).to_dict())
-        return boms
+        return paginate(
+            mongo.db.boms,
+            {},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda bom_data: cls(bom_data).to_dict()
+        )
     
     def to_dict(self):
         """Convert BOM to dictionary"""
@@ -88,26 +90,24 @@ class BOM:
             'product_name': self.data.get('product_name'),
             'items': self.data.get('items', []),
             'operations': self.data.get('operations', []),
+            'version': self.data.get('version', 1),
             'is_active': self.data.get('is_active', True),
             'created_at': self.data.get('created_at'),
             'updated_at': self.data.get('updated_at')
         }
     
-    def add_item(self, raw_material_id, quantity, unit):
+    def add_item(self, raw_material_id, quantity, unit, bom_id=None):
         """Add item to BOM"""
-        new_item = {
-            'raw_material_id': raw_material_id,
-            'quantity': quantity,
-            'unit': unit,
-            'created_at': datetime.utcnow()
-        }
+        new_item = BOMItem.create_item(raw_material_id, quantity, unit, bom_id=bom_id)
         mongo.db.boms.update_one(
             {'_id': self.data['_id']},
             {
                 '$push': {'items': new_item},
+                '$inc': {'version': 1},
                 '$set': {'updated_at': datetime.utcnow()}
             }
         )
+        bump_version('boms')
     
     def add_operation(self, operation_name, work_center_id, time_required):
         """Add operation to BOM"""
@@ -121,9 +121,11 @@ class BOM:
             {'_id': self.data['_id']},
             {
                 '$push': {'operations': new_operation},
+                '$inc': {'version': 1},
                 '$set': {'updated_at': datetime.utcnow()}
             }
         )
+        bump_version('boms')
     
     def update_items(self, items):
         """Update BOM items"""
@@ -133,9 +135,11 @@ class BOM:
                 '$set': {
                     'items': items,
                     'updated_at': datetime.utcnow()
-                }
+                },
+                '$inc': {'version': 1}
             }
         )
+        bump_version('boms')
     
     def update_operations(self, operations):
         """Update BOM operations"""
@@ -145,13 +149,16 @@ class BOM:
                 '$set': {
                     'operations': operations,
                     'updated_at': datetime.utcnow()
-                }
+                },
+                '$inc': {'version': 1}
             }
         )
+        bump_version('boms')
     
     def delete(self):
         """Delete BOM"""
         mongo.db.boms.delete_one({'_id': self.data['_id']})
+        bump_version('boms')
     
     @classmethod
     def count_boms(cls, filter_dict=None):
@@ -159,17 +166,24 @@ class BOM:
         return mongo.db.boms.count_documents(filter_dict or {})
 
 class BOMItem:
-    """MongoDB BOM Item model (embedded in BOM)"""
+    """MongoDB BOM Item model (embedded in BOM)
+    
+    A component that is itself manufactured carries the ``bom_id`` of the
+    sub-assembly BOM that builds it; plain raw materials leave it out.
+    """
     
     @staticmethod
-    def create_item(raw_material_id, quantity, unit):
+    def create_item(raw_material_id, quantity, unit, bom_id=None):
         """Create a BOM item dictionary"""
-        return {
+        item = {
             'raw_material_id': raw_material_id,
             'quantity': quantity,
             'unit': unit,
             'created_at': datetime.utcnow()
         }
+        if bom_id:
+            item['bom_id'] = bom_id
+        return item
 
 class BOMOperation:
     """MongoDB BOM Operation model (embedded in BOM)"""
@@ -0,0 +1,173 @@
+from database import mongo
+from utils.pagination import Page, encode_cursor, decode_cursor
+from datetime import datetime
+from bson import ObjectId
+import hashlib
+
+BUCKET_SIZE = 100
+
+
+class EntryBuckets:
+    """Append-only history of a parent document, kept outside the parent.
+
+    Entries of one ``kind`` (time logs, material consumptions, ...) are
+    stored in bucket documents of up to ``BUCKET_SIZE`` entries that point
+    back at their parent through ``parent_id``. Appends fill the parent's
+    newest bucket and then open new ones, so buckets in ``_id`` order hold
+    entries oldest first; the parent document never grows and reading it
+    never drags its history along.
+    """
+
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def append(self, parent_id, kind, entries, session=None):
+        """Add entries to the parent's newest bucket, opening new ones as it fills.
+
+        The newest bucket is filled up by ``_id`` with a guard on its count;
+        if a concurrent append got there first the fill is retried against
+        the new newest bucket. Whatever does not fit goes into new buckets.
+        """
+        if isinstance(parent_id, str):
+            parent_id = ObjectId(parent_id)
+        now = datetime.utcnow()
+        entries = list(entries)
+        if not entries:
+            return
+        while entries:
+            newest = self.collection.find_one(
+                {'parent_id': parent_id, 'kind': kind}, {'count': 1}, sort=[('_id', -1)], session=session
+            )
+            room = BUCKET_SIZE - newest['count'] if newest else 0
+            if room <= 0:
+                break
+            fill = entries[:room]
+            result = self.collection.update_one(
+                {'_id': newest['_id'], 'count': {'$lte': BUCKET_SIZE - len(fill)}},
+                {'$push': {'entries': {'$each': fill}}, '$inc': {'count': len(fill)}, '$set': {'last_at': now}},
+                session=session
+            )
+            if result.modified_count:
+                entries = entries[room:]
+                break
+
+        previous = newest['_id'] if newest else None
+        buckets = []
+        for offset in range(0, len(entries), BUCKET_SIZE):
+            chunk = entries[offset:offset + BUCKET_SIZE]
+            previous = _next_id(previous)
+            buckets.append({
+                '_id': previous, 'parent_id': parent_id, 'kind': kind,
+                'entries': chunk, 'count': len(chunk), 'created_at': now, 'last_at': now
+            })
+        if buckets:
+            self.collection.insert_many(buckets, session=session)
+
+    def page(self, parent_id, kind, limit=None, cursor=None):
+        """Entries of one kind for a parent, newest first, keyset-paginated.
+
+        The cursor is (index in bucket, bucket _id) of the last entry
+        returned, so a page only reads the buckets it spans.
+        """
+        if isinstance(parent_id, str):
+            parent_id = ObjectId(parent_id)
+        query = {'parent_id': parent_id, 'kind': kind}
+        position = bucket_id = None
+        if cursor:
+            position, bucket_id = decode_cursor(cursor)
+            query['_id'] = {'$lte': bucket_id}
+
+        entries = []
+        last = None
+        for bucket in self.collection.find(query, {'entries': 1}).sort('_id', -1):
+            bucket_entries = bucket.get('entries', [])
+            end = len(bucket_entries)
+            if bucket['_id'] == bucket_id:
+                end = position
+            for index in range(end - 1, -1, -1):
+                if limit and len(entries) == limit:
+                    return Page(entries, encode_cursor(last[0], last[1]))
+                entries.append(bucket_entries[index])
+                last = (index, bucket['_id'])
+        return Page(entries)
+
+    def all(self, parent_ids, kind, session=None):
+        """Every entry of one kind for many parents, oldest first, by parent"""
+        by_parent = {}
+        for bucket in self.collection.find(
+            {'parent_id': {'$in': list(parent_ids)}, 'kind': kind},
+            {'parent_id': 1, 'entries': 1},
+            session=session
+        ).sort('_id', 1):
+            by_parent.setdefault(bucket['parent_id'], []).extend(bucket.get('entries', []))
+        return by_parent
+
+    def delete_parent(self, parent_id):
+        if isinstance(parent_id, str):
+            parent_id = ObjectId(parent_id)
+        self.collection.delete_many({'parent_id': parent_id})
+
+    def migrate(self, parents, fields, batch_size=500):
+        """Move embedded history arrays of existing parents into buckets.
+
+        ``parents`` is the parent collection and ``fields`` the array fields
+        to move; each field becomes a kind. A field's whole array moves as
+        one bucket marked ``migrated``, created only if missing, so a run
+        interrupted before a parent's arrays were unset can simply be
+        repeated. The bucket's ``_id`` predates the parent, so it sorts
+        ahead of any bucket already appended live. Returns the parents
+        migrated.
+        """
+        migrated = 0
+        for parent in parents.find(
+            {'$or': [{field: {'$exists': True}} for field in fields]},
+            {field: 1 for field in fields},
+            batch_size=batch_size
+        ):
+            now = datetime.utcnow()
+            for field in fields:
+                if parent.get(field):
+                    self.collection.update_one(
+                        {'parent_id': parent['_id'], 'kind': field, 'migrated': True},
+                        {'$setOnInsert': {
+                            '_id': _migrated_id(parent['_id'], field),
+                            'entries': parent[field], 'count': len(parent[field]), 'created_at': now, 'last_at': now
+                        }},
+                        upsert=True
+                    )
+            parents.update_one({'_id': parent['_id']}, {'$unset': {field: '' for field in fields}})
+            migrated += 1
+        return migrated
+
+
+def _next_id(previous):
+    """A new bucket ID that sorts after ``previous``.
+
+    ObjectIds from different processes created in the same second are not
+    ordered, so a bucket opened elsewhere could otherwise sort first.
+    """
+    bucket_id = ObjectId()
+    if previous is not None and bucket_id <= previous:
+        bucket_id = ObjectId((int(str(previous), 16) + 1).to_bytes(12, 'big'))
+    return bucket_id
+
+
+
+def _migrated_id(parent_id, kind):
+    """A bucket ID for a parent's migrated history that sorts first.
+
+    It is stamped a second before the parent was created, so it precedes
+    every bucket opened since; the rest is derived from the parent and
+    kind, which keeps it unique and the same on every run.
+    """
+    timestamp = int(parent_id.generation_time.timestamp()) - 1
+    digest = hashlib.md5(f'{parent_id}:{kind}'.encode()).digest()
+    return ObjectId(timestamp.to_bytes(4, 'big') + digest[:8])
+
+
+mo_history = EntryBuckets('mo_entry_buckets')
+wo_history = EntryBuckets('wo_entry_buckets')
@@ -1,6 +1,15 @@
-from database import mongo, MongoDocument
+from database import mongo, MongoDocument, bump_version
+from utils.event_bus import bus, publish
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+# Stock free to promise on an inventory row: on hand minus already reserved
+AVAILABLE_EXPR = {'$subtract': ['$stock_quantity', {'$ifNull': ['$reserved_quantity', 0]}]}
+
+class InsufficientStockError(ValueError):
+    """Raised when a guarded adjustment would take stock below zero"""
 
 class Inventory:
     """MongoDB Inventory model"""
@@ -17,6 +26,7 @@ class Inventory:
         inventory_data = {
             'item_name': item_name,
             'stock_quantity': stock_quantity,
+            'reserved_quantity': 0,  # held by active MO reservations
             'location': location,
             'product_id': product_id,  # Reference to product if available
             'created_at': datetime.utcnow(),
@@ -24,6 +34,7 @@ class Inventory:
             'is_active': True
         }
         result = mongo.db.inventory.insert_one(inventory_data)
+        bump_version('inventory')
         inventory_data['_id'] = result.inserted_id
         return cls(inventory_data)
     
@@ -50,32 +61,55 @@ class Inventory:
         return cls(inventory_data) if inventory_data else None
     
     @classmethod
-    def find_by_location(cls, location, limit=None, skip=None):
+    def find_by_location(cls, location, limit=None, cursor=None):
         """Find inventory items by location"""
-        cursor = mongo.db.inventory.find({'location': location})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        return paginate(
+            mongo.db.inventory,
+            {'location': location},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda inventory_data: cls(inventory_data).to_dict()
+        )
+    
+    @classmethod
+    def resolve_rows(cls, products, session=None):
+        """Inventory row ID of each product, resolved with one query.
         
-        inventory_items = []
-        for inventory_data in cursor:
-            inventory_items.append(cls(inventory_data).to_dict())
-        return inventory_items
+        ``products`` maps product IDs to names (or None). A row linked through
+        ``product_id`` wins over one that only matches by ``item_name``, and
+        among several candidates the oldest row is used, so a product always
+        moves exactly one row. Products without any row are left out.
+        """
+        if not products:
+            return {}
+        names = {name: product_id for product_id, name in products.items() if name}
+        match = [{'product_id': {'$in': list(products)}}]
+        if names:
+            match.append({'item_name': {'$in': list(names)}})
+        rows = {}
+        for row in mongo.db.inventory.find({'$or': match}, {'product_id': 1, 'item_name': 1}, session=session).sort('_id', 1):
+            if row.get('product_id') in products:
+                product_id, rank = row['product_id'], 0
+            else:
+                product_id, rank = names[row['item_name']], 1
+            if product_id not in rows or rank < rows[product_id][0]:
+                rows[product_id] = (rank, row['_id'])
+        return {product_id: row_id for product_id, (_, row_id) in rows.items()}
     
     @classmethod
-    def get_all_inventory(cls, limit=None, skip=None):
+    def get_all_inventory(cls, limit=None, cursor=None):
         """Get all inventory items with pagination"""
-        cursor = mongo.db.inventory.find({})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        inventory_items = []
-        for inventory_data in cursor:
-            inventory_items.append(cls(inventory_data).to_dict())
-        return inventory_items
+        return paginate(
+            mongo.db.inventory,
+            {},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda inventory_data: cls(inventory_data).to_dict()
+        )
     
     def to_dict(self):
         """Convert inventory to dictionary"""
@@ -85,6 +119,8 @@ class Inventory:
             'id': str(self.data.get('_id')),
             'item_name': self.data.get('item_name'),
             'stock_quantity': self.data.get('stock_quantity', 0),
+            'reserved_quantity': self.data.get('reserved_quantity', 0),
+            'available_quantity': self.data.get('stock_quantity', 0) - self.data.get('reserved_quantity', 0),
             'location': self.data.get('location', 'default'),
             'product_id': str(self.data.get('product_id')) if self.data.get('product_id') else None,
             'is_active': self.data.get('is_active', True),
@@ -103,12 +139,115 @@ class Inventory:
                 }
             }
         )
+        bump_version('inventory')
     
-    def adjust_stock(self, adjustment):
+    @staticmethod
+    def _selector(item):
+        """Filter for an inventory ID or an explicit filter dict"""
+        if isinstance(item, dict):
+            return dict(item)
+        return {'_id': ObjectId(item) if isinstance(item, str) else item}
+    
+    @classmethod
+    def _guarded(cls, item, delta, allow_negative):
+        # Stock held for MO reservations is not free to take, so the floor
+        # applies to available stock, as when reserving
+        selector = cls._selector(item)
+        if not allow_negative and delta < 0:
+            selector['$expr'] = {'$gte': [AVAILABLE_EXPR, -delta]}
+        return selector
+    
+    @classmethod
+    def adjust(cls, item, delta, allow_negative=True, upsert_fields=None, session=None):
+        """Atomically add ``delta`` to an item's stock and return the item.
+        
+        ``item`` is an inventory ID or a filter. The change is a single
+        ``$inc``, so concurrent adjustments never overwrite each other. With
+        ``allow_negative=False`` the update only matches while enough
+        unreserved stock is left and raises ``InsufficientStockError``
+        otherwise. Passing
+        ``upsert_fields`` creates the item (with those fields) if it does not
+        exist yet; otherwise a missing item returns None.
+        """
+        now = datetime.utcnow()
+        update = {'$inc': {'stock_quantity': delta}, '$set': {'updated_at': now}}
+        guarded = not allow_negative and delta < 0
+        selector = cls._guarded(item, delta, allow_negative)
+        upsert = upsert_fields is not None and not guarded
+        if upsert:
+            defaults = {'reserved_quantity': 0, 'location': 'default', 'product_id': None, 'created_at': now, 'is_active': True}
+            defaults.update(upsert_fields)
+            update['$setOnInsert'] = {key: value for key, value in defaults.items() if key not in selector}
+        
+        inventory_data = mongo.db.inventory.find_one_and_update(
+            selector,
+            update,
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if inventory_data is None:
+            if guarded and mongo.db.inventory.find_one(cls._selector(item), {'_id': 1}, session=session):
+                raise InsufficientStockError('Insufficient stock')
+            if upsert_fields is not None:
+                # Guarded decrement of an item that does not exist yet
+                raise InsufficientStockError('Insufficient stock')
+            return None
+        if session is None:
+            bump_version('inventory')
+            publish('inventory', inventory_data)
+        return cls(inventory_data)
+    
+    @classmethod
+    def adjust_many(cls, adjustments, allow_negative=True, session=None):
+        """Apply many (item, delta) adjustments with one ``bulk_write``.
+        
+        Every change is an ``$inc``. With ``allow_negative=False`` each update
+        only matches while its item has enough unreserved stock, and
+        ``InsufficientStockError`` is raised if any did not apply. Run inside
+        a transaction (pass ``session``) to make that all-or-nothing; the
+        caller then bumps the ``inventory`` data version after commit.
+        """
+        if not adjustments:
+            return 0
+        now = datetime.utcnow()
+        result = mongo.db.inventory.bulk_write([
+            UpdateOne(
+                cls._guarded(item, delta, allow_negative),
+                {'$inc': {'stock_quantity': delta}, '$set': {'updated_at': now}}
+            )
+            for item, delta in adjustments
+        ], ordered=False, session=session)
+        if session is None:
+            bump_version('inventory')
+            cls.publish_changes(item for item, _ in adjustments)
+        if not allow_negative and result.matched_count < len(adjustments):
+            raise InsufficientStockError(
+                f'Insufficient stock for {len(adjustments) - result.matched_count} of {len(adjustments)} items'
+            )
+        return result.modified_count
+    
+    @classmethod
+    def publish_changes(cls, items):
+        """Push the current state of ``items`` to event stream clients.
+        
+        Only reads the rows back when clients are listening and no change
+        stream already delivers the update.
+        """
+        if not bus.local_delivery:
+            return
+        selectors = [cls._selector(item) for item in items]
+        if selectors:
+            for inventory_data in mongo.db.inventory.find({'$or': selectors}):
+                publish('inventory', inventory_data)
+    
+    def adjust_stock(self, adjustment, allow_negative=True):
         """Adjust stock quantity by adding/subtracting"""
-        new_quantity = self.data.get('stock_quantity', 0) + adjustment
-        self.update_stock(new_quantity)
-        return new_quantity
+        updated = self.adjust(self.data['_id'], adjustment, allow_negative=allow_negative)
+        if updated is None:
+            return None
+        self.data = updated.data
+        return self.data['stock_quantity']
     
     def update_location(self, new_location):
         """Update item location"""
@@ -121,10 +260,12 @@ class Inventory:
                 }
             }
         )
+        bump_version('inventory')
     
     def delete(self):
         """Delete inventory item"""
         mongo.db.inventory.delete_one({'_id': self.data['_id']})
+        bump_version('inventory')
     
     @classmethod
     def count_inventory(cls, filter_dict=None):
@@ -132,17 +273,14 @@ class Inventory:
         return mongo.db.inventory.count_documents(filter_dict or {})
     
     @classmethod
-    def search_inventory(cls, search_term, limit=None, skip=None):
+    def search_inventory(cls, search_term, limit=None, cursor=None):
         """Search inventory by item name"""
-        cursor = mongo.db.inventory.find({
-            'item_name': {'$regex': search_term, '$options': 'i'}
-        })
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        inventory_items = []
-        for inventory_data in cursor:
-            inventory_items.append(cls(inventory_data).to_dict())
-        return inventory_items
\ No newline at end of file
+        return paginate(
+            mongo.db.inventory,
+            {'item_name': {'$regex': search_term, '$options': 'i'}},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda inventory_data: cls(inventory_data).to_dict()
+        )
\ No newline at end of file
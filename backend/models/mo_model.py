@@ -1,10 +1,28 @@
-from database import mongo
-from datetime import datetime, date
+from database import mongo, bump_version
+from models.entry_bucket_model import mo_history
+from utils.event_bus import publish
+from utils.pagination import paginate
+from datetime import datetime, date, time
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+def to_datetime(value, end_of_day=False):
+    """Normalize a date, datetime or ISO string to a datetime BSON can store"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        # A bare YYYY-MM-DD is a whole day, so end_of_day applies to it too
+        value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.max if end_of_day else time.min)
 
 class ManufacturingOrder:
     """MongoDB Manufacturing Order model"""
     
+    # Fields the list endpoint may sort on; each is backed by an index in init_db
+    SORT_FIELDS = ('created_at', 'schedule_start', 'deadline')
+    
     def __init__(self, data=None):
         if data is None:
             data = {}
@@ -14,6 +32,16 @@ class ManufacturingOrder:
     @classmethod
     def create(cls, bom_id, quantity, schedule_start, deadline, assignee_id, status='planned', **kwargs):
         """Create a new manufacturing order"""
+        mo_data = cls.build(bom_id, quantity, schedule_start, deadline, assignee_id, status, **kwargs)
+        result = mongo.db.manufacturing_orders.insert_one(mo_data)
+        bump_version('manufacturing_orders')
+        mo_data['_id'] = result.inserted_id
+        publish('manufacturing_orders', mo_data)
+        return cls(mo_data)
+    
+    @staticmethod
+    def build(bom_id, quantity, schedule_start, deadline, assignee_id, status='planned', **kwargs):
+        """Manufacturing order document, ready to insert"""
         if isinstance(bom_id, str):
             bom_id = ObjectId(bom_id)
         if isinstance(assignee_id, str):
@@ -23,8 +51,8 @@ class ManufacturingOrder:
             'bom_id': bom_id,
             'quantity': quantity,
             'status': status,  # 'planned', 'in_progress', 'completed', 'cancelled'
-            'schedule_start': schedule_start if isinstance(schedule_start, date) else datetime.fromisoformat(schedule_start).date(),
-            'deadline': deadline if isinstance(deadline, date) else datetime.fromisoformat(deadline).date(),
+            'schedule_start': to_datetime(schedule_start),
+            'deadline': to_datetime(deadline),
             'assignee_id': assignee_id,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
@@ -34,13 +62,10 @@ class ManufacturingOrder:
             'actual_end_date': kwargs.get('actual_end_date'),
             'completed_quantity': kwargs.get('completed_quantity', 0),
             'scrap_quantity': kwargs.get('scrap_quantity', 0),
-            'work_orders': [],  # Array of work order IDs
-            'material_consumptions': [],  # Array of material consumption records
-            'quality_checks': []  # Array of quality check records
+            'total_wo_count': kwargs.get('total_wo_count', 0),  # Work orders linked to this MO
+            'completed_wo_count': 0  # Linked work orders in 'completed' status
         }
-        result = mongo.db.manufacturing_orders.insert_one(mo_data)
-        mo_data['_id'] = result.inserted_id
-        return cls(mo_data)
+        return mo_data
     
     @classmethod
     def find_by_id(cls, mo_id):
@@ -51,92 +76,156 @@ class ManufacturingOrder:
         return cls(mo_data) if mo_data else None
     
     @classmethod
-    def find_by_bom_id(cls, bom_id, limit=None, skip=None):
+    def find_by_bom_id(cls, bom_id, limit=None, cursor=None):
         """Find manufacturing orders by BOM ID"""
         if isinstance(bom_id, str):
             bom_id = ObjectId(bom_id)
         
-        cursor = mongo.db.manufacturing_orders.find({'bom_id': bom_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {'bom_id': bom_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_assignee_id(cls, assignee_id, limit=None, skip=None):
+    def find_by_assignee_id(cls, assignee_id, limit=None, cursor=None):
         """Find manufacturing orders by assignee ID"""
         if isinstance(assignee_id, str):
             assignee_id = ObjectId(assignee_id)
         
-        cursor = mongo.db.manufacturing_orders.find({'assignee_id': assignee_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {'assignee_id': assignee_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_status(cls, status, limit=None, skip=None):
+    def find_by_status(cls, status, limit=None, cursor=None):
         """Find manufacturing orders by status"""
-        cursor = mongo.db.manufacturing_orders.find({'status': status}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {'status': status},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_date_range(cls, start_date, end_date, limit=None, skip=None):
+    def find_by_date_range(cls, start_date, end_date, limit=None, cursor=None):
         """Find manufacturing orders within date range"""
         if isinstance(start_date, str):
             start_date = datetime.fromisoformat(start_date)
         if isinstance(end_date, str):
             end_date = datetime.fromisoformat(end_date)
         
-        cursor = mongo.db.manufacturing_orders.find({
-            'schedule_start': {'$gte': start_date},
-            'deadline': {'$lte': end_date}
-        }).sort('schedule_start', 1)
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {
+                'schedule_start': {'$gte': start_date},
+                'deadline': {'$lte': end_date}
+            },
+            sort_field='schedule_start',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
+    
+    @classmethod
+    def build_query(cls, status=None, assignee_id=None, priority=None, bom_id=None,
+                    schedule_from=None, schedule_to=None, deadline_from=None, deadline_to=None,
+                    created_from=None, created_to=None):
+        """Build a MongoDB filter from list filters.
+        
+        ``status`` and ``priority`` accept a single value or a list. Date
+        windows are inclusive; a bare date as upper bound covers the whole day.
+        """
+        query = {}
         
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        for field, value in (('status', status), ('priority', priority)):
+            if isinstance(value, (list, tuple)):
+                if len(value) == 1:
+                    query[field] = value[0]
+                elif value:
+                    query[field] = {'$in': list(value)}
+            elif value:
+                query[field] = value
         
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
+        if assignee_id:
+            query['assignee_id'] = ObjectId(assignee_id) if isinstance(assignee_id, str) else assignee_id
+        if bom_id:
+            query['bom_id'] = ObjectId(bom_id) if isinstance(bom_id, str) else bom_id
+        
+        for field, start, end in (('schedule_start', schedule_from, schedule_to),
+                                  ('deadline', deadline_from, deadline_to),
+                                  ('created_at', created_from, created_to)):
+            window = {}
+            if start:
+                window['$gte'] = to_datetime(start)
+            if end:
+                window['$lte'] = to_datetime(end, end_of_day=isinstance(end, str) and len(end) == 10)
+            if window:
+                query[field] = window
+        
+        return query
     
     @classmethod
-    def get_all_manufacturing_orders(cls, limit=None, skip=None):
-        """Get all manufacturing orders with pagination"""
-        cursor = mongo.db.manufacturing_orders.find({}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+    def query(cls, filters=None, sort_field='created_at', direction=-1, limit=None, cursor=None, fields=None):
+        """Run a filtered, sorted, projected and paginated manufacturing order query"""
+        if sort_field not in cls.SORT_FIELDS:
+            raise ValueError(f'Cannot sort manufacturing orders by {sort_field}')
+        
+        projection = None
+        if fields:
+            projection = {field: 1 for field in fields}
+            projection[sort_field] = 1
+        
+        def transform(mo_data):
+            mo_dict = cls(mo_data).to_dict()
+            if fields:
+                mo_dict = {key: value for key, value in mo_dict.items() if key == 'id' or key in fields}
+            return mo_dict
         
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
+        return paginate(
+            mongo.db.manufacturing_orders,
+            cls.build_query(**(filters or {})),
+            sort_field=sort_field,
+            direction=direction,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+            transform=transform
+        )
+    
+    @classmethod
+    def get_all_manufacturing_orders(cls, limit=None, cursor=None):
+        """Get all manufacturing orders with pagination"""
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
     
     def update_status(self, new_status, notes=None):
-        """Update manufacturing order status"""
+        """Update manufacturing order status.
+        
+        Returns the status the order had right before this update, read
+        atomically with the write, or None if the order no longer exists.
+        """
         update_data = {
             'status': new_status,
             'updated_at': datetime.utcnow()
@@ -151,10 +240,18 @@ class ManufacturingOrder:
         if notes:
             update_data['notes'] = notes
         
-        mongo.db.manufacturing_orders.update_one(
+        previous = mongo.db.manufacturing_orders.find_one_and_update(
             {'_id': self.data['_id']},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection={'status': 1},
+            return_document=ReturnDocument.BEFORE
         )
+        bump_version('manufacturing_orders')
+        if not previous:
+            return None
+        self.data.update(update_data)
+        publish('manufacturing_orders', self.data)
+        return previous.get('status')
     
     def update_quantity(self, completed_quantity, scrap_quantity=0):
         """Update completed and scrap quantities"""
@@ -168,41 +265,123 @@ class ManufacturingOrder:
                 }
             }
         )
+        bump_version('manufacturing_orders')
     
-    def add_work_order(self, work_order_id):
-        """Add work order to manufacturing order"""
-        if isinstance(work_order_id, str):
-            work_order_id = ObjectId(work_order_id)
+    def add_work_order(self, work_order_id, completed=False):
+        """Count a work order against this manufacturing order.
         
+        The work order itself points back through its ``mo_id``, so only the
+        counters live on the MO.
+        """
         mongo.db.manufacturing_orders.update_one(
             {'_id': self.data['_id']},
             {
-                '$push': {'work_orders': work_order_id},
+                '$inc': {'total_wo_count': 1, 'completed_wo_count': 1 if completed else 0},
                 '$set': {'updated_at': datetime.utcnow()}
             }
         )
+        bump_version('manufacturing_orders')
+    
+    @classmethod
+    def record_wo_transition(cls, mo_id, old_status, new_status):
+        """Move the completed work order counter for one WO status change.
+        
+        A planned MO moves to in_progress once any of its WOs starts or
+        completes. Returns the manufacturing order as it is after the update,
+        so callers get the fresh counters from the same round trip.
+        """
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        
+        if new_status in ('in_progress', 'completed') and old_status not in ('in_progress', 'completed'):
+            mongo.db.manufacturing_orders.update_one(
+                {'_id': mo_id, 'status': 'planned'},
+                {'$set': {'status': 'in_progress', 'updated_at': datetime.utcnow()}}
+            )
+        delta = (new_status == 'completed') - (old_status == 'completed')
+        mo_data = mongo.db.manufacturing_orders.find_one_and_update(
+            {'_id': mo_id},
+            {'$inc': {'completed_wo_count': delta}},
+            return_document=ReturnDocument.AFTER
+        )
+        bump_version('manufacturing_orders')
+        if mo_data and 'total_wo_count' not in mo_data:
+            mo_data = cls.sync_wo_counters(mo_id)
+        publish('manufacturing_orders', mo_data)
+        return cls(mo_data) if mo_data else None
+    
+    @classmethod
+    def sync_wo_counters(cls, mo_id):
+        """Recount work orders for an MO created before the counters existed"""
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        
+        counts = {'total_wo_count': 0, 'completed_wo_count': 0}
+        for row in mongo.db.work_orders.aggregate([
+            {'$match': {'mo_id': mo_id}},
+            {'$group': {'_id': {'$eq': ['$status', 'completed']}, 'count': {'$sum': 1}}}
+        ]):
+            counts['total_wo_count'] += row['count']
+            if row['_id']:
+                counts['completed_wo_count'] = row['count']
+        
+        mo_data = mongo.db.manufacturing_orders.find_one_and_update(
+            {'_id': mo_id},
+            {'$set': counts},
+            return_document=ReturnDocument.AFTER
+        )
+        bump_version('manufacturing_orders')
+        return mo_data
+    
+    @classmethod
+    def complete_if_all_work_orders_done(cls, mo_id):
+        """Flip the MO to completed once every linked work order is completed.
+        
+        The check and the status change are one conditional update, so only
+        one of several concurrent callers wins. Returns the completed MO, or
+        None if it was not (or was already) completed by this call.
+        """
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        
+        now = datetime.utcnow()
+        mo_data = mongo.db.manufacturing_orders.find_one_and_update(
+            {
+                '_id': mo_id,
+                'status': {'$nin': ['completed', 'cancelled']},
+                'total_wo_count': {'$gt': 0},
+                '$expr': {'$gte': ['$completed_wo_count', '$total_wo_count']}
+            },
+            {'$set': {'status': 'completed', 'actual_end_date': now, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if mo_data is None:
+            return None
+        bump_version('manufacturing_orders')
+        publish('manufacturing_orders', mo_data)
+        return cls(mo_data)
     
     def add_material_consumption(self, material_data):
         """Add material consumption record"""
         material_data['timestamp'] = datetime.utcnow()
-        mongo.db.manufacturing_orders.update_one(
-            {'_id': self.data['_id']},
-            {
-                '$push': {'material_consumptions': material_data},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
-        )
+        mo_history.append(self.data['_id'], 'material_consumptions', [material_data])
+        bump_version('mo_entry_buckets')
     
     def add_quality_check(self, quality_check_data):
         """Add quality check record"""
         quality_check_data['timestamp'] = datetime.utcnow()
-        mongo.db.manufacturing_orders.update_one(
-            {'_id': self.data['_id']},
-            {
-                '$push': {'quality_checks': quality_check_data},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
-        )
+        mo_history.append(self.data['_id'], 'quality_checks', [quality_check_data])
+        bump_version('mo_entry_buckets')
+    
+    @classmethod
+    def get_material_consumptions(cls, mo_id, limit=None, cursor=None):
+        """Material consumption records of an MO, newest first"""
+        return mo_history.page(mo_id, 'material_consumptions', limit=limit, cursor=cursor)
+    
+    @classmethod
+    def get_quality_checks(cls, mo_id, limit=None, cursor=None):
+        """Quality check records of an MO, newest first"""
+        return mo_history.page(mo_id, 'quality_checks', limit=limit, cursor=cursor)
     
     def to_dict(self):
         """Convert manufacturing order to dictionary"""
@@ -222,9 +401,8 @@ class ManufacturingOrder:
             'actual_end_date': self.data.get('actual_end_date'),
             'completed_quantity': self.data.get('completed_quantity', 0),
             'scrap_quantity': self.data.get('scrap_quantity', 0),
-            'work_orders': [str(wo_id) for wo_id in self.data.get('work_orders', [])],
-            'material_consumptions': self.data.get('material_consumptions', []),
-            'quality_checks': self.data.get('quality_checks', []),
+            'total_wo_count': self.data.get('total_wo_count', 0),
+            'completed_wo_count': self.data.get('completed_wo_count', 0),
             'created_at': self.data.get('created_at'),
             'updated_at': self.data.get('updated_at')
         }
@@ -232,12 +410,22 @@ class ManufacturingOrder:
     def delete(self):
         """Delete manufacturing order"""
         mongo.db.manufacturing_orders.delete_one({'_id': self.data['_id']})
+        mo_history.delete_parent(self.data['_id'])
+        bump_version('manufacturing_orders')
     
     @classmethod
     def count_manufacturing_orders(cls, filter_dict=None):
         """Count manufacturing orders matching filter"""
         return mongo.db.manufacturing_orders.count_documents(filter_dict or {})
     
+    @classmethod
+    def count_overdue(cls):
+        """Count open manufacturing orders whose deadline has passed"""
+        return mongo.db.manufacturing_orders.count_documents({
+            'status': {'$in': ['planned', 'in_progress']},
+            'deadline': {'$lt': datetime.utcnow()}
+        })
+    
     @classmethod
     def get_status_summary(cls):
         """Get summary of manufacturing orders by status"""
@@ -253,20 +441,19 @@ class ManufacturingOrder:
         return list(mongo.db.manufacturing_orders.aggregate(pipeline))
     
     @classmethod
-    def search_manufacturing_orders(cls, search_term, limit=None, skip=None):
+    def search_manufacturing_orders(cls, search_term, limit=None, cursor=None):
         """Search manufacturing orders by notes or reference"""
-        cursor = mongo.db.manufacturing_orders.find({
-            '$or': [
-                {'notes': {'$regex': search_term, '$options': 'i'}},
-                {'reference': {'$regex': search_term, '$options': 'i'}}
-            ]
-        }).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        mo_orders = []
-        for mo_data in cursor:
-            mo_orders.append(cls(mo_data).to_dict())
-        return mo_orders
\ No newline at end of file
+        return paginate(
+            mongo.db.manufacturing_orders,
+            {
+                '$or': [
+                    {'notes': {'$regex': search_term, '$options': 'i'}},
+                    {'reference': {'$regex': search_term, '$options': 'i'}}
+                ]
+            },
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda mo_data: cls(mo_data).to_dict()
+        )
\ No newline at end of file
@@ -0,0 +1,205 @@
+from database import mongo, bump_version
+from config import Config
+from models.production_stats_model import day_bucket
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+DAY = timedelta(days=1)
+
+
+def shift_length():
+    return timedelta(hours=Config.OEE_SHIFT_HOURS)
+
+
+def production_day(moment):
+    """Production day a moment belongs to; the day starts at OEE_DAY_START_HOUR"""
+    return day_bucket(moment - timedelta(hours=Config.OEE_DAY_START_HOUR))
+
+
+class WorkCenterOEE:
+    """MongoDB rollup of OEE inputs per work center, production day and shift.
+
+    Rows are keyed by (work_center, day, shift) and hold sums, so any window
+    is a cheap ``$group`` over the rollup instead of a scan of raw WOs:
+    run minutes (actual), ideal minutes (planned), units handled and good
+    units (by the MO's completed vs scrap quantity, zero for a WO that
+    failed its quality check). A completed WO counts in the shift it ended.
+    Days in ``work_center_oee_days`` with ``built_at`` are final and never
+    rebuilt on read; the current day carries ``refreshed_at`` instead.
+    """
+
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        self.collection = mongo.db.work_center_oee
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None, final_before=None):
+        """Recompute rollup rows for a range of production days.
+
+        One aggregation over completed WOs, joined to their MO, ``$merge``s
+        the whole range for every work center at once. Days that end before
+        ``final_before`` are recorded as final.
+        """
+        day_filter = {}
+        if start_date:
+            day_filter['$gte'] = day_bucket(start_date)
+        if end_date:
+            day_filter['$lt'] = day_bucket(end_date) + DAY
+        mongo.db.work_center_oee.delete_many({'day': day_filter} if day_filter else {})
+
+        day_start = timedelta(hours=Config.OEE_DAY_START_HOUR)
+        # Rows without a work center have no rollup key and belong to no center
+        wo_match = {'status': 'completed', 'end_time': {'$ne': None}, 'work_center': {'$nin': [None, '']}}
+        if day_filter:
+            wo_match['end_time'] = {op: bound + day_start for op, bound in day_filter.items()}
+        shifted = {'$subtract': ['$end_time', int(day_start.total_seconds() * 1000)]}
+        shift = {'$min': [
+            {'$floor': {'$divide': [
+                {'$add': [{'$hour': shifted}, {'$divide': [{'$minute': shifted}, 60]}]},
+                Config.OEE_SHIFT_HOURS
+            ]}},
+            Config.OEE_SHIFTS_PER_DAY - 1  # overtime past the last shift counts towards it
+        ]}
+        produced = {'$add': [{'$ifNull': ['$mo.completed_quantity', 0]}, {'$ifNull': ['$mo.scrap_quantity', 0]}]}
+
+        list(mongo.db.work_orders.aggregate([
+            {'$match': wo_match},
+            {'$lookup': {
+                'from': 'manufacturing_orders',
+                'localField': 'mo_id',
+                'foreignField': '_id',
+                'as': 'mo'
+            }},
+            {'$set': {'mo': {'$arrayElemAt': ['$mo', 0]}}},
+            {'$set': {
+                'units': {'$ifNull': ['$mo.quantity', 1]},
+                'good_ratio': {'$cond': [
+                    {'$eq': ['$quality_status', 'failed']},
+                    0,
+                    {'$cond': [{'$gt': [produced, 0]}, {'$divide': [{'$ifNull': ['$mo.completed_quantity', 0]}, produced]}, 1]}
+                ]}
+            }},
+            {'$group': {
+                '_id': {
+                    'work_center': '$work_center',
+                    'day': {'$dateFromParts': {
+                        'year': {'$year': shifted},
+                        'month': {'$month': shifted},
+                        'day': {'$dayOfMonth': shifted}
+                    }},
+                    'shift': shift
+                },
+                'wo_completed': {'$sum': 1},
+                'run_minutes': {'$sum': {'$ifNull': ['$actual_duration', 0]}},
+                'ideal_minutes': {'$sum': {'$ifNull': ['$planned_duration', 0]}},
+                'units': {'$sum': '$units'},
+                'good_units': {'$sum': {'$multiply': ['$units', '$good_ratio']}}
+            }},
+            {'$project': {
+                '_id': 0,
+                'work_center': '$_id.work_center',
+                'day': '$_id.day',
+                'shift': {'$toInt': '$_id.shift'},
+                'wo_completed': 1,
+                'run_minutes': 1,
+                'ideal_minutes': 1,
+                'units': 1,
+                'good_units': 1,
+                'updated_at': '$$NOW'
+            }},
+            {'$merge': {
+                'into': 'work_center_oee',
+                'on': ['work_center', 'day', 'shift'],
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }}
+        ]))
+
+        if final_before and start_date and end_date:
+            day = day_bucket(start_date)
+            while day <= day_bucket(end_date) and day + DAY <= final_before:
+                mongo.db.work_center_oee_days.update_one(
+                    {'day': day}, {'$set': {'built_at': datetime.utcnow()}}, upsert=True
+                )
+                day += DAY
+        bump_version('work_center_oee')
+
+    @staticmethod
+    def _claim_refresh(day, now):
+        """Whether this call gets to rebuild the open ``day`` now.
+
+        The claim is one guarded upsert on the unique ``day`` row, so across
+        all processes only one reader per OEE_REFRESH_SECONDS rebuilds it.
+        """
+        stale = now - timedelta(seconds=Config.OEE_REFRESH_SECONDS)
+        try:
+            mongo.db.work_center_oee_days.update_one(
+                {
+                    'day': day,
+                    'built_at': {'$exists': False},
+                    '$or': [{'refreshed_at': {'$exists': False}}, {'refreshed_at': {'$lte': stale}}]
+                },
+                {'$set': {'refreshed_at': now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Refreshed recently, or by a concurrent reader
+            return False
+        return True
+
+    @classmethod
+    def ensure(cls, start_day, end_day, now=None):
+        """Build whatever days of the window are not final yet.
+
+        Each contiguous run of missing days is rebuilt in one pass, so days
+        already final in between are never rewritten. The current production
+        day is still changing; its rows are rebuilt at most every
+        OEE_REFRESH_SECONDS and read as last built in between.
+        """
+        now = now or datetime.utcnow()
+        today = production_day(now)
+        final = {row['day'] for row in mongo.db.work_center_oee_days.find(
+            {'day': {'$gte': start_day, '$lte': end_day}, 'built_at': {'$exists': True}}, {'day': 1}
+        )}
+        last = min(end_day, today)
+        missing = [
+            start_day + offset * DAY for offset in range((last - start_day).days + 1)
+            if start_day + offset * DAY not in final
+        ]
+        if missing and missing[-1] == today and not cls._claim_refresh(today, now):
+            missing.pop()
+        runs = []
+        for day in missing:
+            if runs and day - runs[-1][1] == DAY:
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+        for run_start, run_end in runs:
+            cls.rebuild(run_start, run_end, final_before=today)
+
+    @classmethod
+    def totals(cls, work_centers, start_day, end_day, by=None):
+        """Summed rollup rows for ``work_centers`` (IDs or names as stored on
+        WOs), grouped by work center plus ``day``/``shift`` when requested"""
+        group_id = {'work_center': '$work_center'}
+        if by in ('day', 'shift'):
+            group_id['day'] = '$day'
+        if by == 'shift':
+            group_id['shift'] = '$shift'
+        match = {'day': {'$gte': start_day, '$lte': end_day}}
+        if work_centers is not None:
+            match['work_center'] = {'$in': list(work_centers)}
+        return mongo.db.work_center_oee.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': group_id,
+                'wo_completed': {'$sum': '$wo_completed'},
+                'run_minutes': {'$sum': '$run_minutes'},
+                'ideal_minutes': {'$sum': '$ideal_minutes'},
+                'units': {'$sum': '$units'},
+                'good_units': {'$sum': '$good_units'}
+            }},
+            {'$sort': {'_id': 1}}
+        ])
@@ -1,4 +1,5 @@
-from database import mongo, MongoDocument
+from database import mongo, MongoDocument, bump_version
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
 
@@ -25,6 +26,7 @@ class Product:
             'is_active': True
         }
         result = mongo.db.products.insert_one(product_data)
+        bump_version('products')
         product_data['_id'] = result.inserted_id
         return cls(product_data)
     
@@ -43,32 +45,30 @@ class Product:
         return cls(product_data) if product_data else None
     
     @classmethod
-    def find_by_type(cls, product_type, limit=None, skip=None):
+    def find_by_type(cls, product_type, limit=None, cursor=None):
         """Find products by type (raw/finished)"""
-        cursor = mongo.db.products.find({'type': product_type})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        products = []
-        for product_data in cursor:
-            products.append(cls(product_data).to_dict())
-        return products
+        return paginate(
+            mongo.db.products,
+            {'type': product_type},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda product_data: cls(product_data).to_dict()
+        )
     
     @classmethod
-    def find_all(cls, limit=None, skip=None):
+    def find_all(cls, limit=None, cursor=None):
         """Get all products with pagination"""
-        cursor = mongo.db.products.find({})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        products = []
-        for product_data in cursor:
-            products.append(cls(product_data).to_dict())
-        return products
+        return paginate(
+            mongo.db.products,
+            {},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda product_data: cls(product_data).to_dict()
+        )
     
     @classmethod
     def find_by_name_and_type(cls, name, product_type):
@@ -99,10 +99,12 @@ class Product:
             {'_id': self.data['_id']},
             {'$set': update_data}
         )
+        bump_version('products')
     
     def delete(self):
         """Delete product"""
         mongo.db.products.delete_one({'_id': self.data['_id']})
+        bump_version('products')
     
     @classmethod
     def count_products(cls, filter_dict=None):
@@ -110,17 +112,14 @@ class Product:
         return mongo.db.products.count_documents(filter_dict or {})
     
     @classmethod
-    def search_products(cls, search_term, limit=None, skip=None):
+    def search_products(cls, search_term, limit=None, cursor=None):
         """Search products by name"""
-        cursor = mongo.db.products.find({
-            'name': {'$regex': search_term, '$options': 'i'}
-        })
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        products = []
-        for product_data in cursor:
-            products.append(cls(product_data).to_dict())
-        return products
\ No newline at end of file
+        return paginate(
+            mongo.db.products,
+            {'name': {'$regex': search_term, '$options': 'i'}},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda product_data: cls(product_data).to_dict()
+        )
\ No newline at end of file
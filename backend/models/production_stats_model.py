@@ -0,0 +1,195 @@
+from database import mongo, bump_version
+from datetime import datetime, timedelta
+
+# Rollup keys for rows without a real work center. $merge cannot match on
+# null fields, so MO completions and WOs without a center use these instead
+PLANT_WIDE = '__mo__'
+NO_WORK_CENTER = '__none__'
+
+def day_bucket(moment):
+    """Truncate a datetime to the start of its (UTC) day"""
+    return datetime(moment.year, moment.month, moment.day)
+
+class DailyProductionStats:
+    """MongoDB rollup of production KPIs per day and work center.
+
+    Rows are keyed by (day, work_center). MO completions are plant-wide and
+    land on the ``PLANT_WIDE`` row; WOs without a work center on the
+    ``NO_WORK_CENTER`` row.
+    """
+
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        self.collection = mongo.db.daily_production_stats
+
+    @classmethod
+    def _increment(cls, day, work_center, counters):
+        mongo.db.daily_production_stats.update_one(
+            {'day': day, 'work_center': work_center},
+            {
+                '$inc': counters,
+                '$set': {'updated_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+        bump_version('daily_production_stats')
+
+    @classmethod
+    def record_mo_completion(cls, mo_data):
+        """Add a completed manufacturing order to its day's rollup"""
+        completed_at = mo_data.get('actual_end_date') or datetime.utcnow()
+        cls._increment(day_bucket(completed_at), PLANT_WIDE, {
+            'mo_completed': 1,
+            'quantity_completed': mo_data.get('quantity', 0)
+        })
+
+    @classmethod
+    def record_wo_completion(cls, wo_data):
+        """Add a completed work order to its day and work center rollup"""
+        completed_at = wo_data.get('end_time') or datetime.utcnow()
+        planned = wo_data.get('planned_duration') or 0
+        actual = wo_data.get('actual_duration') or 0
+        counters = {
+            'wo_completed': 1,
+            'planned_minutes': planned,
+            'actual_minutes': actual
+        }
+        if planned:
+            counters['utilization_ratio_sum'] = actual / planned
+        cls._increment(day_bucket(completed_at), wo_data.get('work_center') or NO_WORK_CENTER, counters)
+
+    @classmethod
+    def summarize(cls, start_date, end_date):
+        """Sum the rollup rows between two dates into one KPI document"""
+        pipeline = [
+            {'$match': {'day': {'$gte': day_bucket(start_date), '$lte': end_date}}},
+            {
+                '$group': {
+                    '_id': None,
+                    'mo_completed': {'$sum': '$mo_completed'},
+                    'quantity_completed': {'$sum': '$quantity_completed'},
+                    'wo_completed': {'$sum': '$wo_completed'},
+                    'planned_minutes': {'$sum': '$planned_minutes'},
+                    'actual_minutes': {'$sum': '$actual_minutes'},
+                    'utilization_ratio_sum': {'$sum': '$utilization_ratio_sum'}
+                }
+            }
+        ]
+        result = list(mongo.db.daily_production_stats.aggregate(pipeline))
+        return result[0] if result else {
+            'mo_completed': 0,
+            'quantity_completed': 0,
+            'wo_completed': 0,
+            'planned_minutes': 0,
+            'actual_minutes': 0,
+            'utilization_ratio_sum': 0
+        }
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """Recompute the rollup rows from the MO and WO history.
+
+        Rows in the window are dropped and regenerated with two server-side
+        aggregations that ``$merge`` straight into the rollup collection.
+        """
+        day_filter = {}
+        if start_date:
+            day_filter['$gte'] = day_bucket(start_date)
+        if end_date:
+            day_filter['$lt'] = day_bucket(end_date) + timedelta(days=1)
+
+        mongo.db.daily_production_stats.delete_many({'day': day_filter} if day_filter else {})
+
+        def day_of(field):
+            return {'$dateFromParts': {
+                'year': {'$year': field},
+                'month': {'$month': field},
+                'day': {'$dayOfMonth': field}
+            }}
+
+        merge = {
+            '$merge': {
+                'into': 'daily_production_stats',
+                'on': ['day', 'work_center'],
+                'whenMatched': 'merge',
+                'whenNotMatched': 'insert'
+            }
+        }
+
+        mo_match = {'status': 'completed', 'actual_end_date': {'$ne': None}}
+        if day_filter:
+            mo_match['actual_end_date'] = dict(day_filter)
+        list(mongo.db.manufacturing_orders.aggregate([
+            {'$match': mo_match},
+            {
+                '$group': {
+                    '_id': day_of('$actual_end_date'),
+                    'mo_completed': {'$sum': 1},
+                    'quantity_completed': {'$sum': '$quantity'}
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    'day': '$_id',
+                    'work_center': {'$literal': PLANT_WIDE},
+                    'mo_completed': 1,
+                    'quantity_completed': 1,
+                    'updated_at': '$$NOW'
+                }
+            },
+            merge
+        ]))
+
+        wo_match = {'status': 'completed', 'end_time': {'$ne': None}}
+        if day_filter:
+            wo_match['end_time'] = dict(day_filter)
+        list(mongo.db.work_orders.aggregate([
+            {'$match': wo_match},
+            {
+                '$group': {
+                    '_id': {'day': day_of('$end_time'), 'work_center': {'$cond': [
+                        {'$eq': [{'$ifNull': ['$work_center', '']}, '']}, NO_WORK_CENTER, '$work_center'
+                    ]}},
+                    'wo_completed': {'$sum': 1},
+                    'planned_minutes': {'$sum': {'$ifNull': ['$planned_duration', 0]}},
+                    'actual_minutes': {'$sum': {'$ifNull': ['$actual_duration', 0]}},
+                    'utilization_ratio_sum': {'$sum': {'$cond': [
+                        {'$gt': ['$planned_duration', 0]},
+                        {'$divide': [{'$ifNull': ['$actual_duration', 0]}, '$planned_duration']},
+                        0
+                    ]}}
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    'day': '$_id.day',
+                    'work_center': '$_id.work_center',
+                    'wo_completed': 1,
+                    'planned_minutes': 1,
+                    'actual_minutes': 1,
+                    'utilization_ratio_sum': 1,
+                    'updated_at': '$$NOW'
+                }
+            },
+            merge
+        ]))
+        bump_version('daily_production_stats')
+
+    def to_dict(self):
+        """Convert rollup row to dictionary"""
+        if not self.data:
+            return None
+        return {
+            'day': self.data.get('day'),
+            'work_center': None if self.data.get('work_center') in (PLANT_WIDE, NO_WORK_CENTER) else self.data.get('work_center'),
+            'mo_completed': self.data.get('mo_completed', 0),
+            'quantity_completed': self.data.get('quantity_completed', 0),
+            'wo_completed': self.data.get('wo_completed', 0),
+            'planned_minutes': self.data.get('planned_minutes', 0),
+            'actual_minutes': self.data.get('actual_minutes', 0),
+            'utilization_ratio_sum': self.data.get('utilization_ratio_sum', 0)
+        }
@@ -0,0 +1,148 @@
+from database import mongo
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import gridfs
+from gridfs.errors import NoFile
+
+class ReportJob:
+    """MongoDB model for asynchronous report jobs.
+
+    Jobs are unique per parameter hash, so identical requests submitted while
+    a job is queued, running or still fresh share that one job and its file.
+    Finished files are kept in the ``report_files`` GridFS bucket.
+    """
+
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        self.collection = mongo.db.report_jobs
+
+    @staticmethod
+    def files():
+        """GridFS bucket holding rendered report files"""
+        return gridfs.GridFSBucket(mongo.db, bucket_name='report_files')
+
+    @classmethod
+    def submit(cls, param_hash, report_type, format, params, user, ttl_seconds):
+        """Return the live job for ``param_hash``, creating it if needed.
+
+        Returns (job, created). A failed or expired job with the same hash is
+        discarded and replaced by a fresh one.
+        """
+        existing = mongo.db.report_jobs.find_one({'param_hash': param_hash})
+        if existing:
+            expired = existing.get('expires_at') and existing['expires_at'] <= datetime.utcnow()
+            if existing['status'] != 'failed' and not expired:
+                return cls(existing), False
+            cls(existing).delete()
+
+        now = datetime.utcnow()
+        job_data = {
+            'param_hash': param_hash,
+            'report_type': report_type,
+            'format': format,
+            'params': params,
+            'user_id': user.get('id'),
+            'role': user.get('role'),
+            'status': 'queued',  # queued, running, done, failed
+            'file_id': None,
+            'filename': None,
+            'mimetype': None,
+            'error': None,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'expires_at': now + timedelta(seconds=ttl_seconds)
+        }
+        try:
+            result = mongo.db.report_jobs.insert_one(job_data)
+        except DuplicateKeyError:
+            # Someone submitted the same report a moment ago; share their job
+            return cls(mongo.db.report_jobs.find_one({'param_hash': param_hash})), False
+        job_data['_id'] = result.inserted_id
+        return cls(job_data), True
+
+    @classmethod
+    def find_by_id(cls, job_id):
+        """Find report job by ID"""
+        if isinstance(job_id, str):
+            job_id = ObjectId(job_id)
+        job_data = mongo.db.report_jobs.find_one({'_id': job_id})
+        return cls(job_data) if job_data else None
+
+    @classmethod
+    def claim(cls, job_id=None):
+        """Atomically move a queued job to running and return it.
+
+        Claims ``job_id`` if given, otherwise the oldest queued job. Returns
+        None when there is nothing to claim.
+        """
+        query = {'status': 'queued'}
+        if job_id is not None:
+            query['_id'] = ObjectId(job_id) if isinstance(job_id, str) else job_id
+        job_data = mongo.db.report_jobs.find_one_and_update(
+            query,
+            {'$set': {'status': 'running', 'started_at': datetime.utcnow()}},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        return cls(job_data) if job_data else None
+
+    def complete(self, file_obj, filename, mimetype):
+        """Store the rendered file in GridFS and mark the job done"""
+        file_id = self.files().upload_from_stream(
+            filename,
+            file_obj,
+            metadata={'job_id': self.data['_id'], 'mimetype': mimetype}
+        )
+        mongo.db.report_jobs.update_one(
+            {'_id': self.data['_id']},
+            {'$set': {
+                'status': 'done',
+                'file_id': file_id,
+                'filename': filename,
+                'mimetype': mimetype,
+                'finished_at': datetime.utcnow()
+            }}
+        )
+
+    def fail(self, error):
+        """Mark the job failed so the next identical request retries it"""
+        mongo.db.report_jobs.update_one(
+            {'_id': self.data['_id']},
+            {'$set': {'status': 'failed', 'error': error, 'finished_at': datetime.utcnow()}}
+        )
+
+    def open_file(self):
+        """Open the finished report file for streaming"""
+        return self.files().open_download_stream(self.data['file_id'])
+
+    def to_dict(self):
+        """Convert report job to dictionary"""
+        if not self.data:
+            return None
+        return {
+            'id': str(self.data.get('_id')),
+            'report_type': self.data.get('report_type'),
+            'format': self.data.get('format'),
+            'params': self.data.get('params', {}),
+            'status': self.data.get('status'),
+            'filename': self.data.get('filename'),
+            'error': self.data.get('error'),
+            'created_at': self.data.get('created_at'),
+            'started_at': self.data.get('started_at'),
+            'finished_at': self.data.get('finished_at'),
+            'expires_at': self.data.get('expires_at')
+        }
+
+    def delete(self):
+        """Delete report job and its stored file"""
+        if self.data.get('file_id'):
+            try:
+                self.files().delete(self.data['file_id'])
+            except NoFile:
+                pass
+        mongo.db.report_jobs.delete_one({'_id': self.data['_id']})
@@ -0,0 +1,233 @@
+from database import mongo, run_in_transaction, bump_version
+from models.inventory_model import InsufficientStockError, AVAILABLE_EXPR
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+
+class StockReservation:
+    """MongoDB ledger of component stock held for manufacturing orders.
+
+    Each reservation holds ``quantity`` of one product on one inventory row
+    for one MO, and the row's ``reserved_quantity`` carries the running total
+    of its active reservations. A requirement no single row can cover is
+    split across rows, most free stock first, one reservation per row. Reserving only succeeds while the row's
+    available stock covers it, so two MOs can never hold the same units.
+    """
+
+    def __init__(self, data=None):
+        if data is None:
+            data = {}
+        self.data = data
+        self.collection = mongo.db.stock_reservations
+
+    @staticmethod
+    def _pick_rows(requirements, session=None):
+        """Inventory rows each product can be reserved on, most free stock first"""
+        names = {
+            product['_id']: product['name']
+            for product in mongo.db.products.find({'_id': {'$in': list(requirements)}}, {'name': 1}, session=session)
+        }
+        product_by_name = {name: product_id for product_id, name in names.items()}
+        rows = {}
+        for row in mongo.db.inventory.find(
+            {'$or': [{'product_id': {'$in': list(requirements)}}, {'item_name': {'$in': list(product_by_name)}}]},
+            {'product_id': 1, 'item_name': 1, 'stock_quantity': 1, 'reserved_quantity': 1},
+            session=session
+        ):
+            product_id = row.get('product_id') if row.get('product_id') in requirements else product_by_name.get(row.get('item_name'))
+            if product_id is None:
+                continue
+            row['available'] = row.get('stock_quantity', 0) - row.get('reserved_quantity', 0)
+            rows.setdefault(product_id, []).append(row)
+        for candidates in rows.values():
+            candidates.sort(key=lambda row: row['available'], reverse=True)
+        return rows
+
+    @classmethod
+    def reserve_for_mo(cls, mo_id, requirements, allow_shortage=False):
+        """Reserve component stock for an MO in one atomic step.
+
+        ``requirements`` maps product ID to quantity. Every row update is
+        guarded on available stock; if any component falls short the whole
+        reservation is rolled back and ``InsufficientStockError`` raised,
+        unless ``allow_shortage`` is set, in which case whatever is free is
+        reserved. Returns (reservations, shortages by product ID).
+        """
+        result = run_in_transaction(lambda session: cls.reserve(mo_id, requirements, allow_shortage, session=session))
+        bump_version('inventory')
+        return result
+
+    @classmethod
+    def reserve(cls, mo_id, requirements, allow_shortage=False, session=None):
+        """``reserve_for_mo`` inside the caller's transaction.
+
+        The caller bumps the ``inventory`` data version after commit.
+        """
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        rows = cls._pick_rows(requirements, session=session)
+
+        planned = []
+        shortages = {}
+        for product_id, required in requirements.items():
+            remaining = required
+            for row in rows.get(product_id, []):
+                quantity = min(remaining, max(row['available'], 0))
+                if quantity <= 0:
+                    break
+                planned.append((product_id, row['_id'], quantity))
+                remaining -= quantity
+            if remaining > 0:
+                shortages[product_id] = remaining
+        if shortages and not allow_shortage:
+            raise InsufficientStockError('Insufficient stock for components: ' + ', '.join(str(p) for p in shortages))
+
+        now = datetime.utcnow()
+        guarded_updates = [
+            (
+                {'_id': row_id, '$expr': {'$gte': [AVAILABLE_EXPR, quantity]}},
+                {'$inc': {'reserved_quantity': quantity}, '$set': {'updated_at': now}}
+            )
+            for _, row_id, quantity in planned
+        ]
+        reservations = [
+            {
+                'mo_id': mo_id,
+                'product_id': product_id,
+                'inventory_id': row_id,
+                'quantity': quantity,
+                'reserved_quantity': quantity,
+                'status': 'active',  # active, released, consumed
+                'created_at': now,
+                'updated_at': now
+            }
+            for product_id, row_id, quantity in planned
+        ]
+        if not guarded_updates:
+            return [], shortages
+
+        if session is not None:
+            result = mongo.db.inventory.bulk_write(
+                [UpdateOne(selector, update) for selector, update in guarded_updates],
+                ordered=False,
+                session=session
+            )
+            if result.matched_count < len(guarded_updates):
+                # Someone reserved the same stock first; abort the transaction
+                raise InsufficientStockError('Stock was reserved concurrently')
+        else:
+            # No transactions: apply one by one and undo on the first failure
+            for index, (selector, update) in enumerate(guarded_updates):
+                if mongo.db.inventory.update_one(selector, update).matched_count == 0:
+                    if index:
+                        mongo.db.inventory.bulk_write([
+                            UpdateOne({'_id': row_id}, {'$inc': {'reserved_quantity': -quantity}})
+                            for _, row_id, quantity in planned[:index]
+                        ], ordered=False)
+                    raise InsufficientStockError('Stock was reserved concurrently')
+        mongo.db.stock_reservations.insert_many(reservations, session=session)
+        return [cls(reservation) for reservation in reservations], shortages
+
+    @classmethod
+    def release_for_mo(cls, mo_id, status='released'):
+        """Close every active reservation of an MO and free its stock.
+
+        Reservations are claimed with a per-call token first, so a cancel
+        racing a completion can never return the same stock twice.
+        """
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        token = ObjectId()
+        now = datetime.utcnow()
+
+        def apply(session):
+            # Closing the reservations and freeing their stock commit together,
+            # so a failure in between cannot leave stock held by nothing
+            mongo.db.stock_reservations.update_many(
+                {'mo_id': mo_id, 'status': 'active'},
+                {'$set': {'status': status, 'release_token': token, 'updated_at': now}},
+                session=session
+            )
+            claimed = list(mongo.db.stock_reservations.find(
+                {'release_token': token}, {'inventory_id': 1, 'quantity': 1}, session=session
+            ))
+            releases = [
+                UpdateOne({'_id': reservation['inventory_id']},
+                          {'$inc': {'reserved_quantity': -reservation['quantity']}, '$set': {'updated_at': now}})
+                for reservation in claimed if reservation['quantity']
+            ]
+            if releases:
+                mongo.db.inventory.bulk_write(releases, ordered=False, session=session)
+            return len(claimed), bool(releases)
+
+        released, freed = run_in_transaction(apply)
+        if freed:
+            bump_version('inventory')
+        return released
+
+    @classmethod
+    def consume(cls, mo_id, quantities, session=None):
+        """Draw consumed quantities down from an MO's active reservations.
+
+        Called when work orders consume materials, so the stock they take
+        off the shelf stops counting as reserved as well. Returns the
+        quantity drawn per inventory row, which is where the stock should
+        be taken from, and what is left of each product beyond its
+        reservations.
+        """
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        now = datetime.utcnow()
+        remaining = dict(quantities)
+        drawn_by_row = {}
+        reservation_updates = []
+        inventory_updates = []
+        for reservation in mongo.db.stock_reservations.find(
+            {'mo_id': mo_id, 'status': 'active', 'product_id': {'$in': list(quantities)}},
+            {'product_id': 1, 'inventory_id': 1, 'quantity': 1},
+            session=session
+        ).sort('_id', 1):
+            drawn = min(reservation['quantity'], remaining[reservation['product_id']])
+            if drawn <= 0:
+                continue
+            remaining[reservation['product_id']] -= drawn
+            drawn_by_row[reservation['inventory_id']] = drawn_by_row.get(reservation['inventory_id'], 0) + drawn
+            reservation_updates.append(UpdateOne(
+                {'_id': reservation['_id'], 'status': 'active', 'quantity': {'$gte': drawn}},
+                {'$inc': {'quantity': -drawn}, '$set': {'updated_at': now}}
+            ))
+            inventory_updates.append(UpdateOne(
+                {'_id': reservation['inventory_id']},
+                {'$inc': {'reserved_quantity': -drawn}, '$set': {'updated_at': now}}
+            ))
+        if reservation_updates:
+            mongo.db.stock_reservations.bulk_write(reservation_updates, ordered=False, session=session)
+            mongo.db.inventory.bulk_write(inventory_updates, ordered=False, session=session)
+        return drawn_by_row, remaining
+
+    @classmethod
+    def find_by_mo(cls, mo_id, status=None):
+        """Reservations of an MO, optionally only those in ``status``"""
+        if isinstance(mo_id, str):
+            mo_id = ObjectId(mo_id)
+        query = {'mo_id': mo_id}
+        if status:
+            query['status'] = status
+        return [cls(reservation).to_dict() for reservation in mongo.db.stock_reservations.find(query)]
+
+    def to_dict(self):
+        """Convert reservation to dictionary"""
+        if not self.data:
+            return None
+        return {
+            'id': str(self.data.get('_id')),
+            'mo_id': str(self.data.get('mo_id')),
+            'product_id': str(self.data.get('product_id')),
+            'inventory_id': str(self.data.get('inventory_id')),
+            'quantity': self.data.get('quantity', 0),
+            'reserved_quantity': self.data.get('reserved_quantity', 0),
+            'status': self.data.get('status'),
+            'created_at': self.data.get('created_at'),
+            'updated_at': self.data.get('updated_at')
+        }
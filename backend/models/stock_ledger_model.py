@@ -1,6 +1,15 @@
-from database import mongo
+from database import mongo, bump_version
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+def month_bucket(moment):
+    """Truncate a datetime to the first instant of its (UTC) month"""
+    return datetime(moment.year, moment.month, 1)
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
 
 class StockLedger:
     """MongoDB Stock Ledger model for tracking inventory movements"""
@@ -17,27 +26,310 @@ class StockLedger:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
         
-        # Calculate balance if not provided
-        if balance is None:
-            # Get last balance for this product
-            last_entry = cls.get_last_entry(product_id)
-            if last_entry:
-                balance = last_entry['balance'] + stock_in - stock_out
-            else:
-                balance = stock_in - stock_out
+        # Move the running balance and sequence in one atomic step
+        counter = cls.post_movement(product_id, stock_in - stock_out, balance=balance)
         
+        now = datetime.utcnow()
         ledger_data = {
             'product_id': product_id,
             'reference': reference,  # e.g., 'MO-123' or 'WO-456'
             'stock_in': stock_in,
             'stock_out': stock_out,
-            'balance': balance,
-            'created_at': datetime.utcnow()
+            'balance': counter['balance'],
+            'seq': counter['seq'],
+            'created_at': now
         }
         result = mongo.db.stock_ledger.insert_one(ledger_data)
+        cls.record_monthly_usage([ledger_data], now)
+        bump_version('stock_ledger')
         ledger_data['_id'] = result.inserted_id
         return cls(ledger_data)
     
+    @classmethod
+    def create_many(cls, entries, session=None):
+        """Post several ledger entries in one batch.
+        
+        ``entries`` is a list of dicts with ``product_id``, ``reference`` and
+        optional ``stock_in``/``stock_out``. Each product's balance counter is
+        moved by the batch total with one ``find_one_and_update`` (as in
+        ``post_movement``), so the range of sequence numbers and balances it
+        returns belongs to this batch alone even under concurrent postings.
+        The ledger rows are written with one ``insert_many``. Pass a session to
+        make the counters and rows commit together. With a session the
+        ``stock_ledger`` data version is left to the caller to bump once the
+        transaction commits.
+        """
+        if not entries:
+            return []
+        
+        movements = {}
+        for entry in entries:
+            product_id = entry['product_id']
+            if isinstance(product_id, str):
+                product_id = ObjectId(product_id)
+            entry['product_id'] = product_id
+            delta = entry.get('stock_in', 0) - entry.get('stock_out', 0)
+            total, count = movements.get(product_id, (0, 0))
+            movements[product_id] = (total + delta, count + 1)
+        
+        now = datetime.utcnow()
+        counters = {
+            product_id: cls.post_movement(product_id, total, count=count, session=session)
+            for product_id, (total, count) in movements.items()
+        }
+        
+        # Walk each product's entries forward from the balance before this batch
+        running = {
+            product_id: (counters[product_id]['balance'] - total, counters[product_id]['seq'] - count)
+            for product_id, (total, count) in movements.items()
+        }
+        ledger_rows = []
+        for entry in entries:
+            stock_in = entry.get('stock_in', 0)
+            stock_out = entry.get('stock_out', 0)
+            balance, seq = running[entry['product_id']]
+            balance, seq = balance + stock_in - stock_out, seq + 1
+            running[entry['product_id']] = (balance, seq)
+            ledger_rows.append({
+                'product_id': entry['product_id'],
+                'reference': entry['reference'],
+                'stock_in': stock_in,
+                'stock_out': stock_out,
+                'balance': balance,
+                'seq': seq,
+                'created_at': now
+            })
+        
+        mongo.db.stock_ledger.insert_many(ledger_rows, session=session)
+        cls.record_monthly_usage(ledger_rows, now, session=session)
+        if session is None:
+            bump_version('stock_ledger')
+        return [cls(ledger_data) for ledger_data in ledger_rows]
+    
+    @classmethod
+    def record_monthly_usage(cls, ledger_rows, moment, session=None):
+        """Add freshly posted rows to the monthly per-product usage rollup"""
+        totals = {}
+        for row in ledger_rows:
+            stock_in, stock_out, count = totals.get(row['product_id'], (0, 0, 0))
+            totals[row['product_id']] = (stock_in + row['stock_in'], stock_out + row['stock_out'], count + 1)
+        
+        month = month_bucket(moment)
+        mongo.db.monthly_stock_usage.bulk_write([
+            UpdateOne(
+                {'month': month, 'product_id': product_id},
+                {'$inc': {'stock_in': stock_in, 'stock_out': stock_out, 'entries_count': count}},
+                upsert=True
+            )
+            for product_id, (stock_in, stock_out, count) in totals.items()
+        ], ordered=False, session=session)
+    
+    @classmethod
+    def rebuild_monthly_usage(cls, start_date=None, end_date=None):
+        """Recompute the monthly usage rollup from the ledger with ``$merge``"""
+        month_filter = {}
+        if start_date:
+            month_filter['$gte'] = month_bucket(start_date)
+        if end_date:
+            month_filter['$lt'] = next_month(month_bucket(end_date))
+        
+        mongo.db.monthly_stock_usage.delete_many({'month': month_filter} if month_filter else {})
+        list(mongo.db.stock_ledger.aggregate([
+            {'$match': {'created_at': month_filter} if month_filter else {}},
+            {
+                '$group': {
+                    '_id': {
+                        'month': {'$dateFromParts': {'year': {'$year': '$created_at'}, 'month': {'$month': '$created_at'}}},
+                        'product_id': '$product_id'
+                    },
+                    'stock_in': {'$sum': '$stock_in'},
+                    'stock_out': {'$sum': '$stock_out'},
+                    'entries_count': {'$sum': 1}
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    'month': '$_id.month',
+                    'product_id': '$_id.product_id',
+                    'stock_in': 1,
+                    'stock_out': 1,
+                    'entries_count': 1
+                }
+            },
+            {'$merge': {'into': 'monthly_stock_usage', 'on': ['month', 'product_id'], 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ]))
+        bump_version('stock_ledger')
+    
+    @classmethod
+    def get_usage_by_product(cls, start_date=None, end_date=None, use_rollup=False, batch_size=500):
+        """Stream stock usage per product between two datetimes (inclusive).
+        
+        The ledger is matched on ``created_at`` (served by the
+        ``(created_at, product_id)`` index), grouped by product and joined to
+        product names with ``$lookup``, all in one pipeline whose cursor is
+        returned unconsumed. With ``use_rollup`` the whole calendar months
+        inside the range are read from ``monthly_stock_usage`` instead, and
+        only the partial months at either end touch raw postings, so long
+        ranges cost per product rather than per posting.
+        """
+        def date_range(gte=None, lt=None, lte=None):
+            bounds = {op: value for op, value in (('$gte', gte), ('$lt', lt), ('$lte', lte)) if value}
+            return bounds or None
+        
+        month_filter = None
+        ledger_ranges = [date_range(gte=start_date, lte=end_date)]
+        if use_rollup:
+            first_month = month_bucket(start_date) if start_date else None
+            if first_month and first_month < start_date:
+                first_month = next_month(first_month)
+            last_month = month_bucket(end_date) if end_date else None
+            if first_month is None or last_month is None or first_month < last_month:
+                # Whole months [first_month, last_month) come from the rollup,
+                # the partial months on either side from the raw postings
+                month_filter = date_range(gte=first_month, lt=last_month) or {}
+                ledger_ranges = []
+                if first_month and start_date < first_month:
+                    ledger_ranges.append(date_range(gte=start_date, lt=first_month))
+                if last_month:
+                    ledger_ranges.append(date_range(gte=last_month, lte=end_date))
+        
+        ledger_pipeline = None
+        if ledger_ranges:
+            ledger_match = [{'created_at': bounds} if bounds else {} for bounds in ledger_ranges]
+            ledger_pipeline = [
+                {'$match': ledger_match[0] if len(ledger_match) == 1 else {'$or': ledger_match}},
+                {'$project': {'_id': 0, 'product_id': 1, 'stock_in': 1, 'stock_out': 1}}
+            ]
+        
+        if month_filter is not None:
+            collection = mongo.db.monthly_stock_usage
+            pipeline = [
+                {'$match': {'month': month_filter} if month_filter else {}},
+                {'$project': {'_id': 0, 'product_id': 1, 'stock_in': 1, 'stock_out': 1}}
+            ]
+            if ledger_pipeline:
+                pipeline.append({'$unionWith': {'coll': 'stock_ledger', 'pipeline': ledger_pipeline}})
+        else:
+            collection = mongo.db.stock_ledger
+            pipeline = ledger_pipeline
+        
+        pipeline += [
+            {
+                '$group': {
+                    '_id': '$product_id',
+                    'stock_in': {'$sum': '$stock_in'},
+                    'usage': {'$sum': '$stock_out'}
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'products',
+                    'localField': '_id',
+                    'foreignField': '_id',
+                    'as': 'product'
+                }
+            },
+            {
+                '$project': {
+                    '_id': 0,
+                    'product_id': {'$toString': '$_id'},
+                    'product': {'$ifNull': [{'$first': '$product.name'}, {'$toString': '$_id'}]},
+                    'usage': 1,
+                    'stock_in': 1
+                }
+            },
+            {'$sort': {'usage': -1, 'product': 1}}
+        ]
+        return collection.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True)
+    
+    @classmethod
+    def post_movement(cls, product_id, delta, balance=None, count=1, session=None):
+        """Apply a stock movement to the per-product balance counter.
+        
+        Returns the counter document after the update, so the new balance and
+        sequence number come back from the same round trip. Passing ``balance``
+        resets the running balance to that value instead of incrementing it.
+        ``count`` is the number of ledger rows the movement stands for.
+        """
+        if isinstance(product_id, str):
+            product_id = ObjectId(product_id)
+        
+        update = {
+            '$inc': {'seq': count},
+            '$set': {'updated_at': datetime.utcnow()}
+        }
+        if balance is None:
+            update['$inc']['balance'] = delta
+        else:
+            update['$set']['balance'] = balance
+        
+        counter = mongo.db.stock_balances.find_one_and_update(
+            {'_id': product_id},
+            update,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if counter is None:
+            # First movement since the counters were introduced
+            cls.seed_balance(product_id, session=session)
+            counter = mongo.db.stock_balances.find_one_and_update(
+                {'_id': product_id},
+                update,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+        return counter
+    
+    @classmethod
+    def seed_balance(cls, product_id, session=None):
+        """Create the balance counter of a product from its ledger history.
+        
+        Products posted before the counters existed carry on from their last
+        ledger entry rather than restarting at zero. ``$setOnInsert`` leaves a
+        counter created concurrently by another posting untouched.
+        """
+        last_entry = mongo.db.stock_ledger.find_one(
+            {'product_id': product_id},
+            sort=[('seq', -1), ('created_at', -1), ('_id', -1)],
+            session=session
+        )
+        balance = seq = 0
+        if last_entry:
+            balance = last_entry.get('balance', 0)
+            seq = max(last_entry.get('seq') or 0,
+                      mongo.db.stock_ledger.count_documents({'product_id': product_id}, session=session))
+        mongo.db.stock_balances.update_one(
+            {'_id': product_id},
+            {'$setOnInsert': {'balance': balance, 'seq': seq, 'updated_at': datetime.utcnow()}},
+            upsert=True,
+            session=session
+        )
+    
+    @classmethod
+    def rebuild_balances(cls):
+        """Recompute the per-product balance counters from the ledger history"""
+        pipeline = [
+            {'$sort': {'product_id': 1, 'created_at': 1, '_id': 1}},
+            {
+                '$group': {
+                    '_id': '$product_id',
+                    'balance': {'$last': '$balance'},
+                    'seq': {'$max': {'$ifNull': ['$seq', 0]}},
+                    'entries_count': {'$sum': 1}
+                }
+            },
+            {
+                '$project': {
+                    'balance': 1,
+                    'seq': {'$max': ['$seq', '$entries_count']},
+                    'updated_at': '$$NOW'
+                }
+            },
+            {'$merge': {'into': 'stock_balances', 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ]
+        list(mongo.db.stock_ledger.aggregate(pipeline))
+    
     @classmethod
     def find_by_id(cls, ledger_id):
         """Find stock ledger entry by ID"""
@@ -47,35 +339,33 @@ class StockLedger:
         return cls(ledger_data) if ledger_data else None
     
     @classmethod
-    def find_by_product_id(cls, product_id, limit=None, skip=None):
+    def find_by_product_id(cls, product_id, limit=None, cursor=None):
         """Find all ledger entries for a specific product"""
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
         
-        cursor = mongo.db.stock_ledger.find({'product_id': product_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        ledger_entries = []
-        for ledger_data in cursor:
-            ledger_entries.append(cls(ledger_data).to_dict())
-        return ledger_entries
+        return paginate(
+            mongo.db.stock_ledger,
+            {'product_id': product_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda ledger_data: cls(ledger_data).to_dict()
+        )
     
     @classmethod
-    def find_by_reference(cls, reference, limit=None, skip=None):
+    def find_by_reference(cls, reference, limit=None, cursor=None):
         """Find ledger entries by reference (e.g., 'MO-123')"""
-        cursor = mongo.db.stock_ledger.find({'reference': reference}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        ledger_entries = []
-        for ledger_data in cursor:
-            ledger_entries.append(cls(ledger_data).to_dict())
-        return ledger_entries
+        return paginate(
+            mongo.db.stock_ledger,
+            {'reference': reference},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda ledger_data: cls(ledger_data).to_dict()
+        )
     
     @classmethod
     def get_last_entry(cls, product_id):
@@ -85,29 +375,34 @@ class StockLedger:
         
         ledger_data = mongo.db.stock_ledger.find_one(
             {'product_id': product_id},
-            sort=[('created_at', -1)]
+            sort=[('seq', -1), ('created_at', -1)]
         )
         return cls(ledger_data).to_dict() if ledger_data else None
     
     @classmethod
     def get_current_balance(cls, product_id):
         """Get current balance for a product"""
+        if isinstance(product_id, str):
+            product_id = ObjectId(product_id)
+        
+        counter = mongo.db.stock_balances.find_one({'_id': product_id})
+        if counter:
+            return counter.get('balance', 0)
         last_entry = cls.get_last_entry(product_id)
         return last_entry['balance'] if last_entry else 0
     
     @classmethod
-    def get_all_ledger_entries(cls, limit=None, skip=None):
+    def get_all_ledger_entries(cls, limit=None, cursor=None):
         """Get all ledger entries with pagination"""
-        cursor = mongo.db.stock_ledger.find({}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        ledger_entries = []
-        for ledger_data in cursor:
-            ledger_entries.append(cls(ledger_data).to_dict())
-        return ledger_entries
+        return paginate(
+            mongo.db.stock_ledger,
+            {},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda ledger_data: cls(ledger_data).to_dict()
+        )
     
     def to_dict(self):
         """Convert stock ledger entry to dictionary"""
@@ -120,6 +415,7 @@ class StockLedger:
             'stock_in': self.data.get('stock_in', 0),
             'stock_out': self.data.get('stock_out', 0),
             'balance': self.data.get('balance', 0),
+            'seq': self.data.get('seq'),
             'created_at': self.data.get('created_at')
         }
     
@@ -156,20 +452,17 @@ class StockLedger:
         return result[0] if result else None
     
     @classmethod
-    def search_ledger_entries(cls, search_term, limit=None, skip=None):
+    def search_ledger_entries(cls, search_term, limit=None, cursor=None):
         """Search ledger entries by reference"""
-        cursor = mongo.db.stock_ledger.find({
-            'reference': {'$regex': search_term, '$options': 'i'}
-        }).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        ledger_entries = []
-        for ledger_data in cursor:
-            ledger_entries.append(cls(ledger_data).to_dict())
-        return ledger_entries
+        return paginate(
+            mongo.db.stock_ledger,
+            {'reference': {'$regex': search_term, '$options': 'i'}},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda ledger_data: cls(ledger_data).to_dict()
+        )
     
     @classmethod
     def count_ledger_entries(cls, filter_dict=None):
@@ -178,4 +471,5 @@ class StockLedger:
     
     def delete(self):
         """Delete ledger entry"""
-        mongo.db.stock_ledger.delete_one({'_id': self.data['_id']})
\ No newline at end of file
+        mongo.db.stock_ledger.delete_one({'_id': self.data['_id']})
+        bump_version('stock_ledger')
\ No newline at end of file
@@ -1,4 +1,5 @@
-from database import mongo, MongoDocument
+from database import mongo, MongoDocument, bump_version
+from utils.pagination import paginate
 from datetime import datetime, timedelta
 import random
 from bson import ObjectId
@@ -26,6 +27,7 @@ class User:
             'last_login': None
         }
         result = mongo.db.users.insert_one(user_data)
+        bump_version('users')
         user_data['_id'] = result.inserted_id
         return cls(user_data)
     
@@ -55,6 +57,7 @@ class User:
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
         mongo.db.users.delete_one({'_id': user_id})
+        bump_version('users')
     
     def to_dict(self):
         """Convert user to dictionary"""
@@ -77,6 +80,7 @@ class User:
             {'_id': self.data['_id']},
             {'$set': {'last_login': datetime.utcnow()}}
         )
+        bump_version('users')
     
     def update_password(self, new_password_hash):
         """Update user password"""
@@ -87,20 +91,20 @@ class User:
                 'updated_at': datetime.utcnow()
             }}
         )
+        bump_version('users')
     
     @classmethod
-    def get_all_users(cls, limit=None, skip=None):
+    def get_all_users(cls, limit=None, cursor=None):
         """Get all users with pagination"""
-        cursor = mongo.db.users.find({})
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        users = []
-        for user_data in cursor:
-            users.append(cls(user_data).to_dict())
-        return users
+        return paginate(
+            mongo.db.users,
+            {},
+            sort_field='_id',
+            direction=1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda user_data: cls(user_data).to_dict()
+        )
     
     @classmethod
     def count_users(cls, filter_dict=None):
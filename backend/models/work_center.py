@@ -1,4 +1,5 @@
-from database import mongo
+from database import mongo, bump_version
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
 
@@ -25,6 +26,7 @@ class WorkCenter:
             'updated_at': datetime.utcnow()
         }
         result = mongo.db.work_centers.insert_one(wc_data)
+        bump_version('work_centers')
         wc_data['_id'] = result.inserted_id
         return cls(wc_data)
     
@@ -43,18 +45,17 @@ class WorkCenter:
         return cls(wc_data) if wc_data else None
     
     @classmethod
-    def find_all(cls, limit=None, skip=None):
+    def find_all(cls, limit=None, cursor=None):
         """Get all work centers with pagination"""
-        cursor = mongo.db.work_centers.find({}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_centers = []
-        for wc_data in cursor:
-            work_centers.append(cls(wc_data).to_dict())
-        return work_centers
+        return paginate(
+            mongo.db.work_centers,
+            {},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wc_data: cls(wc_data).to_dict()
+        )
     
     @classmethod
     def update_by_id(cls, wc_id, update_data):
@@ -66,6 +67,7 @@ class WorkCenter:
             {'_id': wc_id},
             {'$set': update_data}
         )
+        bump_version('work_centers')
     
     def to_dict(self):
         """Convert work center to dictionary"""
@@ -86,6 +88,7 @@ class WorkCenter:
     def delete(self):
         """Delete work center"""
         mongo.db.work_centers.delete_one({'_id': self.data['_id']})
+        bump_version('work_centers')
     
     @classmethod
     def count_work_centers(cls, filter_dict=None):
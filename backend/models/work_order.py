@@ -1,6 +1,19 @@
-from database import mongo
+from database import mongo, bump_version
+from models.entry_bucket_model import wo_history
+from utils.event_bus import publish
+from utils.pagination import paginate
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+# Dispatch order of priorities; stored on each WO as priority_rank so the
+# claim queue can sort on it
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+# Queue deadline of a WO whose MO has none: nulls would sort first
+NO_DEADLINE = datetime(9999, 12, 31)
+# Statuses that keep later operations of the same MO from being claimed
+OPEN_STATUSES = ('pending', 'in_progress')
+CLAIM_BATCH_SIZE = 20
 
 class WorkOrder:
     """MongoDB Work Order model"""
@@ -14,6 +27,30 @@ class WorkOrder:
     @classmethod
     def create(cls, mo_id, operation_id, assigned_to=None, status='pending', **kwargs):
         """Create a new work order"""
+        wo_data = cls.build(mo_id, operation_id, assigned_to, status, **kwargs)
+        result = mongo.db.work_orders.insert_one(wo_data)
+        bump_version('work_orders')
+        wo_data['_id'] = result.inserted_id
+        publish('work_orders', wo_data)
+        return cls(wo_data)
+    
+    @classmethod
+    def create_many(cls, wo_documents, session=None):
+        """Insert documents from ``build`` in one round trip.
+        
+        Does not bump the collection version, so it can run inside a
+        transaction; callers bump after commit.
+        """
+        if not wo_documents:
+            return []
+        result = mongo.db.work_orders.insert_many(wo_documents, ordered=True, session=session)
+        for wo_data, wo_id in zip(wo_documents, result.inserted_ids):
+            wo_data['_id'] = wo_id
+        return [cls(wo_data) for wo_data in wo_documents]
+    
+    @staticmethod
+    def build(mo_id, operation_id, assigned_to=None, status='pending', **kwargs):
+        """Work order document, ready to insert"""
         if isinstance(mo_id, str):
             mo_id = ObjectId(mo_id)
         if isinstance(operation_id, str):
@@ -32,18 +69,18 @@ class WorkOrder:
             'work_center': kwargs.get('work_center'),
             'notes': kwargs.get('notes', ''),
             'priority': kwargs.get('priority', 'medium'),  # low, medium, high
+            'priority_rank': PRIORITY_RANK.get(kwargs.get('priority', 'medium'), 1),
+            'deadline': kwargs.get('deadline') or NO_DEADLINE,  # Copied from the MO for the claim queue
             'actual_duration': kwargs.get('actual_duration', 0),  # Actual duration in minutes
             'quality_check': kwargs.get('quality_check', False),  # Whether quality check is required
             'quality_status': kwargs.get('quality_status', 'pending'),  # pending, passed, failed
             'quality_notes': kwargs.get('quality_notes', ''),
-            'materials_consumed': [],  # Array of material consumption records
-            'time_logs': [],  # Array of time tracking entries
+            'operation_name': kwargs.get('operation_name'),
+            'sequence': kwargs.get('sequence', 0),  # Position among the MO's operations
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
-        result = mongo.db.work_orders.insert_one(wo_data)
-        wo_data['_id'] = result.inserted_id
-        return cls(wo_data)
+        return wo_data
     
     @classmethod
     def find_by_id(cls, wo_id):
@@ -54,114 +91,201 @@ class WorkOrder:
         return cls(wo_data) if wo_data else None
     
     @classmethod
-    def find_by_mo_id(cls, mo_id, limit=None, skip=None):
+    def find_by_mo_id(cls, mo_id, limit=None, cursor=None):
         """Find work orders by manufacturing order ID"""
         if isinstance(mo_id, str):
             mo_id = ObjectId(mo_id)
         
-        cursor = mongo.db.work_orders.find({'mo_id': mo_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        return paginate(
+            mongo.db.work_orders,
+            {'mo_id': mo_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_operation_id(cls, operation_id, limit=None, skip=None):
+    def find_by_operation_id(cls, operation_id, limit=None, cursor=None):
         """Find work orders by operation ID"""
         if isinstance(operation_id, str):
             operation_id = ObjectId(operation_id)
         
-        cursor = mongo.db.work_orders.find({'operation_id': operation_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        return paginate(
+            mongo.db.work_orders,
+            {'operation_id': operation_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_assignee_id(cls, assignee_id, limit=None, skip=None):
+    def find_by_assignee_id(cls, assignee_id, limit=None, cursor=None):
         """Find work orders by assignee ID"""
         if isinstance(assignee_id, str):
             assignee_id = ObjectId(assignee_id)
         
-        cursor = mongo.db.work_orders.find({'assigned_to': assignee_id}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        return paginate(
+            mongo.db.work_orders,
+            {'assigned_to': assignee_id},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
+    
+    @classmethod
+    def claim_next(cls, work_centers, operator_id):
+        """Atomically take the next pending WO of a work center and start it.
         
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        ``work_centers`` are the references WOs may use for the center (ID
+        and name). The highest priority, then earliest deadline, pending WO
+        that is unassigned or already assigned to ``operator_id`` and whose
+        earlier operations (lower ``sequence``) in its MO are all closed is
+        flipped to in_progress with a guarded ``find_one_and_update``, so
+        concurrent callers can never claim the same WO; one that loses a race
+        moves on to the next candidate. Candidates are read in batches with
+        one query per batch for their MOs' open operations. Returns None when
+        nothing can be claimed.
+        """
+        if isinstance(operator_id, str):
+            operator_id = ObjectId(operator_id)
+        queue = {
+            'work_center': {'$in': list(work_centers)},
+            'status': 'pending',
+            'assigned_to': {'$in': [None, operator_id]}
+        }
+        candidates = mongo.db.work_orders.find(queue, {'mo_id': 1, 'sequence': 1}).sort(
+            [('priority_rank', 1), ('deadline', 1), ('_id', 1)]
+        ).batch_size(CLAIM_BATCH_SIZE)
+        batch = []
+        for candidate in candidates:
+            batch.append(candidate)
+            if len(batch) == CLAIM_BATCH_SIZE:
+                wo_data = cls._claim_first_ready(batch, queue, operator_id)
+                if wo_data:
+                    return cls(wo_data)
+                batch = []
+        wo_data = cls._claim_first_ready(batch, queue, operator_id) if batch else None
+        return cls(wo_data) if wo_data else None
     
     @classmethod
-    def find_by_status(cls, status, limit=None, skip=None):
+    def _claim_first_ready(cls, candidates, queue, operator_id):
+        first_open = {}
+        for wo in mongo.db.work_orders.find(
+            {'mo_id': {'$in': list({wo['mo_id'] for wo in candidates})}, 'status': {'$in': list(OPEN_STATUSES)}},
+            {'mo_id': 1, 'sequence': 1}
+        ):
+            sequence = wo.get('sequence') or 0
+            first_open[wo['mo_id']] = min(first_open.get(wo['mo_id'], sequence), sequence)
+        now = datetime.utcnow()
+        for candidate in candidates:
+            if (candidate.get('sequence') or 0) > first_open.get(candidate['mo_id'], 0):
+                continue  # an earlier operation of its MO is still open
+            wo_data = mongo.db.work_orders.find_one_and_update(
+                dict(queue, _id=candidate['_id']),
+                {'$set': {
+                    'status': 'in_progress',
+                    'assigned_to': operator_id,
+                    'claimed_at': now,
+                    'start_time': now,
+                    'updated_at': now
+                }},
+                return_document=ReturnDocument.AFTER
+            )
+            if wo_data:
+                bump_version('work_orders')
+                publish('work_orders', wo_data)
+                return wo_data
+        return None
+    
+    @classmethod
+    def find_by_status(cls, status, limit=None, cursor=None):
         """Find work orders by status"""
-        cursor = mongo.db.work_orders.find({'status': status}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        return paginate(
+            mongo.db.work_orders,
+            {'status': status},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_work_center(cls, work_center, limit=None, skip=None):
+    def find_by_work_center(cls, work_center, limit=None, cursor=None):
         """Find work orders by work center"""
-        cursor = mongo.db.work_orders.find({'work_center': work_center}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        return paginate(
+            mongo.db.work_orders,
+            {'work_center': work_center},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
     
     @classmethod
-    def find_by_quality_status(cls, quality_status, limit=None, skip=None):
+    def find_by_quality_status(cls, quality_status, limit=None, cursor=None):
         """Find work orders by quality status"""
-        cursor = mongo.db.work_orders.find({'quality_status': quality_status}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+        return paginate(
+            mongo.db.work_orders,
+            {'quality_status': quality_status},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
     
     @classmethod
-    def get_all_work_orders(cls, limit=None, skip=None):
+    def get_all_work_orders(cls, limit=None, cursor=None):
         """Get all work orders with pagination"""
-        cursor = mongo.db.work_orders.find({}).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
+        return paginate(
+            mongo.db.work_orders,
+            {},
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
+    
+    @classmethod
+    def iter_completed_by_user(cls, user_id, start_date=None, end_date=None, batch_size=1000):
+        """Lazily yield a user's completed work orders, oldest first.
+        
+        Documents are pulled from the server ``batch_size`` at a time, so
+        exports over long date ranges never hold the full result in memory.
+        """
+        if isinstance(user_id, str):
+            user_id = ObjectId(user_id)
         
-        work_orders = []
+        query = {'assigned_to': user_id, 'status': 'completed'}
+        if start_date or end_date:
+            query['end_time'] = {}
+            if start_date:
+                query['end_time']['$gte'] = start_date
+            if end_date:
+                query['end_time']['$lte'] = end_date
+        
+        cursor = mongo.db.work_orders.find(
+            query,
+            {'mo_id': 1, 'actual_duration': 1, 'end_time': 1}
+        ).sort('end_time', 1).batch_size(batch_size)
         for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
+            yield wo_data
     
     def update_status(self, new_status, notes=None):
-        """Update work order status"""
+        """Update work order status.
+        
+        Returns the status the work order had right before this update, read
+        atomically with the write, or None if the work order no longer exists.
+        """
         update_data = {
             'status': new_status,
             'updated_at': datetime.utcnow()
@@ -180,10 +304,18 @@ class WorkOrder:
         if notes:
             update_data['notes'] = notes
         
-        mongo.db.work_orders.update_one(
+        previous = mongo.db.work_orders.find_one_and_update(
             {'_id': self.data['_id']},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection={'status': 1},
+            return_document=ReturnDocument.BEFORE
         )
+        bump_version('work_orders')
+        if not previous:
+            return None
+        self.data.update(update_data)
+        publish('work_orders', self.data)
+        return previous.get('status')
     
     def assign_to_operator(self, assignee_id):
         """Assign work order to operator"""
@@ -199,6 +331,7 @@ class WorkOrder:
                 }
             }
         )
+        bump_version('work_orders')
     
     def update_quality_status(self, quality_status, quality_notes=None):
         """Update quality check status"""
@@ -214,28 +347,29 @@ class WorkOrder:
             {'_id': self.data['_id']},
             {'$set': update_data}
         )
+        bump_version('work_orders')
     
     def add_material_consumption(self, material_data):
         """Add material consumption record"""
         material_data['timestamp'] = datetime.utcnow()
-        mongo.db.work_orders.update_one(
-            {'_id': self.data['_id']},
-            {
-                '$push': {'materials_consumed': material_data},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
-        )
+        wo_history.append(self.data['_id'], 'materials_consumed', [material_data])
+        bump_version('wo_entry_buckets')
     
     def add_time_log(self, time_log_data):
         """Add time tracking entry"""
         time_log_data['timestamp'] = datetime.utcnow()
-        mongo.db.work_orders.update_one(
-            {'_id': self.data['_id']},
-            {
-                '$push': {'time_logs': time_log_data},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
-        )
+        wo_history.append(self.data['_id'], 'time_logs', [time_log_data])
+        bump_version('wo_entry_buckets')
+    
+    @classmethod
+    def get_materials_consumed(cls, wo_id, limit=None, cursor=None):
+        """Material consumption records of a work order, newest first"""
+        return wo_history.page(wo_id, 'materials_consumed', limit=limit, cursor=cursor)
+    
+    @classmethod
+    def get_time_logs(cls, wo_id, limit=None, cursor=None):
+        """Time tracking entries of a work order, newest first"""
+        return wo_history.page(wo_id, 'time_logs', limit=limit, cursor=cursor)
     
     def to_dict(self):
         """Convert work order to dictionary"""
@@ -245,6 +379,8 @@ class WorkOrder:
             'id': str(self.data.get('_id')),
             'mo_id': str(self.data.get('mo_id')) if self.data.get('mo_id') else None,
             'operation_id': str(self.data.get('operation_id')) if self.data.get('operation_id') else None,
+            'operation_name': self.data.get('operation_name'),
+            'sequence': self.data.get('sequence', 0),
             'assigned_to': str(self.data.get('assigned_to')) if self.data.get('assigned_to') else None,
             'status': self.data.get('status', 'pending'),
             'start_time': self.data.get('start_time'),
@@ -252,13 +388,15 @@ class WorkOrder:
             'planned_duration': self.data.get('planned_duration', 60),
             'actual_duration': self.data.get('actual_duration', 0),
             'work_center': self.data.get('work_center'),
+            'scheduled_start': self.data.get('scheduled_start'),
+            'scheduled_end': self.data.get('scheduled_end'),
             'notes': self.data.get('notes', ''),
             'priority': self.data.get('priority', 'medium'),
+            'deadline': None if self.data.get('deadline') == NO_DEADLINE else self.data.get('deadline'),
+            'claimed_at': self.data.get('claimed_at'),
             'quality_check': self.data.get('quality_check', False),
             'quality_status': self.data.get('quality_status', 'pending'),
             'quality_notes': self.data.get('quality_notes', ''),
-            'materials_consumed': self.data.get('materials_consumed', []),
-            'time_logs': self.data.get('time_logs', []),
             'created_at': self.data.get('created_at'),
             'updated_at': self.data.get('updated_at')
         }
@@ -266,6 +404,8 @@ class WorkOrder:
     def delete(self):
         """Delete work order"""
         mongo.db.work_orders.delete_one({'_id': self.data['_id']})
+        wo_history.delete_parent(self.data['_id'])
+        bump_version('work_orders')
     
     @classmethod
     def count_work_orders(cls, filter_dict=None):
@@ -286,20 +426,19 @@ class WorkOrder:
         return list(mongo.db.work_orders.aggregate(pipeline))
     
     @classmethod
-    def search_work_orders(cls, search_term, limit=None, skip=None):
+    def search_work_orders(cls, search_term, limit=None, cursor=None):
         """Search work orders by notes or work center"""
-        cursor = mongo.db.work_orders.find({
-            '$or': [
-                {'notes': {'$regex': search_term, '$options': 'i'}},
-                {'work_center': {'$regex': search_term, '$options': 'i'}}
-            ]
-        }).sort('created_at', -1)
-        if skip:
-            cursor = cursor.skip(skip)
-        if limit:
-            cursor = cursor.limit(limit)
-        
-        work_orders = []
-        for wo_data in cursor:
-            work_orders.append(cls(wo_data).to_dict())
-        return work_orders
\ No newline at end of file
+        return paginate(
+            mongo.db.work_orders,
+            {
+                '$or': [
+                    {'notes': {'$regex': search_term, '$options': 'i'}},
+                    {'work_center': {'$regex': search_term, '$options': 'i'}}
+                ]
+            },
+            sort_field='created_at',
+            direction=-1,
+            limit=limit,
+            cursor=cursor,
+            transform=lambda wo_data: cls(wo_data).to_dict()
+        )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from flask import Blueprint
 from middlewares.auth_middleware import token_required, role_required
-from controllers.bom_controller import create_bom, get_boms, update_bom, get_bom, render_bom_create_page, get_next_bom_id
+from controllers.bom_controller import create_bom, get_boms, update_bom, get_bom, render_bom_create_page, get_next_bom_id, explode_bom
 
 bom_bp = Blueprint('bom', __name__)
 
@@ -34,6 +34,12 @@ def get_boms():
 def get_bom_by_id(bom_id):
     return get_bom(bom_id)
 
+@bom_bp.route('/boms/<bom_id>/explode', methods=['GET'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager', 'Production Planner'])
+def explode(bom_id):
+    return explode_bom(bom_id)
+
 @bom_bp.route('/boms/<bom_id>', methods=['PUT'])
 @token_required
 @role_required(['Administrator', 'Manufacturing Manager'])
@@ -0,0 +1,15 @@
+from flask import Blueprint
+from middlewares.auth_middleware import token_required, stream_token_required
+from controllers.event_controller import issue_stream_token, stream_events
+
+event_bp = Blueprint('events', __name__)
+
+@event_bp.route('/events/token', methods=['POST'])
+@token_required
+def events_token():
+    return issue_stream_token()
+
+@event_bp.route('/events', methods=['GET'])
+@stream_token_required
+def events():
+    return stream_events()
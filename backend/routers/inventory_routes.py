@@ -1,6 +1,6 @@
 from flask import Blueprint
 from middlewares.auth_middleware import token_required, role_required
-from controllers.inventory_controller import update_inventory
+from controllers.inventory_controller import update_inventory, get_available_to_promise
 
 inventory_bp = Blueprint('inventory', __name__)
 
@@ -8,4 +8,9 @@ inventory_bp = Blueprint('inventory', __name__)
 @token_required
 @role_required(['Administrator', 'Inventory Manager'])
 def update():
-    return update_inventory()
\ No newline at end of file
+    return update_inventory()
+
+@inventory_bp.route('/inventory/atp', methods=['GET'])
+@token_required
+def available_to_promise():
+    return get_available_to_promise()
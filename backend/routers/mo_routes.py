@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, g, jsonify
 from middlewares.auth_middleware import token_required, role_required
-from controllers.mo_controller import create_mo, get_mos, get_mo, update_mo_status, get_mo_work_orders
+from controllers.mo_controller import (
+    create_mo, get_mos, get_mo, update_mo_status, get_mo_work_orders, check_mo_feasibility, get_mo_reservations,
+    get_mo_history
+)
 from models.bom_model import BOM
 from models.user_model import User
 from database import mongo
@@ -39,6 +42,11 @@ def create():
 def get_all():
     return get_mos()
 
+@mo_bp.route('/mos/feasibility', methods=['POST'])
+@token_required
+def feasibility():
+    return check_mo_feasibility()
+
 @mo_bp.route('/mos/<string:mo_id>', methods=['GET'])
 @token_required
 def get_one(mo_id):
@@ -55,6 +63,21 @@ def update_status(mo_id):
 def get_work_orders(mo_id):
     return get_mo_work_orders(mo_id)
 
+@mo_bp.route('/mos/<string:mo_id>/reservations', methods=['GET'])
+@token_required
+def get_reservations(mo_id):
+    return get_mo_reservations(mo_id)
+
+@mo_bp.route('/mos/<string:mo_id>/material-consumptions', methods=['GET'])
+@token_required
+def get_material_consumptions(mo_id):
+    return get_mo_history(mo_id, 'material_consumptions')
+
+@mo_bp.route('/mos/<string:mo_id>/quality-checks', methods=['GET'])
+@token_required
+def get_quality_checks(mo_id):
+    return get_mo_history(mo_id, 'quality_checks')
+
 @mo_bp.route('/operators', methods=['GET'])
 def get_operators():
     """Get all users with operator role for assignment"""
@@ -0,0 +1,11 @@
+from flask import Blueprint
+from middlewares.auth_middleware import token_required, role_required
+from controllers.mrp_controller import get_mrp_run
+
+mrp_bp = Blueprint('mrp', __name__)
+
+@mrp_bp.route('/mrp', methods=['GET'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager', 'Production Planner', 'Inventory Manager'])
+def mrp_run():
+    return get_mrp_run()
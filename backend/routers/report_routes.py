@@ -1,6 +1,6 @@
 from flask import Blueprint
 from middlewares.auth_middleware import token_required
-from controllers.report_controller import get_operator_report, get_manager_report, get_admin_report, get_inventory_report
+from controllers.report_controller import get_operator_report, get_manager_report, get_admin_report, get_inventory_report, submit_report, get_report_job, download_report_job
 
 report_bp = Blueprint('report', __name__)
 
@@ -22,4 +22,19 @@ def admin():
 @report_bp.route('/reports/inventory', methods=['GET'])
 @token_required
 def inventory():
-    return get_inventory_report()
\ No newline at end of file
+    return get_inventory_report()
+
+@report_bp.route('/reports/jobs', methods=['POST'])
+@token_required
+def submit_job():
+    return submit_report()
+
+@report_bp.route('/reports/jobs/<string:job_id>', methods=['GET'])
+@token_required
+def job_status(job_id):
+    return get_report_job(job_id)
+
+@report_bp.route('/reports/jobs/<string:job_id>/download', methods=['GET'])
+@token_required
+def job_download(job_id):
+    return download_report_job(job_id)
\ No newline at end of file
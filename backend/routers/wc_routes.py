@@ -1,6 +1,8 @@
 from flask import Blueprint
 from middlewares.auth_middleware import token_required, role_required
-from controllers.wc_controller import get_workcenters, get_workcenter, update_workcenter, get_utilization, create_workcenter
+from controllers.wc_controller import (
+    get_workcenters, get_workcenter, update_workcenter, get_utilization, create_workcenter, get_oee, get_all_oee
+)
 
 wc_bp = Blueprint('wc', __name__)
 
@@ -26,4 +28,16 @@ def workcenter_update(id):
 
 @wc_bp.route('/workcenters/<string:id>/utilization', methods=['GET'])
 def workcenter_utilization(id):
-    return get_utilization(id)
\ No newline at end of file
+    return get_utilization(id)
+
+@wc_bp.route('/workcenters/oee', methods=['GET'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager'])
+def plant_oee():
+    return get_all_oee()
+
+@wc_bp.route('/workcenters/<string:id>/oee', methods=['GET'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager'])
+def workcenter_oee(id):
+    return get_oee(id)
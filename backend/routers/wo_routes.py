@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template
 from middlewares.auth_middleware import token_required, role_required
-from controllers.wo_controller import create_wo, update_wo_status, get_assigned_work_orders, get_work_orders
+from controllers.wo_controller import (
+    create_wo, update_wo_status, get_assigned_work_orders, get_work_orders, schedule_work_orders, reschedule_wo,
+    get_wo_history, claim_next_work_order
+)
 
 wo_bp = Blueprint('wo', __name__)
 
@@ -21,12 +24,40 @@ def update_status(wo_id):
 def get_assigned():
     return get_assigned_work_orders()
 
+@wo_bp.route('/wos/claim', methods=['POST'])
+@token_required
+@role_required(['Operator', 'Manufacturing Manager'])
+def claim_next():
+    return claim_next_work_order()
+
 @wo_bp.route('/wos', methods=['GET'])
 @token_required
 @role_required(['Administrator', 'Manufacturing Manager'])
 def get_all_work_orders():
     return get_work_orders()
 
+@wo_bp.route('/wos/<string:wo_id>/time-logs', methods=['GET'])
+@token_required
+def get_time_logs(wo_id):
+    return get_wo_history(wo_id, 'time_logs')
+
+@wo_bp.route('/wos/<string:wo_id>/materials-consumed', methods=['GET'])
+@token_required
+def get_materials_consumed(wo_id):
+    return get_wo_history(wo_id, 'materials_consumed')
+
+@wo_bp.route('/schedule', methods=['POST'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager'])
+def schedule():
+    return schedule_work_orders()
+
+@wo_bp.route('/wos/<string:wo_id>/reschedule', methods=['POST'])
+@token_required
+@role_required(['Administrator', 'Manufacturing Manager'])
+def reschedule(wo_id):
+    return reschedule_wo(wo_id)
+
 @wo_bp.route('/wo-list')
 @token_required
 @role_required(['Administrator', 'Manufacturing Manager', 'Operator'])
@@ -0,0 +1,58 @@
+from database import mongo
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def get_atp(product_ids):
+    """On-hand, reserved and available stock for many products at once.
+
+    One aggregation over ``products`` joins the inventory rows linked by
+    ``product_id`` and the legacy rows linked only by ``item_name``; both
+    joins are equality lookups served by the inventory indexes.
+    """
+    try:
+        product_ids = [pid if isinstance(pid, ObjectId) else ObjectId(pid) for pid in product_ids]
+    except (InvalidId, TypeError):
+        raise ValueError('Invalid product ID')
+
+    atp = {
+        product_id: {'product_id': str(product_id), 'name': None, 'on_hand': 0, 'reserved': 0, 'available': 0}
+        for product_id in product_ids
+    }
+    pipeline = [
+        {'$match': {'_id': {'$in': product_ids}}},
+        {'$lookup': {'from': 'inventory', 'localField': '_id', 'foreignField': 'product_id', 'as': 'by_id'}},
+        {'$lookup': {'from': 'inventory', 'localField': 'name', 'foreignField': 'item_name', 'as': 'by_name'}},
+        # A row linked both ways must only count once
+        {'$project': {'name': 1, 'rows': {'$setUnion': ['$by_id', '$by_name']}}},
+        {
+            '$project': {
+                'name': 1,
+                'on_hand': {'$sum': '$rows.stock_quantity'},
+                'reserved': {'$sum': '$rows.reserved_quantity'}
+            }
+        },
+        {'$addFields': {'available': {'$subtract': ['$on_hand', '$reserved']}}}
+    ]
+    for row in mongo.db.products.aggregate(pipeline):
+        atp[row['_id']].update({
+            'name': row.get('name'),
+            'on_hand': row['on_hand'],
+            'reserved': row['reserved'],
+            'available': row['available']
+        })
+    return atp
+
+
+def check_feasibility(requirements):
+    """Whether every component in ``requirements`` (product ID -> quantity)
+    can be covered from available stock, checked in one ATP query"""
+    atp = get_atp(list(requirements))
+    components = []
+    for product_id, required in requirements.items():
+        row = atp[product_id]
+        components.append(dict(row, required=required, shortage=max(required - row['available'], 0)))
+    return {
+        'feasible': all(component['shortage'] == 0 for component in components),
+        'components': components
+    }
@@ -0,0 +1,159 @@
+from database import mongo
+from utils.cache_helper import LRUCache, MISSING
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Per-unit explosions keyed by (BOM id, BOM version). Each entry also records
+# the version of every sub-assembly it was built from, so it is only reused
+# while the whole structure underneath is unchanged.
+_explosions = LRUCache(max_entries=2048, ttl_seconds=24 * 3600)
+
+BOM_FIELDS = {'version': 1, 'product_name': 1, 'items.raw_material_id': 1, 'items.quantity': 1, 'items.bom_id': 1}
+
+
+class BOMCycleError(ValueError):
+    """Raised when a BOM contains itself through its sub-assemblies"""
+
+    def __init__(self, path):
+        self.path = path
+        super().__init__('BOM cycle detected: ' + ' -> '.join(str(bom_id) for bom_id in path))
+
+
+def _object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f'Invalid ID: {value!r}')
+
+
+def _load_structure(root_id):
+    """Fetch the BOM tree under ``root_id`` one level per query.
+
+    Sub-trees whose memoized explosion is still valid are not descended
+    into. Returns (BOM documents by id, reusable memo entries by id).
+    """
+    nodes = {}
+    reusable = {}
+    frontier = [root_id]
+    while frontier:
+        docs = {doc['_id']: doc for doc in mongo.db.boms.find({'_id': {'$in': frontier}}, BOM_FIELDS)}
+        for bom_id in frontier:
+            if bom_id not in docs:
+                raise ValueError(f'BOM {bom_id} not found')
+
+        candidates = {}
+        for bom_id, doc in docs.items():
+            nodes[bom_id] = doc
+            entry = _explosions.get((bom_id, doc.get('version', 1)))
+            if entry is not MISSING:
+                candidates[bom_id] = entry
+
+        if candidates:
+            # Validate every candidate's sub-assembly versions in one query
+            dependency_ids = {dep for entry in candidates.values() for dep in entry['dependencies']}
+            current = {
+                doc['_id']: doc.get('version', 1)
+                for doc in mongo.db.boms.find({'_id': {'$in': list(dependency_ids)}}, {'version': 1})
+            }
+            for bom_id, entry in candidates.items():
+                if all(current.get(dep) == version for dep, version in entry['dependencies'].items()):
+                    reusable[bom_id] = entry
+
+        next_frontier = set()
+        for bom_id, doc in docs.items():
+            if bom_id in reusable:
+                continue
+            for item in doc.get('items', []):
+                if item.get('bom_id'):
+                    child_id = _object_id(item['bom_id'])
+                    if child_id not in nodes:
+                        next_frontier.add(child_id)
+        frontier = list(next_frontier)
+    return nodes, reusable
+
+
+def explode_per_unit(bom_id):
+    """Leaf material quantities needed for one unit of ``bom_id``'s product.
+
+    Sub-assemblies are flattened recursively, each one computed once per
+    call however often it appears, and memoized across calls per BOM
+    version. Raises ``BOMCycleError`` if the structure loops back on itself.
+    """
+    root_id = _object_id(bom_id)
+    nodes, reusable = _load_structure(root_id)
+    resolved = dict(reusable)
+    visiting = []
+
+    def visit(node_id):
+        if node_id in resolved:
+            return resolved[node_id]
+        if node_id in visiting:
+            raise BOMCycleError(visiting[visiting.index(node_id):] + [node_id])
+        visiting.append(node_id)
+
+        doc = nodes[node_id]
+        requirements = {}
+        dependencies = {node_id: doc.get('version', 1)}
+        for item in doc.get('items', []):
+            quantity = item.get('quantity') or 0
+            if item.get('bom_id'):
+                child = visit(_object_id(item['bom_id']))
+                dependencies.update(child['dependencies'])
+                for product_id, child_quantity in child['requirements'].items():
+                    requirements[product_id] = requirements.get(product_id, 0) + quantity * child_quantity
+            else:
+                product_id = _object_id(item['raw_material_id'])
+                requirements[product_id] = requirements.get(product_id, 0) + quantity
+
+        visiting.pop()
+        entry = {'requirements': requirements, 'dependencies': dependencies}
+        _explosions.set((node_id, doc.get('version', 1)), entry)
+        resolved[node_id] = entry
+        return entry
+
+    return dict(visit(root_id)['requirements'])
+
+
+def explode(bom_id, quantity):
+    """Flattened gross requirements, keyed by product ID, for ``quantity`` units"""
+    return {
+        product_id: per_unit * quantity
+        for product_id, per_unit in explode_per_unit(bom_id).items()
+    }
+
+
+def direct_requirements(bom_id, quantity):
+    """Single-level requirements, keyed by product ID, for ``quantity`` units.
+
+    Sub-assemblies count as the components they are, not as their raw
+    materials: this is what actually leaves the shelf when the product is
+    built, since each sub-assembly was built (and consumed its own
+    materials) under its own MO. ``explode`` is for planning.
+    """
+    doc = mongo.db.boms.find_one({'_id': _object_id(bom_id)}, {'items.raw_material_id': 1, 'items.quantity': 1})
+    if not doc:
+        raise ValueError(f'BOM {bom_id} not found')
+    requirements = {}
+    for item in doc.get('items', []):
+        product_id = _object_id(item['raw_material_id'])
+        requirements[product_id] = requirements.get(product_id, 0) + (item.get('quantity') or 0) * quantity
+    return requirements
+
+
+def requirement_rows(requirements):
+    """Requirements as JSON-ready rows with product names, in one query"""
+    products = {
+        product['_id']: product
+        for product in mongo.db.products.find({'_id': {'$in': list(requirements)}}, {'name': 1, 'unit': 1})
+    }
+    return [
+        {
+            'product_id': str(product_id),
+            'name': products.get(product_id, {}).get('name'),
+            'unit': products.get(product_id, {}).get('unit'),
+            'quantity': quantity
+        }
+        for product_id, quantity in requirements.items()
+    ]
@@ -0,0 +1,231 @@
+from database import mongo, bump_version
+from models.bom_model import BOM, BOMItem, BOMOperation
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+
+def _object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+class BOMResolver:
+    """Batch loader for the products and work centers that BOMs reference.
+
+    Queue every BOM first with ``add``, then ``expand`` them: the first
+    expansion resolves all queued IDs with one ``$in`` query per collection,
+    so expanding any number of BOMs, of any size, costs two round trips.
+    """
+
+    def __init__(self):
+        self._product_ids = set()
+        self._work_center_ids = set()
+        self.products = {}
+        self.work_centers = {}
+
+    def add(self, bom_data):
+        for item in bom_data.get('items', []):
+            product_id = _object_id(item.get('raw_material_id'))
+            if product_id and product_id not in self.products:
+                self._product_ids.add(product_id)
+        for operation in bom_data.get('operations', []):
+            work_center_id = _object_id(operation.get('work_center_id'))
+            if work_center_id and work_center_id not in self.work_centers:
+                self._work_center_ids.add(work_center_id)
+        return self
+
+    def load(self):
+        """Fetch every queued ID not resolved yet"""
+        if self._product_ids:
+            for product in mongo.db.products.find(
+                {'_id': {'$in': list(self._product_ids)}}, {'name': 1, 'type': 1, 'unit': 1}
+            ):
+                self.products[product['_id']] = product
+            self._product_ids.clear()
+        if self._work_center_ids:
+            for work_center in mongo.db.work_centers.find(
+                {'_id': {'$in': list(self._work_center_ids)}}, {'name': 1}
+            ):
+                self.work_centers[work_center['_id']] = work_center
+            self._work_center_ids.clear()
+        return self
+
+    def expand(self, bom_data):
+        """BOM dict with each item's product and each operation's work center inlined"""
+        self.load()
+
+        items = []
+        for item in bom_data.get('items', []):
+            product = self.products.get(_object_id(item.get('raw_material_id')), {})
+            items.append({
+                'raw_material': {'id': str(item.get('raw_material_id')), 'name': product.get('name')},
+                'raw_material_name': product.get('name'),
+                'quantity': item.get('quantity'),
+                'unit': item.get('unit') or product.get('unit')
+            })
+
+        operations = []
+        for operation in bom_data.get('operations', []):
+            work_center = self.work_centers.get(_object_id(operation.get('work_center_id')), {})
+            operations.append({
+                'work_center': {'id': str(operation.get('work_center_id')), 'name': work_center.get('name')},
+                'operation_name': operation.get('operation_name'),
+                'duration': operation.get('time_required')
+            })
+
+        expanded = dict(bom_data)
+        expanded['items'] = items
+        expanded['operations'] = operations
+        return expanded
+
+
+def expand_boms(boms):
+    """Expand several BOM dicts with one batched lookup for all of them"""
+    resolver = BOMResolver()
+    for bom_data in boms:
+        resolver.add(bom_data)
+    return [resolver.expand(bom_data) for bom_data in boms]
+
+
+def expand_bom(bom_data):
+    """Expand a single BOM dict in two queries regardless of its size"""
+    return BOMResolver().add(bom_data).expand(bom_data)
+
+
+def _resolve_by_name(collection, names, match, new_document):
+    """Map each name to a document ID, inserting documents for unknown names.
+
+    Existing documents are found with one ``$in`` query; the missing ones are
+    upserted in a single ``bulk_write`` (the upsert, rather than a plain
+    insert, keeps a concurrent request from creating the same name twice).
+    Returns the ID map and whether anything was written.
+    """
+    names = list(dict.fromkeys(names))
+    ids = {
+        document['name']: document['_id']
+        for document in collection.find(dict(match, name={'$in': names}), {'name': 1})
+    }
+    missing = [name for name in names if name not in ids]
+    if not missing:
+        return ids, False
+
+    result = collection.bulk_write([
+        UpdateOne(dict(match, name=name), {'$setOnInsert': new_document(name)}, upsert=True)
+        for name in missing
+    ], ordered=False)
+    for index, document_id in result.upserted_ids.items():
+        ids[missing[index]] = document_id
+    if len(ids) < len(names):
+        # Lost an upsert race: another request inserted these names first
+        for document in collection.find(dict(match, name={'$in': missing}), {'name': 1}):
+            ids.setdefault(document['name'], document['_id'])
+    return ids, True
+
+
+def resolve_raw_materials(items, product_type='raw'):
+    """Product ID for every component named in ``items``, created if needed"""
+    units = {item['raw_material']['name']: item.get('unit') for item in items}
+    if not units:
+        return {}
+    label = 'Raw material' if product_type == 'raw' else 'Sub-assembly'
+    now = datetime.utcnow()
+    ids, created = _resolve_by_name(
+        mongo.db.products,
+        list(units),
+        {'type': product_type},
+        lambda name: {
+            'unit': units[name],
+            'description': f'{label} {name}',
+            'price': 0.0,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+    )
+    if created:
+        bump_version('products')
+    return ids
+
+
+def resolve_work_centers(operations):
+    """Work center ID for every work center named in ``operations``, created if needed"""
+    now = datetime.utcnow()
+    ids, created = _resolve_by_name(
+        mongo.db.work_centers,
+        [operation['work_center']['name'] for operation in operations],
+        {},
+        lambda name: {
+            'description': f'Work center {name}',
+            'hourly_cost_rate': 0.0,
+            'status': 'active',
+            'capacity': 1,
+            'efficiency': 1.0,
+            'created_at': now,
+            'updated_at': now
+        }
+    )
+    if created:
+        bump_version('work_centers')
+    return ids
+
+
+def find_sub_assemblies(names):
+    """Active BOM that builds each of ``names``, for the names that have one"""
+    return {
+        bom['product_name']: bom['_id']
+        for bom in mongo.db.boms.find(
+            {'product_name': {'$in': list(names)}, 'is_active': True},
+            {'product_name': 1},
+            sort=[('created_at', 1)]
+        )
+    }
+
+
+def create_bom_document(bom_id, product_name, items, operations):
+    """Create a BOM with all of its items and operations in one insert.
+
+    Raw materials and work centers are resolved (and created) in bulk first,
+    so the number of round trips does not grow with the size of the BOM.
+    A component with its own active BOM (or an explicit ``bom_id``) becomes
+    a sub-assembly item linked to that BOM.
+    """
+    sub_assemblies = find_sub_assemblies({item['raw_material']['name'] for item in items}) if items else {}
+    for item in items:
+        if item.get('bom_id'):
+            sub_assemblies[item['raw_material']['name']] = item['bom_id']
+
+    product_ids = resolve_raw_materials(
+        [item for item in items if item['raw_material']['name'] not in sub_assemblies]
+    )
+    product_ids.update(resolve_raw_materials(
+        [item for item in items if item['raw_material']['name'] in sub_assemblies], product_type='finished'
+    ))
+    work_center_ids = resolve_work_centers(operations) if operations else {}
+
+    return BOM.create(
+        product_name,
+        bom_id=bom_id,
+        items=[
+            BOMItem.create_item(
+                str(product_ids[item['raw_material']['name']]),
+                item['quantity'],
+                item['unit'],
+                bom_id=str(sub_assemblies[item['raw_material']['name']]) if item['raw_material']['name'] in sub_assemblies else None
+            )
+            for item in items
+        ],
+        operations=[
+            BOMOperation.create_operation(
+                operation['operation_name'],
+                str(work_center_ids[operation['work_center']['name']]),
+                operation['time_required']
+            )
+            for operation in operations
+        ]
+    )
@@ -0,0 +1,95 @@
+from database import mongo, run_in_transaction, bump_version
+from models.inventory_model import Inventory
+from models.reservation_model import StockReservation
+from models.stock_ledger_model import StockLedger
+from models.entry_bucket_model import wo_history
+from services.bom_explosion_service import direct_requirements
+from datetime import datetime
+
+
+def get_component_requirements(mo_data, portion=1.0):
+    """Component quantities a manufacturing order consumes, keyed by product ID.
+
+    Only the BOM's own items: a sub-assembly is taken from stock as built,
+    not re-exploded into raw materials its own MO already consumed. A BOM
+    deleted since the MO was released leaves nothing to consume.
+    """
+    try:
+        return direct_requirements(mo_data['bom_id'], mo_data['quantity'] * portion)
+    except ValueError:
+        return {}
+
+
+def consume_materials(wo_data, mo_data, portion):
+    """Consume a work order's share of its MO's raw materials.
+
+    Every component is resolved with one ``$in`` query, inventory is
+    decremented with one ``bulk_write`` and the ledger is posted in one batch,
+    all inside a single transaction. The round trip count does not depend on
+    how many components the BOM has.
+    """
+    requirements = get_component_requirements(mo_data, portion)
+    if not requirements:
+        return []
+
+    products = {
+        product['_id']: product
+        for product in mongo.db.products.find({'_id': {'$in': list(requirements)}}, {'name': 1})
+    }
+    reference = f"WO-{str(wo_data['_id'])}"
+    now = datetime.utcnow()
+
+    consumptions = [
+        {
+            'product_id': product_id,
+            'item_name': products[product_id].get('name') if product_id in products else None,
+            'quantity': quantity
+        }
+        for product_id, quantity in requirements.items()
+    ]
+
+    def apply(session):
+        # Take stock from the rows reserved for the MO, drawing its
+        # reservations down with it; anything beyond them comes off the
+        # product's own row
+        drawn, unreserved = StockReservation.consume(mo_data['_id'], requirements, session=session)
+        rows = Inventory.resolve_rows(
+            {
+                consumption['product_id']: consumption['item_name']
+                for consumption in consumptions
+                if unreserved[consumption['product_id']] > 0
+            },
+            session=session
+        )
+        adjustments = [(row_id, -quantity) for row_id, quantity in drawn.items()] + [
+            (rows[product_id], -quantity)
+            for product_id, quantity in unreserved.items()
+            if quantity > 0 and product_id in rows
+        ]
+        # Materials already on the line are consumed even if the books say
+        # otherwise, so this adjustment is not guarded against going negative
+        Inventory.adjust_many(adjustments, session=session)
+
+        StockLedger.create_many([
+            {
+                'product_id': consumption['product_id'],
+                'reference': reference,
+                'stock_out': consumption['quantity']
+            }
+            for consumption in consumptions
+            if consumption['product_id'] in products
+        ], session=session)
+
+        wo_history.append(
+            wo_data['_id'],
+            'materials_consumed',
+            [dict(consumption, timestamp=now) for consumption in consumptions],
+            session=session
+        )
+        return consumptions, [row_id for row_id, _ in adjustments]
+
+    result, moved_rows = run_in_transaction(apply)
+    # Bumped only after commit so no reader caches pre-commit data as current
+    bump_version('inventory', 'stock_ledger', 'wo_entry_buckets')
+    Inventory.publish_changes(moved_rows)
+    return result
@@ -0,0 +1,229 @@
+from database import mongo
+from services.bom_explosion_service import explode_per_unit, BOM_FIELDS
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+import numpy as np
+
+OPEN_MO_STATUSES = ('planned', 'in_progress')
+MRP_BUCKETS = ('day', 'week', 'month')
+
+
+def period_start(moment, bucket):
+    """First day of the planning period ``moment`` falls in"""
+    day = datetime(moment.year, moment.month, moment.day)
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _as_object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    if value is None:
+        # ObjectId(None) would mint a fresh ID instead of failing
+        return None
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def load_open_orders():
+    """(bom_id, open quantity, need date, outstanding output, due date) per open MO.
+
+    Work orders consume their share of materials when they complete, so
+    only the share of each MO whose work orders are still open is demand.
+    Whatever the MO has not yet reported as completed is still to arrive,
+    by its deadline, as supply of its product.
+    """
+    cursor = mongo.db.manufacturing_orders.find(
+        {'status': {'$in': list(OPEN_MO_STATUSES)}},
+        {'bom_id': 1, 'quantity': 1, 'completed_quantity': 1, 'schedule_start': 1, 'deadline': 1,
+         'total_wo_count': 1, 'completed_wo_count': 1},
+        batch_size=5000
+    )
+    for mo in cursor:
+        quantity = mo.get('quantity') or 0
+        total = mo.get('total_wo_count') or 0
+        open_share = 1 - (mo.get('completed_wo_count') or 0) / total if total else 1
+        need_date = mo.get('schedule_start') or mo.get('deadline')
+        outstanding = max(quantity - (mo.get('completed_quantity') or 0), 0)
+        yield mo.get('bom_id'), quantity * open_share, need_date, outstanding, mo.get('deadline') or need_date
+
+
+def load_structure(root_ids):
+    """BOM documents reachable from ``root_ids``, fetched one level per query"""
+    nodes = {}
+    frontier = list(root_ids)
+    while frontier:
+        docs = list(mongo.db.boms.find({'_id': {'$in': frontier}}, BOM_FIELDS))
+        nodes.update((doc['_id'], doc) for doc in docs)
+        children = {_as_object_id(item['bom_id']) for doc in docs for item in doc.get('items', []) if item.get('bom_id')}
+        frontier = list(children - set(nodes) - {None})
+    return nodes
+
+
+def planning_order(nodes):
+    """BOM ids with every parent ahead of its sub-assemblies (low-level code order)"""
+    def children(bom_id):
+        return [_as_object_id(item['bom_id']) for item in nodes[bom_id].get('items', []) if item.get('bom_id')]
+
+    parents = dict.fromkeys(nodes, 0)
+    for bom_id in nodes:
+        for child in children(bom_id):
+            parents[child] += 1
+    ready = [bom_id for bom_id, count in parents.items() if count == 0]
+    order = []
+    while ready:
+        bom_id = ready.pop()
+        order.append(bom_id)
+        for child in children(bom_id):
+            parents[child] -= 1
+            if parents[child] == 0:
+                ready.append(child)
+    return order
+
+
+def planned_orders(gross, on_hand, receipts):
+    """Quantity to make per period once stock and scheduled receipts are used up"""
+    uncovered = np.maximum(np.cumsum(gross) - on_hand - np.cumsum(receipts), 0)
+    # A later receipt cannot cancel an order already needed earlier
+    return np.diff(np.maximum.accumulate(uncovered), prepend=0)
+
+
+def load_on_hand():
+    """Stock on hand per product ID, summed over inventory rows server-side"""
+    on_hand = {}
+    unlinked = {}
+    for row in mongo.db.inventory.aggregate([
+        {'$group': {'_id': {'product_id': '$product_id', 'item_name': '$item_name'},
+                    'quantity': {'$sum': '$stock_quantity'}}}
+    ]):
+        product_id = _as_object_id(row['_id'].get('product_id'))
+        if product_id:
+            on_hand[product_id] = on_hand.get(product_id, 0) + row['quantity']
+        elif row['_id'].get('item_name'):
+            unlinked[row['_id']['item_name']] = unlinked.get(row['_id']['item_name'], 0) + row['quantity']
+
+    # Rows without a product reference are matched to products by name
+    if unlinked:
+        for product in mongo.db.products.find({'name': {'$in': list(unlinked)}}, {'name': 1}):
+            on_hand[product['_id']] = on_hand.get(product['_id'], 0) + unlinked[product['name']]
+    return on_hand
+
+
+def run_mrp(bucket='week', today=None):
+    """Net material requirements for the whole open MO backlog.
+
+    BOMs are planned level by level, parents before their sub-assemblies.
+    Each BOM's production per period (its open MOs plus any planned
+    orders) is exploded one level into its components. A sub-assembly's
+    demand is first netted against its stock on hand and the output of its
+    own open MOs, and only what is left is exploded further. Raw materials
+    are then netted on the cumulative demand, giving the shortage that
+    first appears in each period.
+    """
+    if bucket not in MRP_BUCKETS:
+        raise ValueError(f'Invalid bucket. Must be one of: {", ".join(MRP_BUCKETS)}')
+    today = period_start(today or datetime.utcnow(), bucket)
+
+    def planning_period(moment):
+        # Past-due demand is needed now
+        return max(period_start(moment, bucket), today) if moment else today
+
+    orders = []
+    errors = {}
+    for bom_id, quantity, need_date, outstanding, due_date in load_open_orders():
+        bom_id = _as_object_id(bom_id)
+        if bom_id is None or (quantity <= 0 and outstanding <= 0):
+            continue
+        orders.append((bom_id, quantity, planning_period(need_date), outstanding, planning_period(due_date)))
+
+    mo_count = len(orders)
+    # The memoized explosion reports missing BOMs and cycles per ordered BOM
+    valid = set()
+    for bom_id in {order[0] for order in orders}:
+        try:
+            explode_per_unit(bom_id)
+        except ValueError as e:
+            errors[str(bom_id)] = str(e)
+            continue
+        valid.add(bom_id)
+    orders = [order for order in orders if order[0] in valid]
+
+    periods = sorted({order[2] for order in orders} | {order[4] for order in orders})
+    period_index = {period: position for position, period in enumerate(periods)}
+    own_demand = {}
+    receipts = {}
+    for bom_id, quantity, need_period, outstanding, due_period in orders:
+        own_demand.setdefault(bom_id, np.zeros(len(periods)))[period_index[need_period]] += quantity
+        receipts.setdefault(bom_id, np.zeros(len(periods)))[period_index[due_period]] += outstanding
+
+    nodes = load_structure(valid)
+    on_hand_map = load_on_hand()
+    dependent = {}
+    outputs = {}
+    product_index = {}
+    leaf_gross = []
+    for bom_id in planning_order(nodes):
+        production = own_demand.get(bom_id, np.zeros(len(periods)))
+        if bom_id in dependent:
+            production = production + planned_orders(
+                dependent[bom_id], on_hand_map.get(outputs[bom_id], 0), receipts.get(bom_id, 0)
+            )
+        for item in nodes[bom_id].get('items', []):
+            demand = (item.get('quantity') or 0) * production
+            if item.get('bom_id'):
+                child = _as_object_id(item['bom_id'])
+                outputs[child] = _as_object_id(item.get('raw_material_id'))
+                dependent[child] = dependent.get(child, 0) + demand
+                continue
+            product_id = _as_object_id(item.get('raw_material_id'))
+            if product_id is None:
+                continue
+            if product_id not in product_index:
+                product_index[product_id] = len(product_index)
+                leaf_gross.append(np.zeros(len(periods)))
+            leaf_gross[product_index[product_id]] += demand
+
+    products = list(product_index)
+    result = {
+        'bucket': bucket,
+        'periods': [period.date().isoformat() for period in periods],
+        'mo_count': mo_count,
+        'products': [],
+        'errors': errors
+    }
+    if not products:
+        return result
+
+    gross = np.column_stack(leaf_gross)  # periods x products
+    on_hand = np.array([on_hand_map.get(product_id, 0) for product_id in products], dtype=float)
+
+    cumulative_shortage = np.maximum(np.cumsum(gross, axis=0) - on_hand, 0)
+    net = np.diff(cumulative_shortage, axis=0, prepend=0)
+
+    names = {
+        product['_id']: product
+        for product in mongo.db.products.find({'_id': {'$in': products}}, {'name': 1, 'unit': 1})
+    }
+    gross_total = gross.sum(axis=0)
+    shortage_total = cumulative_shortage[-1]
+    for column in np.argsort(-shortage_total, kind='stable'):
+        product_id = products[column]
+        result['products'].append({
+            'product_id': str(product_id),
+            'name': names.get(product_id, {}).get('name'),
+            'unit': names.get(product_id, {}).get('unit'),
+            'on_hand': float(on_hand[column]),
+            'gross_requirement': float(gross_total[column]),
+            'shortage': float(shortage_total[column]),
+            'phased': [
+                {'period': result['periods'][row], 'gross': float(gross[row, column]), 'net': float(net[row, column])}
+                for row in np.flatnonzero(gross[:, column])
+            ]
+        })
+    return result
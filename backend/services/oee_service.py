@@ -0,0 +1,121 @@
+from database import mongo
+from config import Config
+from models.oee_model import WorkCenterOEE, production_day, DAY
+from datetime import datetime
+
+MAX_WINDOW_DAYS = 366
+
+
+def oee_figures(totals, capacity, planned_minutes):
+    """Availability x performance x quality from summed rollup counters, in %.
+
+    Availability is run time over the planned production time of every slot
+    of the center, performance is ideal (planned) time over run time, and
+    quality is good units over units handled. Each factor is capped at 100%.
+    """
+    run = totals.get('run_minutes', 0)
+    available = capacity * planned_minutes
+    availability = min(run / available, 1) if available else 0
+    performance = min(totals.get('ideal_minutes', 0) / run, 1) if run else 0
+    quality = min(totals.get('good_units', 0) / totals['units'], 1) if totals.get('units') else 0
+    return {
+        'availability': round(100 * availability, 1),
+        'performance': round(100 * performance, 1),
+        'quality': round(100 * quality, 1),
+        'oee': round(100 * availability * performance * quality, 1),
+        'wo_completed': totals.get('wo_completed', 0),
+        'run_hours': round(run / 60, 2)
+    }
+
+
+def _window(start, end, now):
+    end_day = production_day(end) if end else production_day(now)
+    start_day = production_day(start) if start else end_day - 6 * DAY
+    if start_day > end_day:
+        raise ValueError('start must not be after end')
+    if (end_day - start_day).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f'Window is limited to {MAX_WINDOW_DAYS} days')
+    return start_day, end_day
+
+
+def _capacity(center):
+    return max(int(center.get('capacity') or 1), 1)
+
+
+def _add(into, row):
+    for field in ('wo_completed', 'run_minutes', 'ideal_minutes', 'units', 'good_units'):
+        into[field] = into.get(field, 0) + row.get(field, 0)
+
+
+def get_work_center_oee(center, start=None, end=None, by='day', now=None):
+    """OEE of one work center over the window, plus one entry per day or shift"""
+    if by not in ('day', 'shift'):
+        raise ValueError('by must be one of: day, shift')
+    now = now or datetime.utcnow()
+    start_day, end_day = _window(start, end, now)
+    WorkCenterOEE.ensure(start_day, end_day, now)
+
+    shift_minutes = Config.OEE_SHIFT_HOURS * 60
+    period_minutes = shift_minutes if by == 'shift' else shift_minutes * Config.OEE_SHIFTS_PER_DAY
+    # Work orders reference their center by ID or, on older rows, by name
+    refs = [ref for ref in (str(center['_id']), center.get('name')) if ref]
+
+    periods = {}
+    for row in WorkCenterOEE.totals(refs, start_day, end_day, by=by):
+        key = (row['_id']['day'], row['_id'].get('shift'))
+        _add(periods.setdefault(key, {}), row)
+
+    total = {}
+    breakdown = []
+    for (day, shift), totals in sorted(periods.items()):
+        _add(total, totals)
+        entry = {'day': day.date().isoformat()}
+        if by == 'shift':
+            entry['shift'] = shift
+        entry.update(oee_figures(totals, _capacity(center), period_minutes))
+        breakdown.append(entry)
+
+    days = (end_day - start_day).days + 1
+    result = {
+        'work_center_id': str(center['_id']),
+        'name': center.get('name'),
+        'start': start_day.date().isoformat(),
+        'end': end_day.date().isoformat()
+    }
+    result.update(oee_figures(total, _capacity(center), days * shift_minutes * Config.OEE_SHIFTS_PER_DAY))
+    result['by'] = by
+    result['periods'] = breakdown
+    return result
+
+
+def get_plant_oee(start=None, end=None, now=None):
+    """OEE of every work center over the window from one rollup aggregation"""
+    now = now or datetime.utcnow()
+    start_day, end_day = _window(start, end, now)
+    WorkCenterOEE.ensure(start_day, end_day, now)
+
+    centers = {}
+    by_ref = {}
+    for center in mongo.db.work_centers.find({}, {'name': 1, 'capacity': 1}):
+        centers[center['_id']] = {}
+        by_ref[str(center['_id'])] = center
+        if center.get('name'):
+            by_ref[center['name']] = center
+    for row in WorkCenterOEE.totals(None, start_day, end_day):
+        center = by_ref.get(row['_id']['work_center'])
+        if center:
+            _add(centers[center['_id']], row)
+
+    planned_minutes = ((end_day - start_day).days + 1) * Config.OEE_SHIFT_HOURS * 60 * Config.OEE_SHIFTS_PER_DAY
+    work_centers = []
+    for center_id, totals in centers.items():
+        center = by_ref[str(center_id)]
+        entry = {'work_center_id': str(center_id), 'name': center.get('name')}
+        entry.update(oee_figures(totals, _capacity(center), planned_minutes))
+        work_centers.append(entry)
+    work_centers.sort(key=lambda entry: entry['oee'])
+    return {
+        'start': start_day.date().isoformat(),
+        'end': end_day.date().isoformat(),
+        'work_centers': work_centers
+    }
@@ -0,0 +1,93 @@
+from flask import current_app
+from models.report_job_model import ReportJob
+from services.report_service import REPORT_ROLES, build_report, normalize_params, render_report_file
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import threading
+import time
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def report_param_hash(report_type, format, params, user):
+    """Hash identifying a report computation.
+
+    Operator reports are per user; every other report type is the same for
+    everyone holding the role, so those requests share one job.
+    """
+    scope = user['id'] if report_type == 'operator' else REPORT_ROLES[report_type]
+    payload = json.dumps({
+        'report_type': report_type,
+        'format': format,
+        'scope': scope,
+        'params': params
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config['REPORT_JOB_INLINE_WORKERS'],
+                thread_name_prefix='report-job'
+            )
+    return _executor
+
+
+def submit_report_job(report_type, format, params, user):
+    """Queue a report job, or return the identical job already in flight"""
+    params = normalize_params(report_type, params)
+    app = current_app._get_current_object()
+    job, created = ReportJob.submit(
+        report_param_hash(report_type, format, params, user),
+        report_type,
+        format,
+        params,
+        user,
+        app.config['REPORT_JOB_TTL_SECONDS']
+    )
+    if created and app.config['REPORT_JOB_INLINE_WORKERS'] > 0:
+        _get_executor(app).submit(process_job, app, job.data['_id'])
+    return job
+
+
+def run_job(job):
+    """Compute, render and store one claimed job"""
+    try:
+        user = {'id': job.data['user_id'], 'role': job.data['role']}
+        report = build_report(job.data['report_type'], user, job.data['params'])
+        file_obj, filename, mimetype = render_report_file(report, job.data['format'])
+        with file_obj:
+            job.complete(file_obj, filename, mimetype)
+    except Exception as e:
+        job.fail(str(e))
+
+
+def process_job(app, job_id):
+    """Run a specific job if no other worker has claimed it yet"""
+    with app.app_context():
+        job = ReportJob.claim(job_id)
+        if job:
+            run_job(job)
+
+
+def run_worker(app, concurrency=2, poll_interval=1.0):
+    """Run a pool of threads that claim and process queued jobs forever"""
+    def loop():
+        with app.app_context():
+            while True:
+                job = ReportJob.claim()
+                if job:
+                    run_job(job)
+                else:
+                    time.sleep(poll_interval)
+
+    threads = [threading.Thread(target=loop, name=f'report-worker-{i}', daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
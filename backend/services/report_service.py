@@ -0,0 +1,192 @@
+from models import WorkOrder
+from models import ManufacturingOrder
+from models.mo_model import to_datetime
+from models.stock_ledger_model import StockLedger
+from models.production_stats_model import DailyProductionStats
+from services.system_stats_service import SystemStats
+from utils.cache_helper import cached, MISSING
+from utils.export_helper import write_excel, render_pdf, excel_response, pdf_response, EXCEL_MIMETYPE, PDF_MIMETYPE
+from flask import jsonify
+from config import Config
+from datetime import datetime, timedelta
+import io
+import json
+
+# Role allowed to run each report type
+REPORT_ROLES = {
+    'operator': 'Operator',
+    'manager': 'Manufacturing Manager',
+    'admin': 'Administrator',
+    'inventory': 'Inventory Manager'
+}
+
+# Query parameters each report type reads; everything else is ignored
+REPORT_PARAMS = {
+    'operator': ('start_date', 'end_date'),
+    'manager': ('start_date', 'end_date'),
+    'admin': (),
+    'inventory': ('start_date', 'end_date')
+}
+
+REPORT_FORMATS = ('json', 'pdf', 'excel')
+
+# Collections each cached report reads. Only the small summary reports are
+# cached; row-level reports stream straight from their cursors.
+REPORT_CACHE_DEPENDENCIES = {
+    'manager': ('daily_production_stats', 'manufacturing_orders'),
+    'admin': ('manufacturing_orders', 'work_orders', 'users', 'inventory')
+}
+
+
+class Report:
+    """A computed report: JSON payload plus tabular rows for file exports.
+
+    ``rows`` is a callable so file exports can pull rows lazily, and more
+    than once if the same report is rendered in several formats. ``data`` is
+    computed on first use and remembered.
+    """
+
+    def __init__(self, title, filename, headers, rows, data):
+        self.title = title
+        self.filename = filename
+        self.headers = headers
+        self.rows = rows
+        self._compute = data
+        self._data = MISSING
+
+    def data(self):
+        if self._data is MISSING:
+            self._data = self._compute()
+        return self._data
+
+    def use_cache(self, key, dependencies):
+        """Serve the payload from the report cache, keyed by ``key`` and the
+        write versions of ``dependencies``"""
+        compute = self._compute
+        self._compute = lambda: cached(key, dependencies, compute)
+
+
+def metric_report(title, filename, metrics, compute):
+    """A Metric/Value report whose rows are read off the JSON payload"""
+    report = Report(title, filename, ['Metric', 'Value'], None, compute)
+    report.rows = lambda: ([label, report.data()[key]] for key, label in metrics)
+    return report
+
+
+def normalize_params(report_type, params):
+    """Keep only the parameters a report reads, with empty values dropped"""
+    return {key: params.get(key) for key in REPORT_PARAMS[report_type] if params.get(key)}
+
+
+def build_operator_report(user, params):
+    start_dt = datetime.fromisoformat(params['start_date']) if params.get('start_date') else None
+    end_dt = datetime.fromisoformat(params['end_date']) if params.get('end_date') else None
+
+    # Rows are produced lazily from the cursor so exports stream in batches
+    def report_rows():
+        for wo in WorkOrder.iter_completed_by_user(user['id'], start_dt, end_dt):
+            yield {'wo_id': str(wo['_id']), 'mo_id': str(wo['mo_id']), 'time_spent': wo.get('actual_duration')}
+
+    return Report(
+        "Operator Completed WOs Report",
+        'operator_report',
+        ['WO ID', 'MO ID', 'Time Spent'],
+        lambda: ([d['wo_id'], d['mo_id'], d['time_spent']] for d in report_rows()),
+        lambda: list(report_rows())
+    )
+
+
+def build_manager_report(user, params):
+    start_date = datetime.fromisoformat(params.get('start_date') or (datetime.now() - timedelta(days=30)).isoformat())
+    end_date = datetime.fromisoformat(params.get('end_date') or datetime.now().isoformat())
+
+    def compute():
+        # Read the pre-aggregated daily rollups instead of the raw MO/WO history
+        stats = DailyProductionStats.summarize(start_date, end_date)
+
+        # Throughput: completed MOs quantity per day
+        throughput = stats['quantity_completed'] / ((end_date - start_date).days + 1) if stats['mo_completed'] else 0
+
+        # Delays: overdue MOs
+        delays = ManufacturingOrder.count_overdue()
+
+        # Resource utilization: avg actual_duration / planned_duration for WOs
+        utilization = stats['utilization_ratio_sum'] / stats['wo_completed'] * 100 if stats['wo_completed'] else 0
+
+        return {'throughput': throughput, 'delays': delays, 'utilization': f'{utilization:.2f}%'}
+
+    return metric_report("Manager Production Report", 'manager_report',
+                         [('throughput', 'Throughput'), ('delays', 'Delays'), ('utilization', 'Utilization')],
+                         compute)
+
+
+def build_admin_report(user, params):
+    def compute():
+        # Counts and the stock total come back from one server-side aggregation
+        stats = SystemStats.summary()
+        return {key: stats[key] for key in ('total_mos', 'total_wos', 'total_users', 'total_inventory')}
+
+    return metric_report("Admin System Report", 'admin_report',
+                         [('total_mos', 'Total MOs'), ('total_wos', 'Total WOs'), ('total_users', 'Total Users'), ('total_inventory', 'Total Inventory')],
+                         compute)
+
+
+def build_inventory_report(user, params):
+    start_date = to_datetime(params.get('start_date'))
+    end_date = to_datetime(params.get('end_date'), end_of_day=True)
+
+    def usage():
+        return StockLedger.get_usage_by_product(start_date, end_date, use_rollup=Config.STOCK_USAGE_ROLLUP)
+
+    return Report(
+        "Inventory Stock Usage Report",
+        'inventory_report',
+        ['Product', 'Usage'],
+        lambda: ([d['product'], d['usage']] for d in usage()),
+        lambda: list(usage())
+    )
+
+
+REPORT_BUILDERS = {
+    'operator': build_operator_report,
+    'manager': build_manager_report,
+    'admin': build_admin_report,
+    'inventory': build_inventory_report
+}
+
+
+def report_cache_key(report_type, user, params):
+    """Cache key for a report: its type, the caller's role and the normalized
+    parameters (plus the user for per-user reports)"""
+    key = [report_type, user.get('role'), sorted(params.items())]
+    if report_type == 'operator':
+        key.append(user.get('id'))
+    return key
+
+
+def build_report(report_type, user, params):
+    """Compute a report of ``report_type`` for ``user`` from request parameters"""
+    params = normalize_params(report_type, params)
+    report = REPORT_BUILDERS[report_type](user, params)
+    if report_type in REPORT_CACHE_DEPENDENCIES:
+        report.use_cache(report_cache_key(report_type, user, params), REPORT_CACHE_DEPENDENCIES[report_type])
+    return report
+
+
+def report_response(report, format):
+    """Send a report back in the requested format"""
+    if format == 'pdf':
+        return pdf_response(report.rows(), report.headers, report.title, f'{report.filename}.pdf')
+    elif format == 'excel':
+        return excel_response(report.rows(), report.headers, f'{report.filename}.xlsx')
+    return jsonify(report.data()), 200
+
+
+def render_report_file(report, format):
+    """Render a report to (file object, download name, mimetype) for storage"""
+    if format == 'pdf':
+        return render_pdf(report.rows(), report.headers, report.title), f'{report.filename}.pdf', PDF_MIMETYPE
+    elif format == 'excel':
+        return write_excel(report.rows(), report.headers), f'{report.filename}.xlsx', EXCEL_MIMETYPE
+    payload = json.dumps(report.data(), default=str).encode('utf-8')
+    return io.BytesIO(payload), f'{report.filename}.json', 'application/json'
@@ -0,0 +1,355 @@
+from database import mongo, bump_version
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from models.work_order import PRIORITY_RANK
+import heapq
+
+OPEN_WO_STATUSES = ('pending', 'in_progress')
+
+WO_FIELDS = {
+    'mo_id': 1, 'work_center': 1, 'planned_duration': 1, 'status': 1, 'priority': 1,
+    'sequence': 1, 'start_time': 1, 'created_at': 1,
+    'scheduled_start': 1, 'scheduled_end': 1, 'scheduled_slot': 1
+}
+
+
+class Shop:
+    """Snapshot of open work orders, their MOs and the work centers they use.
+
+    Loads every open WO unless ``work_orders`` is given; incremental runs
+    pass only the WOs in scope and grow the snapshot with ``add``.
+    """
+
+    def __init__(self, now=None, work_orders=None):
+        self.now = now or datetime.utcnow()
+        self.work_orders = {}
+        self.mos = {}
+        self.centers = {}
+        self.chains = {}
+        self.position = {}
+        if work_orders is None:
+            work_orders = mongo.db.work_orders.find(
+                {'status': {'$in': list(OPEN_WO_STATUSES)}}, WO_FIELDS, batch_size=5000
+            )
+            self._add_centers(mongo.db.work_centers.find({}, {'name': 1, 'capacity': 1}))
+        self.add(work_orders)
+
+    def _add_centers(self, centers):
+        for center in centers:
+            # Work orders reference their center by ID or, on older rows, by name
+            self.centers[str(center['_id'])] = center
+            self.centers[center.get('name')] = center
+
+    def load_centers(self, refs):
+        """Fetch the work centers behind ``refs`` that are not known yet"""
+        refs = {str(ref) for ref in refs} - set(self.centers)
+        if refs:
+            ids = [ObjectId(ref) for ref in refs if ObjectId.is_valid(ref)]
+            self._add_centers(mongo.db.work_centers.find(
+                {'$or': [{'_id': {'$in': ids}}, {'name': {'$in': list(refs)}}]}, {'name': 1, 'capacity': 1}
+            ))
+
+    def add(self, work_orders):
+        """Take ``work_orders`` into the snapshot with their MOs and centers"""
+        added = [wo for wo in work_orders if wo['_id'] not in self.work_orders]
+        if not added:
+            return
+        for wo in added:
+            self.work_orders[wo['_id']] = wo
+        mo_ids = list({wo['mo_id'] for wo in added} - set(self.mos))
+        if mo_ids:
+            self.mos.update((mo['_id'], mo) for mo in mongo.db.manufacturing_orders.find(
+                {'_id': {'$in': mo_ids}}, {'schedule_start': 1, 'deadline': 1, 'priority': 1}
+            ))
+        self.load_centers(wo.get('work_center') for wo in added)
+
+        # Operations of one MO run in order: by sequence, then creation order
+        self.chains = {}
+        for wo in sorted(self.work_orders.values(),
+                         key=lambda wo: (wo.get('sequence') or 0, wo.get('created_at') or self.now, wo['_id'])):
+            self.chains.setdefault(wo['mo_id'], []).append(wo['_id'])
+        self.position = {}
+        for chain in self.chains.values():
+            for index, wo_id in enumerate(chain):
+                self.position[wo_id] = index
+
+    def center_key(self, wo):
+        center = self.centers.get(str(wo.get('work_center')))
+        return str(center['_id']) if center else str(wo.get('work_center'))
+
+    def center_refs(self, center_key):
+        """Every value a WO's ``work_center`` may hold for this center"""
+        center = self.centers.get(center_key)
+        return [str(center['_id']), center.get('name')] if center else [center_key]
+
+    def capacity(self, center_key):
+        center = self.centers.get(center_key)
+        return max(int(center.get('capacity') or 1), 1) if center else 1
+
+    def duration(self, wo):
+        # planned_duration already accounts for the work center's efficiency
+        return timedelta(minutes=wo.get('planned_duration') or 0)
+
+    def dispatch_key(self, wo):
+        """EDD within priority: high before medium before low, then earliest deadline"""
+        mo = self.mos.get(wo['mo_id'], {})
+        priority = mo.get('priority') or wo.get('priority') or 'medium'
+        return (
+            PRIORITY_RANK.get(priority, 1),
+            mo.get('deadline') or datetime.max,
+            mo.get('schedule_start') or self.now,
+            self.position[wo['_id']]
+        )
+
+    def release_time(self, wo):
+        mo = self.mos.get(wo['mo_id'], {})
+        return max(mo.get('schedule_start') or self.now, self.now)
+
+    def predecessor(self, wo_id):
+        index = self.position[wo_id]
+        return self.chains[self.work_orders[wo_id]['mo_id']][index - 1] if index else None
+
+    def successors(self, wo_id):
+        chain = self.chains[self.work_orders[wo_id]['mo_id']]
+        return chain[self.position[wo_id] + 1:]
+
+
+def _dispatch(shop, wo_ids, slot_free, ready_at):
+    """Heap-based list scheduling of ``wo_ids`` onto work center slots.
+
+    ``slot_free`` maps a center to a heap of (free time, slot) pairs and
+    ``ready_at`` gives the earliest start of WOs whose predecessor is not in
+    ``wo_ids``. Ready WOs sit in a heap ordered by the dispatch key; each pop
+    takes the earliest free slot of its center, then releases the next WO of
+    its MO. O(n log n) in the number of WOs scheduled.
+    """
+    pending = set(wo_ids)
+    schedule = {}
+    ready = []
+    for wo_id in wo_ids:
+        predecessor = shop.predecessor(wo_id)
+        if predecessor is None or predecessor not in pending:
+            wo = shop.work_orders[wo_id]
+            heapq.heappush(ready, (shop.dispatch_key(wo), wo_id))
+
+    while ready:
+        _, wo_id = heapq.heappop(ready)
+        wo = shop.work_orders[wo_id]
+        center = shop.center_key(wo)
+        slots = slot_free.setdefault(center, [(shop.now, slot) for slot in range(shop.capacity(center))])
+        free_at, slot = heapq.heappop(slots)
+
+        earliest = max(ready_at.get(wo_id, shop.now), shop.release_time(wo))
+        if wo['status'] == 'in_progress' and wo.get('start_time'):
+            # Already running: it keeps its actual start
+            start = wo['start_time']
+        else:
+            start = max(earliest, free_at)
+        end = start + shop.duration(wo)
+        heapq.heappush(slots, (max(end, free_at), slot))
+        schedule[wo_id] = (start, end, slot)
+
+        for successor in shop.successors(wo_id):
+            if successor in pending:
+                ready_at[successor] = max(ready_at.get(successor, shop.now), end)
+                heapq.heappush(ready, (shop.dispatch_key(shop.work_orders[successor]), successor))
+                break
+    return schedule
+
+
+def _save(shop, schedule):
+    """Write back only the WOs whose slot or times moved"""
+    now = datetime.utcnow()
+    updates = []
+    for wo_id, (start, end, slot) in schedule.items():
+        wo = shop.work_orders[wo_id]
+        if (wo.get('scheduled_start'), wo.get('scheduled_end'), wo.get('scheduled_slot')) == (start, end, slot):
+            continue
+        updates.append(UpdateOne(
+            {'_id': wo_id},
+            {'$set': {'scheduled_start': start, 'scheduled_end': end, 'scheduled_slot': slot, 'updated_at': now}}
+        ))
+    for offset in range(0, len(updates), 1000):
+        mongo.db.work_orders.bulk_write(updates[offset:offset + 1000], ordered=False)
+    if updates:
+        bump_version('work_orders')
+    return len(updates)
+
+
+def schedule_all(now=None):
+    """Plan every open WO against finite work center capacity from scratch.
+
+    Running WOs are placed first at their actual start so they block their
+    slot. Returns (number of WOs scheduled, number whose plan changed).
+    """
+    shop = Shop(now)
+    running = [wo_id for wo_id, wo in shop.work_orders.items() if wo['status'] == 'in_progress']
+    slot_free = {}
+    schedule = _dispatch(shop, running, slot_free, {})
+    ready_at = {}
+    for wo_id in running:
+        for successor in shop.successors(wo_id):
+            ready_at[successor] = schedule[wo_id][1]
+            break
+    schedule.update(_dispatch(shop, [wo_id for wo_id in shop.work_orders if wo_id not in schedule], slot_free, ready_at))
+    return len(schedule), _save(shop, schedule)
+
+
+def _affected(shop, seeds):
+    """Seeds plus everything planned after them on the same center or later
+    in the same MO, transitively: the only WOs a change can move"""
+    by_center = {}
+    for wo_id, wo in shop.work_orders.items():
+        if wo.get('scheduled_start'):
+            by_center.setdefault(shop.center_key(wo), []).append((wo['scheduled_start'], wo_id))
+    for entries in by_center.values():
+        entries.sort()
+
+    # Per center, everything from this start time onward is already affected
+    expanded_from = {}
+    affected = set()
+    stack = list(seeds)
+    while stack:
+        wo_id = stack.pop()
+        if wo_id in affected or wo_id not in shop.work_orders:
+            continue
+        affected.add(wo_id)
+        wo = shop.work_orders[wo_id]
+        stack.extend(shop.successors(wo_id))
+        start = wo.get('scheduled_start')
+        if start is None:
+            continue
+        center = shop.center_key(wo)
+        entries = by_center.get(center, [])
+        upper = expanded_from.get(center)
+        if upper is not None and upper <= start:
+            continue
+        low = bisect_left(entries, (start,))
+        high = bisect_left(entries, (upper,)) if upper is not None else len(entries)
+        stack.extend(entry_id for _, entry_id in entries[low:high])
+        expanded_from[center] = start
+    return affected
+
+
+def _load_scope(shop, seeds, centers_from):
+    """Grow ``shop`` until it holds everything ``seeds`` can push around.
+
+    That is every open WO of an affected MO and, per work center, every WO
+    planned from the earliest affected start onward; ``centers_from`` maps
+    a center to the time from which its WOs are moved. Each round is one
+    query, and rounds stop once nothing new is in scope. Returns the
+    affected WO IDs.
+    """
+    loaded_mos = set()
+    loaded_from = {}
+    while True:
+        for wo_id, wo in shop.work_orders.items():
+            start = wo.get('scheduled_start')
+            center = shop.center_key(wo)
+            if start and center in centers_from and start >= centers_from[center]:
+                seeds.add(wo_id)
+        affected = _affected(shop, seeds)
+
+        mo_ids = {shop.work_orders[wo_id]['mo_id'] for wo_id in affected} - loaded_mos
+        for wo_id in affected:
+            wo = shop.work_orders[wo_id]
+            if wo.get('scheduled_start'):
+                center = shop.center_key(wo)
+                centers_from[center] = min(centers_from.get(center, wo['scheduled_start']), wo['scheduled_start'])
+        clauses = [{'mo_id': {'$in': list(mo_ids)}}] if mo_ids else []
+        for center, start in centers_from.items():
+            if center not in loaded_from or start < loaded_from[center]:
+                clauses.append({'work_center': {'$in': shop.center_refs(center)}, 'scheduled_start': {'$gte': start}})
+                loaded_from[center] = start
+        if not clauses:
+            return affected
+        loaded_mos |= mo_ids
+        shop.add(mongo.db.work_orders.find({'status': {'$in': list(OPEN_WO_STATUSES)}, '$or': clauses}, WO_FIELDS))
+
+
+def _booked_slots(shop, affected):
+    """Slot free times on the affected WOs' centers, from every other booking"""
+    centers = {shop.center_key(shop.work_orders[wo_id]) for wo_id in affected}
+    refs = [ref for center in centers for ref in shop.center_refs(center)]
+    slot_free = {}
+    for booking in mongo.db.work_orders.aggregate([
+        {'$match': {'status': {'$in': list(OPEN_WO_STATUSES)}, 'work_center': {'$in': refs},
+                    'scheduled_end': {'$ne': None}, '_id': {'$nin': list(affected)}}},
+        {'$group': {'_id': {'work_center': '$work_center', 'slot': {'$ifNull': ['$scheduled_slot', 0]}},
+                    'free_at': {'$max': '$scheduled_end'}}}
+    ]):
+        key = shop.center_key(booking['_id'])
+        slots = slot_free.setdefault(key, {slot: shop.now for slot in range(shop.capacity(key))})
+        slot = booking['_id']['slot']
+        slots[slot] = max(slots.get(slot, shop.now), booking['free_at'])
+    slot_heaps = {}
+    for key, slots in slot_free.items():
+        slot_heaps[key] = [(free_at, slot) for slot, free_at in slots.items()]
+        heapq.heapify(slot_heaps[key])
+    return slot_heaps
+
+
+def _reschedule(shop, seeds, centers_from):
+    affected = _load_scope(shop, seeds, centers_from)
+    if not affected:
+        return 0, 0
+    ready_at = {}
+    for wo_id in affected:
+        predecessor = shop.predecessor(wo_id)
+        if predecessor is not None and predecessor not in affected:
+            end = shop.work_orders[predecessor].get('scheduled_end')
+            if end:
+                ready_at[wo_id] = end
+    schedule = _dispatch(shop, list(affected), _booked_slots(shop, affected), ready_at)
+    return len(schedule), _save(shop, schedule)
+
+
+def reschedule_work_order(wo_id, previous_start=None, work_center=None, now=None):
+    """Replan only what one changed WO can push around.
+
+    The changed WO (if still open), every WO planned after it on its work
+    center and every later operation of the affected MOs are dispatched
+    again; all other WOs keep their slots, and those bookings seed the
+    slot free times. ``previous_start``/``work_center`` describe where the
+    WO sat before the change, which matters once it has left the open set
+    (completed or cancelled). Only the WOs in scope are read, so this is
+    cheap enough to run on every status change; a WO that was never
+    scheduled is placed after the existing bookings.
+    """
+    if isinstance(wo_id, str):
+        wo_id = ObjectId(wo_id)
+    wo = mongo.db.work_orders.find_one({'_id': wo_id}, WO_FIELDS)
+    if wo is None:
+        return 0, 0
+    previous_start = previous_start or wo.get('scheduled_start')
+    work_center = work_center or wo.get('work_center')
+
+    shop = Shop(now, mongo.db.work_orders.find(
+        {'mo_id': wo['mo_id'], 'status': {'$in': list(OPEN_WO_STATUSES)}}, WO_FIELDS
+    ))
+    if wo_id in shop.work_orders:
+        seeds = {wo_id}
+    else:
+        # Closed: the MO's next open operation may now start earlier
+        chain = shop.chains.get(wo['mo_id'], [])
+        seeds = set(chain[:1])
+    centers_from = {}
+    if previous_start is not None:
+        shop.load_centers([work_center])
+        centers_from[shop.center_key({'work_center': work_center})] = previous_start
+    return _reschedule(shop, seeds, centers_from)
+
+
+def schedule_new_work_orders(wo_ids, now=None):
+    """Place newly created WOs after what is already booked on their centers"""
+    shop = Shop(now, mongo.db.work_orders.find(
+        {'_id': {'$in': list(wo_ids)}, 'status': {'$in': list(OPEN_WO_STATUSES)}}, WO_FIELDS
+    ))
+    # Their MOs may already have open operations they must follow
+    shop.add(mongo.db.work_orders.find(
+        {'mo_id': {'$in': list({wo['mo_id'] for wo in shop.work_orders.values()})},
+         'status': {'$in': list(OPEN_WO_STATUSES)}}, WO_FIELDS
+    ))
+    return _reschedule(shop, set(wo_ids) & set(shop.work_orders), {})
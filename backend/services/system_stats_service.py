@@ -0,0 +1,59 @@
+from database import mongo
+
+# Stat name -> collection whose document count it reports
+COUNTED_COLLECTIONS = {
+    'total_mos': 'manufacturing_orders',
+    'total_wos': 'work_orders',
+    'total_users': 'users'
+}
+
+
+class SystemStats:
+    """Plant-wide totals for dashboards, computed on the server.
+
+    One ``$group`` over ``inventory`` yields the stock sum and row count,
+    and each counted collection is folded in with ``$unionWith``.
+    Everything comes back from one aggregation round trip, one row per
+    source, each row carrying its own stat fields.
+    """
+
+    @staticmethod
+    def _count_stage(name, exact):
+        # $collStats reads the count from collection metadata, the same
+        # source as estimated_document_count, instead of walking the _id index
+        if exact:
+            return [{'$group': {'_id': name, name: {'$sum': 1}}}]
+        return [
+            {'$collStats': {'count': {}}},
+            # One document per shard on sharded clusters
+            {'$group': {'_id': name, name: {'$sum': '$count'}}}
+        ]
+
+    @classmethod
+    def pipeline(cls, exact=False):
+        """Aggregation run against ``inventory`` that yields every stat"""
+        pipeline = [
+            {'$group': {
+                '_id': 'inventory',
+                'total_inventory': {'$sum': '$stock_quantity'},
+                'inventory_items': {'$sum': 1}
+            }}
+        ]
+        for name, collection in COUNTED_COLLECTIONS.items():
+            pipeline.append({'$unionWith': {'coll': collection, 'pipeline': cls._count_stage(name, exact)}})
+        return pipeline
+
+    @classmethod
+    def summary(cls, exact=False):
+        """MO, WO and user counts plus the total stock on hand.
+
+        Counts are metadata estimates unless ``exact`` is set; they can drift
+        briefly after an unclean shutdown, which is fine for a dashboard.
+        Empty collections produce no row and report 0.
+        """
+        stats = {name: 0 for name in COUNTED_COLLECTIONS}
+        stats.update({'total_inventory': 0, 'inventory_items': 0})
+        for row in mongo.db.inventory.aggregate(cls.pipeline(exact)):
+            row.pop('_id', None)
+            stats.update(row)
+        return stats
@@ -0,0 +1,165 @@
+from database import mongo
+from models.production_stats_model import day_bucket
+from models.entry_bucket_model import wo_history
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+
+DAY = timedelta(days=1)
+# Work orders are looked up by start time; one that started further back
+# than this before a day is assumed to be over by then
+MAX_RUN = timedelta(days=7)
+MAX_WINDOW_DAYS = 366
+
+
+def busy_intervals(wo, now, time_logs=None):
+    """(start, end) spans a work order kept its work center busy.
+
+    Time logs are the most precise record, so they win when they carry
+    start times; otherwise the WO's own start/end is used. Only running WOs
+    are busy up to ``now``: a log left open on a WO that has since stopped
+    ends with the WO, or is dropped if the WO has no end time either. A WO
+    that never started kept nothing busy.
+    """
+    if wo.get('status') == 'in_progress':
+        open_until = now
+    else:
+        open_until = min(wo['end_time'], now) if wo.get('end_time') else None
+    logged = [
+        (log['start_time'], log.get('end_time') or open_until)
+        for log in time_logs or []
+        if isinstance(log.get('start_time'), datetime) and (log.get('end_time') or open_until)
+    ]
+    if logged:
+        return logged
+    start, end = wo.get('start_time'), wo.get('end_time')
+    if start is None:
+        return []
+    if end is None:
+        end = now if wo.get('status') == 'in_progress' else start + timedelta(minutes=wo.get('actual_duration') or 0)
+    return [(start, end)]
+
+
+def merged_busy_seconds(intervals, capacity=1):
+    """Busy time of a center with ``capacity`` parallel slots.
+
+    Intervals are sorted and merged in one sweep; where more WOs overlap than
+    the center has slots, only ``capacity`` of them count.
+    """
+    events = []
+    for start, end in intervals:
+        if end > start:
+            events.append((start, 1))
+            events.append((end, -1))
+    events.sort()
+    busy = 0.0
+    running = 0
+    previous = None
+    for moment, change in events:
+        if running and previous is not None:
+            busy += (moment - previous).total_seconds() * min(running, capacity)
+        running += change
+        previous = moment
+    return busy
+
+
+def _center_refs(center):
+    # Work orders reference their center by ID or, on older rows, by name
+    return [ref for ref in (str(center['_id']), center.get('name')) if ref]
+
+
+def _compute_days(center, days, now):
+    """Busy seconds of ``center`` for each day in ``days`` from one indexed query.
+
+    Work orders without a start time are left out: they never ran. Finished
+    ones are looked up at most ``MAX_RUN`` before the window; a running one
+    is busy from its start however long ago that was.
+    """
+    first, last = min(days), max(days) + DAY
+    work_orders = list(mongo.db.work_orders.find(
+        {
+            'work_center': {'$in': _center_refs(center)},
+            '$or': [
+                {
+                    'start_time': {'$gte': first - MAX_RUN, '$lt': last},
+                    '$or': [{'end_time': {'$gte': first}}, {'end_time': None}]
+                },
+                {'status': 'in_progress', 'start_time': {'$lt': last}}
+            ]
+        },
+        {'start_time': 1, 'end_time': 1, 'actual_duration': 1, 'status': 1}
+    ))
+    time_logs = wo_history.all([wo['_id'] for wo in work_orders], 'time_logs')
+    intervals = []
+    for wo in work_orders:
+        intervals.extend(busy_intervals(wo, now, time_logs.get(wo['_id'])))
+
+    capacity = max(int(center.get('capacity') or 1), 1)
+    busy = {}
+    for day in days:
+        day_end = min(day + DAY, now)
+        clipped = [(max(start, day), min(end, day_end)) for start, end in intervals if start < day_end and end > day]
+        busy[day] = merged_busy_seconds(clipped, capacity)
+    return busy
+
+
+def get_utilization(center, start=None, end=None, now=None):
+    """Utilization of one work center per day and over the window.
+
+    Each (work center, day) bucket is computed once from the work orders that
+    ran on it. Days that are over are stored in ``work_center_daily_usage``
+    and never recomputed; only today (and days not yet stored) hit the work
+    orders.
+    """
+    now = now or datetime.utcnow()
+    today = day_bucket(now)
+    end_day = day_bucket(end) if end else today
+    start_day = day_bucket(start) if start else end_day - 6 * DAY
+    if start_day > end_day:
+        raise ValueError('start must not be after end')
+    if (end_day - start_day).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f'Window is limited to {MAX_WINDOW_DAYS} days')
+    days = [start_day + offset * DAY for offset in range((min(end_day, today) - start_day).days + 1)]
+
+    busy = {
+        row['day']: row['busy_seconds']
+        for row in mongo.db.work_center_daily_usage.find(
+            {'work_center_id': center['_id'], 'day': {'$gte': start_day, '$lte': end_day}},
+            {'day': 1, 'busy_seconds': 1}
+        )
+    }
+    missing = [day for day in days if day not in busy]
+    if missing:
+        computed = _compute_days(center, missing, now)
+        busy.update(computed)
+        finished = [
+            UpdateOne(
+                {'work_center_id': center['_id'], 'day': day},
+                {'$set': {'busy_seconds': seconds, 'computed_at': now}},
+                upsert=True
+            )
+            for day, seconds in computed.items() if day + DAY <= today
+        ]
+        if finished:
+            mongo.db.work_center_daily_usage.bulk_write(finished, ordered=False)
+
+    capacity = max(int(center.get('capacity') or 1), 1)
+    daily = []
+    total_busy = total_available = 0.0
+    for day in days:
+        available = (min(day + DAY, now) - day).total_seconds() * capacity
+        total_busy += busy[day]
+        total_available += available
+        daily.append({
+            'day': day.date().isoformat(),
+            'busy_hours': round(busy[day] / 3600, 2),
+            'rate': round(100 * busy[day] / available, 1) if available else 0
+        })
+    return {
+        'work_center_id': str(center['_id']),
+        'start': start_day.date().isoformat(),
+        'end': end_day.date().isoformat(),
+        'rate': round(100 * total_busy / total_available, 1) if total_available else 0,
+        'busy_hours': round(total_busy / 3600, 2),
+        'idle_hours': round((total_available - total_busy) / 3600, 2),
+        'daily': daily
+    }
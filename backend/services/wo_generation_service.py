@@ -0,0 +1,92 @@
+from database import mongo, run_in_transaction, bump_version
+from models.mo_model import ManufacturingOrder
+from models.work_order import WorkOrder
+from models.reservation_model import StockReservation
+from services.scheduling_service import schedule_new_work_orders
+from utils.event_bus import publish
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def _object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def build_work_orders(mo_data, operations, assigned_to=None):
+    """One work order document per BOM operation, in routing order.
+
+    ``planned_duration`` is the operation's ``time_required`` (minutes per
+    unit) times the MO quantity, divided by its work center's efficiency.
+    All work centers are read in one query.
+    """
+    center_ids = {_object_id(operation.get('work_center_id')) for operation in operations} - {None}
+    efficiency = {
+        center['_id']: center.get('efficiency') or 1.0
+        for center in mongo.db.work_centers.find({'_id': {'$in': list(center_ids)}}, {'efficiency': 1})
+    }
+
+    work_orders = []
+    for sequence, operation in enumerate(operations):
+        center_id = _object_id(operation.get('work_center_id'))
+        minutes = (operation.get('time_required') or 0) * mo_data['quantity'] / efficiency.get(center_id, 1.0)
+        work_orders.append(WorkOrder.build(
+            mo_data['_id'],
+            None,
+            assigned_to=assigned_to,
+            work_center=str(center_id) if center_id else operation.get('work_center_id'),
+            planned_duration=round(minutes, 2),
+            priority=mo_data.get('priority', 'medium'),
+            deadline=mo_data.get('deadline'),
+            operation_name=operation.get('operation_name'),
+            sequence=sequence
+        ))
+    return work_orders
+
+
+def create_mo_with_work_orders(bom_data, quantity, schedule_start, deadline, assignee_id,
+                               wo_assignee_id=None, requirements=None, allow_shortage=False,
+                               generate_work_orders=True, **kwargs):
+    """Create an MO with its component reservation and a work order per BOM operation.
+
+    The reservation, the MO (inserted with its work order counter already
+    set) and the work orders (one ``insert_many``) commit in one
+    transaction, reservation first, so an MO that cannot get its stock is
+    never written and nothing is published before everything committed.
+    ``requirements`` and ``allow_shortage`` are as for
+    ``StockReservation.reserve_for_mo``, which also raises the same
+    ``InsufficientStockError``. Returns (manufacturing order, work orders,
+    reservations, shortages by product ID).
+    """
+    mo_data = ManufacturingOrder.build(bom_data['_id'], quantity, schedule_start, deadline, assignee_id, **kwargs)
+    mo_data['_id'] = ObjectId()
+    operations = bom_data.get('operations', []) if generate_work_orders else []
+    wo_documents = build_work_orders(mo_data, operations, assigned_to=wo_assignee_id)
+    mo_data['total_wo_count'] = len(wo_documents)
+
+    def apply(session):
+        reservations, shortages = StockReservation.reserve(
+            mo_data['_id'], requirements or {}, allow_shortage, session=session
+        )
+        try:
+            mongo.db.manufacturing_orders.insert_one(mo_data, session=session)
+            work_orders = WorkOrder.create_many(wo_documents, session=session)
+        except Exception:
+            if session is None:
+                # No transaction to roll back the reservation with
+                StockReservation.release_for_mo(mo_data['_id'])
+            raise
+        return work_orders, reservations, shortages
+
+    work_orders, reservations, shortages = run_in_transaction(apply)
+    bump_version('manufacturing_orders', 'work_orders', 'inventory')
+    publish('manufacturing_orders', mo_data)
+    for wo in work_orders:
+        publish('work_orders', wo.data)
+    if work_orders:
+        schedule_new_work_orders([wo.data['_id'] for wo in work_orders])
+    return ManufacturingOrder(mo_data), work_orders, reservations, shortages
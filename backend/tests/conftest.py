@@ -0,0 +1,120 @@
+import os
+import sys
+
+import mongomock
+import mongomock.collection
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import mongo
+
+
+def _ignore_sort(method):
+    # pymongo >= 4.9 passes ``sort`` to bulk builders, which mongomock predates
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in ('add_update', 'add_replace'):
+    setattr(mongomock.collection.BulkOperationBuilder, _name,
+            _ignore_sort(getattr(mongomock.collection.BulkOperationBuilder, _name)))
+
+
+class MergeKeyError(Exception):
+    """What MongoDB raises (code 51132) for a $merge ``on`` field that is null or missing"""
+
+
+def _merge(collection, documents, spec):
+    target = collection.database[spec['into'] if isinstance(spec['into'], str) else spec['into']['coll']]
+    on = spec.get('on', '_id')
+    on = [on] if isinstance(on, str) else on
+    when_matched = spec.get('whenMatched', 'merge')
+    when_not_matched = spec.get('whenNotMatched', 'insert')
+    for document in documents:
+        key = {}
+        for field in on:
+            if document.get(field) is None:
+                raise MergeKeyError(f'$merge write error: on field {field!r} cannot be null or missing')
+            key[field] = document[field]
+        existing = target.find_one(key)
+        if existing is None:
+            if when_not_matched == 'insert':
+                target.insert_one(dict(document))
+            elif when_not_matched == 'fail':
+                raise MergeKeyError('$merge found no matching document')
+        elif when_matched == 'merge':
+            target.update_one({'_id': existing['_id']}, {'$set': {k: v for k, v in document.items() if k != '_id'}})
+        elif when_matched == 'replace':
+            target.replace_one({'_id': existing['_id']}, {k: v for k, v in document.items() if k != '_id'})
+        elif when_matched == 'fail':
+            raise MergeKeyError('$merge matched an existing document')
+
+
+def _run_stages(collection, stages, aggregate):
+    # $collStats and $unionWith are emulated; runs of other stages go to
+    # mongomock, over a scratch collection once documents came from elsewhere
+    documents = None
+    pending = []
+
+    def run():
+        if documents is None:
+            return list(aggregate(collection, pending))
+        if not pending:
+            return documents
+        scratch = collection.database['_scratch_' + str(ObjectId())]
+        if documents:
+            scratch.insert_many([dict(document) for document in documents])
+        try:
+            return list(aggregate(scratch, pending))
+        finally:
+            scratch.drop()
+
+    for stage in stages:
+        if '$collStats' in stage:
+            documents = [{'count': collection.count_documents({})}]
+        elif '$unionWith' in stage:
+            documents, pending = run(), []
+            spec = stage['$unionWith']
+            spec = {'coll': spec} if isinstance(spec, str) else spec
+            documents = documents + _run_stages(collection.database[spec['coll']], spec.get('pipeline', []), aggregate)
+        else:
+            pending.append(stage)
+    return run()
+
+
+def _emulated_aggregate(aggregate):
+    # mongomock implements neither $merge nor $unionWith/$collStats; run the
+    # rest with mongomock and write merges with MongoDB's rules for ``on``
+    def wrapper(self, pipeline, *args, **kwargs):
+        stages, spec = stages_before_merge(pipeline)
+        documents = _run_stages(self, stages, aggregate)
+        if spec is None:
+            return iter(documents)
+        _merge(self, documents, spec)
+        return iter([])
+    return wrapper
+
+
+mongomock.collection.Collection.aggregate = _emulated_aggregate(mongomock.collection.Collection.aggregate)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An empty in-memory database behind ``mongo.db`` (standalone, no transactions)"""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongo, 'cx', client)
+    monkeypatch.setattr(mongo, 'db', client.crafterp_test)
+    monkeypatch.setattr(database, '_transactions_supported', False)
+    return mongo.db
+
+
+def stages_before_merge(pipeline):
+    """The stages of an aggregation pipeline up to its ``$merge``, and the merge spec"""
+    for index, stage in enumerate(pipeline):
+        if '$merge' in stage:
+            return pipeline[:index], stage['$merge']
+    return pipeline, None
@@ -0,0 +1,68 @@
+from bson import ObjectId
+
+from services.bom_service import create_bom_document, expand_boms
+
+
+def count_finds(monkeypatch, collection):
+    calls = []
+    original = type(collection).find
+
+    def find(self, *args, **kwargs):
+        if self.name == collection.name:
+            calls.append(args)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(collection), 'find', find)
+    return calls
+
+
+def test_expand_boms_resolves_references_in_one_query_per_collection(db, monkeypatch):
+    steel = db.products.insert_one({'name': 'Steel', 'unit': 'kg'}).inserted_id
+    paint = db.products.insert_one({'name': 'Paint', 'unit': 'l'}).inserted_id
+    press = db.work_centers.insert_one({'name': 'Press'}).inserted_id
+    boms = [
+        {'items': [{'raw_material_id': str(steel), 'quantity': 2}],
+         'operations': [{'work_center_id': str(press), 'operation_name': 'Cut', 'time_required': 5}]},
+        {'items': [{'raw_material_id': str(steel), 'quantity': 1}, {'raw_material_id': str(paint), 'quantity': 3, 'unit': 'ml'}],
+         'operations': [{'work_center_id': str(ObjectId()), 'operation_name': 'Paint', 'time_required': 2}]}
+    ]
+    product_finds = count_finds(monkeypatch, db.products)
+
+    first, second = expand_boms(boms)
+
+    assert len(product_finds) == 1
+    assert first['items'][0]['raw_material_name'] == 'Steel'
+    assert first['items'][0]['unit'] == 'kg'
+    assert first['operations'][0]['work_center']['name'] == 'Press'
+    assert second['items'][1] == {
+        'raw_material': {'id': str(paint), 'name': 'Paint'},
+        'raw_material_name': 'Paint',
+        'quantity': 3,
+        'unit': 'ml'
+    }
+    assert second['operations'][0]['work_center']['name'] is None
+
+
+def test_create_bom_document_resolves_names_and_links_sub_assemblies(db):
+    db.products.insert_one({'name': 'Steel', 'type': 'raw', 'unit': 'kg'})
+    frame = create_bom_document('BOM-001', 'Frame', [
+        {'raw_material': {'name': 'Steel'}, 'quantity': 4, 'unit': 'kg'}
+    ], [
+        {'operation_name': 'Weld', 'work_center': {'name': 'Welding'}, 'time_required': 30}
+    ])
+
+    bike = create_bom_document('BOM-002', 'Bike', [
+        {'raw_material': {'name': 'Frame'}, 'quantity': 1, 'unit': 'pcs'},
+        {'raw_material': {'name': 'Bolt'}, 'quantity': 8, 'unit': 'pcs'}
+    ], [
+        {'operation_name': 'Assemble', 'work_center': {'name': 'Welding'}, 'time_required': 15}
+    ])
+
+    assert db.boms.count_documents({}) == 2
+    assert db.products.count_documents({'name': 'Steel'}) == 1
+    assert db.work_centers.count_documents({'name': 'Welding'}) == 1
+    frame_item, bolt_item = bike.data['items']
+    assert frame_item['bom_id'] == str(frame.data['_id'])
+    assert db.products.find_one({'name': 'Frame'})['type'] == 'finished'
+    assert 'bom_id' not in bolt_item
+    assert db.products.find_one({'name': 'Bolt'})['type'] == 'raw'
@@ -0,0 +1,64 @@
+import pytest
+from bson import ObjectId
+
+from services import bom_explosion_service
+from services.bom_explosion_service import BOMCycleError, explode, explode_per_unit
+from tests.test_bom import count_finds
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    bom_explosion_service._explosions.clear()
+    yield
+    bom_explosion_service._explosions.clear()
+
+
+def make_bom(db, items, version=1):
+    return db.boms.insert_one({'version': version, 'items': items}).inserted_id
+
+
+def sub_assembly(bom_id, quantity):
+    return {'raw_material_id': ObjectId(), 'bom_id': bom_id, 'quantity': quantity}
+
+
+def test_looping_bom_reports_the_cycle_path(db):
+    wheel, frame = ObjectId(), ObjectId()
+    db.boms.insert_many([
+        {'_id': wheel, 'items': [sub_assembly(frame, 1)]},
+        {'_id': frame, 'items': [sub_assembly(wheel, 2)]}
+    ])
+    bike = make_bom(db, [sub_assembly(frame, 1)])
+
+    with pytest.raises(BOMCycleError) as error:
+        explode_per_unit(bike)
+
+    assert error.value.path == [frame, wheel, frame]
+
+
+def test_new_sub_assembly_version_invalidates_memoized_parents(db):
+    steel, aluminium = ObjectId(), ObjectId()
+    frame = make_bom(db, [{'raw_material_id': steel, 'quantity': 4}])
+    bike = make_bom(db, [sub_assembly(frame, 2)])
+    assert explode(bike, 1) == {steel: 8}
+
+    db.boms.update_one({'_id': frame}, {'$set': {'items': [{'raw_material_id': aluminium, 'quantity': 3}]},
+                                        '$inc': {'version': 1}})
+
+    assert explode(bike, 1) == {aluminium: 6}
+
+
+def test_sub_assembly_is_not_walked_again_for_a_second_mo(db, monkeypatch):
+    steel = ObjectId()
+    tube = make_bom(db, [{'raw_material_id': steel, 'quantity': 2}])
+    frame = make_bom(db, [sub_assembly(tube, 3)])
+    bike = make_bom(db, [sub_assembly(frame, 1)])
+    trike = make_bom(db, [sub_assembly(frame, 1)])
+    assert explode(bike, 1) == {steel: 6}
+    finds = count_finds(monkeypatch, db.boms)
+
+    assert explode(trike, 2) == {steel: 12}
+
+    # The memoized frame is reused whole: only its version is checked,
+    # and nothing underneath it is read again
+    walked = [set(query['_id']['$in']) for query, projection in finds if 'items.quantity' in projection]
+    assert walked == [{trike}, {frame}]
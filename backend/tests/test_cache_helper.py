@@ -0,0 +1,44 @@
+import pytest
+
+from database import bump_version
+from utils import cache_helper
+from utils.cache_helper import LRUCache, MISSING, cached
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LRUCache(max_entries=8, ttl_seconds=60)
+    monkeypatch.setattr(cache_helper, '_cache', cache)
+    return cache
+
+
+def test_cached_reuses_value_until_a_dependency_is_written(db, cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'total': len(calls)}
+
+    assert cached('manager', ['manufacturing_orders'], compute) == {'total': 1}
+    assert cached('manager', ['manufacturing_orders'], compute) == {'total': 1}
+    bump_version('work_orders')
+    assert cached('manager', ['manufacturing_orders'], compute) == {'total': 1}
+    bump_version('manufacturing_orders')
+    assert cached('manager', ['manufacturing_orders'], compute) == {'total': 2}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_entries=2, ttl_seconds=0)
+    cache.set('a', 1)
+    assert cache.get('a') is MISSING
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask, g
+
+from controllers.wo_controller import claim_next_work_order
+from models.work_order import WorkOrder
+
+OPERATOR = ObjectId()
+
+
+def make_wo(mo_id, priority='medium', deadline=None, sequence=0, work_center='Lathe'):
+    return WorkOrder.create(mo_id, None, work_center=work_center, priority=priority,
+                            deadline=deadline, sequence=sequence).data['_id']
+
+
+def test_work_orders_without_a_deadline_queue_last(db):
+    undated = make_wo(ObjectId())
+    dated = make_wo(ObjectId(), deadline=datetime(2030, 1, 1))
+
+    assert WorkOrder.claim_next(['Lathe'], OPERATOR).data['_id'] == dated
+    claimed = WorkOrder.claim_next(['Lathe'], OPERATOR)
+    assert claimed.data['_id'] == undated
+    assert claimed.to_dict()['deadline'] is None
+
+
+def test_later_operations_wait_for_their_predecessor(db):
+    mo_id = ObjectId()
+    make_wo(mo_id, sequence=0, work_center='Saw')
+    make_wo(mo_id, priority='high', sequence=1)
+    ready = make_wo(ObjectId(), priority='low')
+
+    assert WorkOrder.claim_next(['Lathe'], OPERATOR).data['_id'] == ready
+    assert WorkOrder.claim_next(['Lathe'], OPERATOR) is None
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def test_claiming_starts_the_mo_and_books_the_slot(db, app):
+    db.work_centers.insert_one({'name': 'Lathe', 'capacity': 1})
+    mo_id = db.manufacturing_orders.insert_one({'status': 'planned', 'total_wo_count': 1,
+                                                'completed_wo_count': 0}).inserted_id
+    wo_id = make_wo(mo_id)
+
+    with app.test_request_context(json={'work_center': 'Lathe'}):
+        g.user = {'id': str(OPERATOR), 'role': 'Operator'}
+        response, status = claim_next_work_order()
+
+    assert status == 200
+    assert response.get_json()['work_order']['id'] == str(wo_id)
+    assert db.manufacturing_orders.find_one({'_id': mo_id})['status'] == 'in_progress'
+    wo = db.work_orders.find_one({'_id': wo_id})
+    assert wo['scheduled_start'] == wo['start_time']
@@ -0,0 +1,35 @@
+from bson import ObjectId
+
+from services.bom_explosion_service import explode
+from services.consumption_service import consume_materials, get_component_requirements
+
+
+def make_bom(db, product_name, items):
+    return db.boms.insert_one({'product_name': product_name, 'version': 1, 'items': items}).inserted_id
+
+
+def test_consumption_takes_sub_assemblies_as_built(db):
+    steel, frame = ObjectId(), ObjectId()
+    db.products.insert_many([{'_id': steel, 'name': 'Steel'}, {'_id': frame, 'name': 'Frame'}])
+    frame_bom = make_bom(db, 'Frame', [{'raw_material_id': str(steel), 'quantity': 4}])
+    bike_bom = make_bom(db, 'Bike', [
+        {'raw_material_id': str(frame), 'quantity': 1, 'bom_id': str(frame_bom)},
+        {'raw_material_id': str(steel), 'quantity': 2}
+    ])
+    steel_row = db.inventory.insert_one({'item_name': 'Steel', 'product_id': steel, 'stock_quantity': 100}).inserted_id
+    frame_row = db.inventory.insert_one({'item_name': 'Frame', 'product_id': frame, 'stock_quantity': 10}).inserted_id
+    mo = {'_id': ObjectId(), 'bom_id': bike_bom, 'quantity': 3}
+
+    consume_materials({'_id': ObjectId()}, mo, 1.0)
+
+    # Planning still sees the raw steel inside the frame
+    assert explode(bike_bom, 3) == {steel: 18}
+    assert db.inventory.find_one({'_id': frame_row})['stock_quantity'] == 7
+    assert db.inventory.find_one({'_id': steel_row})['stock_quantity'] == 94
+
+
+def test_deleted_bom_consumes_nothing(db):
+    mo = {'_id': ObjectId(), 'bom_id': ObjectId(), 'quantity': 5}
+
+    assert get_component_requirements(mo) == {}
+    assert consume_materials({'_id': ObjectId()}, mo, 0.5) == []
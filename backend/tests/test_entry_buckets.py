@@ -0,0 +1,50 @@
+from bson import ObjectId
+
+from models.entry_bucket_model import EntryBuckets, BUCKET_SIZE
+
+
+def test_appends_always_land_in_the_newest_bucket(db):
+    history = EntryBuckets('wo_entry_buckets')
+    parent = ObjectId()
+
+    history.append(parent, 'time_logs', list(range(95)))
+    history.append(parent, 'time_logs', list(range(95, 105)))
+    history.append(parent, 'time_logs', [105])
+
+    assert [bucket['count'] for bucket in db.wo_entry_buckets.find().sort('_id', 1)] == [BUCKET_SIZE, 6]
+    assert history.all([parent], 'time_logs') == {parent: list(range(106))}
+    first = history.page(parent, 'time_logs', limit=7)
+    assert list(first) == list(range(105, 98, -1))
+    assert list(history.page(parent, 'time_logs', limit=3, cursor=first.next_cursor)) == [98, 97, 96]
+
+
+def test_migrate_can_be_rerun_after_an_interruption(db):
+    history = EntryBuckets('wo_entry_buckets')
+    parent = db.work_orders.insert_one({'time_logs': [1, 2], 'materials_consumed': [3]}).inserted_id
+    history.migrate(db.work_orders, ['time_logs', 'materials_consumed'])
+    # As if the first run stopped before unsetting the arrays
+    db.work_orders.update_one({'_id': parent}, {'$set': {'time_logs': [1, 2], 'materials_consumed': [3]}})
+
+    assert history.migrate(db.work_orders, ['time_logs', 'materials_consumed']) == 1
+
+    assert history.all([parent], 'time_logs') == {parent: [1, 2]}
+    assert history.all([parent], 'materials_consumed') == {parent: [3]}
+    assert 'time_logs' not in db.work_orders.find_one({'_id': parent})
+
+
+def test_appending_nothing_writes_nothing(db):
+    EntryBuckets('wo_entry_buckets').append(ObjectId(), 'time_logs', [])
+
+    assert db.wo_entry_buckets.count_documents({}) == 0
+
+
+def test_migrated_history_sorts_before_live_appends(db):
+    history = EntryBuckets('wo_entry_buckets')
+    parent = db.work_orders.insert_one({'time_logs': [1, 2]}).inserted_id
+    # Logged through the new code before the backfill reached this parent
+    history.append(parent, 'time_logs', [3])
+
+    history.migrate(db.work_orders, ['time_logs'])
+
+    assert history.all([parent], 'time_logs') == {parent: [1, 2, 3]}
+    assert list(history.page(parent, 'time_logs', limit=2)) == [3, 2]
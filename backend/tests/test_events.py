@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from flask import Flask, g
+
+from config import Config
+from middlewares.auth_middleware import token_required, stream_token_required
+from utils.event_bus import EventBus, visible, sse_stream
+from utils.jwt_helper import encode_stream_token
+
+OPERATOR = {'id': 'op-1', 'role': 'Operator'}
+
+
+def session_token(**claims):
+    payload = {'id': 'u-1', 'role': 'Administrator', 'exp': datetime.utcnow() + timedelta(hours=1)}
+    payload.update(claims)
+    return jwt.encode(payload, Config.SECRET_KEY, algorithm='HS256')
+
+
+def test_operators_only_see_their_own_and_unassigned_work_orders():
+    assert visible({'type': 'work_order', 'assigned_to': 'op-1'}, OPERATOR)
+    assert visible({'type': 'work_order', 'assigned_to': None}, OPERATOR)
+    assert not visible({'type': 'work_order', 'assigned_to': 'op-2'}, OPERATOR)
+    assert not visible({'type': 'inventory'}, OPERATOR)
+    assert not visible({'type': 'work_order'}, {'role': 'Inventory Manager'})
+
+
+def test_bus_delivers_locally_only_while_clients_listen():
+    bus = EventBus()
+    bus._ensure_watcher = lambda: None
+    assert not bus.local_delivery
+
+    subscription = bus.subscribe(OPERATOR)
+    bus.publish('work_orders', {'_id': 'wo-1', 'assigned_to': 'op-2', 'status': 'pending'})
+    bus.publish('work_orders', {'_id': 'wo-2', 'assigned_to': None, 'status': 'pending'})
+
+    assert subscription.get(timeout=0) == {'type': 'work_order', 'id': 'wo-2', 'assigned_to': None, 'status': 'pending'}
+    assert subscription.get(timeout=0) is None
+    bus.unsubscribe(subscription)
+    assert not bus.local_delivery
+
+
+def test_stream_closes_when_the_session_expires(db):
+    started = time.time()
+    messages = list(sse_stream(OPERATOR, heartbeat_seconds=5, expires_at=started + 0.2))
+
+    assert messages[0].startswith('retry:')
+    assert time.time() - started < 2
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route('/api/events')
+    @stream_token_required
+    def events():
+        return {'user': g.user['id']}
+
+    @app.route('/api/orders')
+    @token_required
+    def orders():
+        return {'user': g.user['id']}
+
+    return app
+
+
+def test_event_stream_takes_only_stream_tokens_in_the_url(app):
+    client = app.test_client()
+    stream_token = encode_stream_token(jwt.decode(session_token(), Config.SECRET_KEY, algorithms=['HS256']))
+
+    assert client.get(f'/api/events?token={stream_token}').status_code == 200
+    assert client.get(f'/api/events?token={session_token()}').status_code == 401
+    assert client.get('/api/events', headers={'Authorization': f'Bearer {session_token()}'}).status_code == 200
+    # A leaked stream token is no session token
+    assert client.get('/api/orders', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
+
+
+def test_stream_token_carries_the_session_expiry():
+    session = jwt.decode(session_token(), Config.SECRET_KEY, algorithms=['HS256'])
+
+    claims = jwt.decode(encode_stream_token(session), Config.SECRET_KEY, algorithms=['HS256'])
+
+    assert claims['scope'] == 'events'
+    assert claims['session_exp'] == session['exp']
+    assert claims['exp'] <= time.time() + Config.STREAM_TOKEN_SECONDS + 1
@@ -0,0 +1,49 @@
+import re
+
+import openpyxl
+import pytest
+
+from utils.export_helper import InlineLimitExceeded, pdf_response, render_pdf, write_excel
+
+
+def test_write_excel_streams_rows_from_a_generator():
+    pulled = []
+
+    def rows():
+        for n in range(1000):
+            pulled.append(n)
+            yield [f'item-{n}', n]
+
+    output = write_excel(rows(), ['Item', 'Quantity'], sheet_title='Usage')
+    workbook = openpyxl.load_workbook(output, read_only=True)
+    sheet = workbook['Usage']
+    values = list(sheet.values)
+
+    assert len(pulled) == 1000
+    assert values[0] == ('Item', 'Quantity')
+    assert values[-1] == ('item-999', 999)
+    assert len(values) == 1001
+
+
+def test_render_pdf_draws_rows_lazily_across_pages():
+    pulled = []
+
+    def rows():
+        for n in range(300):
+            pulled.append(n)
+            yield [n, f'row {n}', None]
+
+    output = render_pdf(rows(), ['#', 'Name', 'Note'], 'Usage')
+    content = output.read()
+
+    assert content.startswith(b'%PDF')
+    assert len(re.findall(rb'/Type /Page\b(?!s)', content)) > 1
+    assert len(pulled) == 300
+
+
+def test_pdf_response_refuses_reports_over_the_inline_limit():
+    with pytest.raises(InlineLimitExceeded):
+        pdf_response(([n] for n in range(11)), ['#'], 'Big', 'big.pdf', max_rows=10)
+
+    response = pdf_response(([n] for n in range(10)), ['#'], 'Small', 'small.pdf', max_rows=10)
+    assert response.mimetype == 'application/pdf'
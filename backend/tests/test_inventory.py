@@ -0,0 +1,51 @@
+import pytest
+from bson import ObjectId
+
+from models.inventory_model import Inventory, InsufficientStockError
+
+
+def test_resolve_rows_moves_one_row_per_product(db):
+    steel, paint = ObjectId(), ObjectId()
+    by_name = db.inventory.insert_one({'item_name': 'Steel', 'stock_quantity': 50}).inserted_id
+    linked = db.inventory.insert_one({'item_name': 'Steel', 'product_id': steel, 'stock_quantity': 5}).inserted_id
+    db.inventory.insert_one({'item_name': 'Steel', 'product_id': steel, 'stock_quantity': 9})
+    first_paint = db.inventory.insert_one({'item_name': 'Paint', 'stock_quantity': 1}).inserted_id
+    db.inventory.insert_one({'item_name': 'Paint', 'stock_quantity': 2})
+
+    rows = Inventory.resolve_rows({steel: 'Steel', paint: 'Paint', ObjectId(): None})
+
+    assert rows == {steel: linked, paint: first_paint}
+    assert by_name not in rows.values()
+
+
+def test_adjust_refuses_to_go_negative_when_guarded(db):
+    row = db.inventory.insert_one({'item_name': 'Steel', 'stock_quantity': 5}).inserted_id
+
+    assert Inventory.adjust(row, -3, allow_negative=False).data['stock_quantity'] == 2
+    with pytest.raises(InsufficientStockError):
+        Inventory.adjust(row, -3, allow_negative=False)
+    assert Inventory.adjust(row, -3).data['stock_quantity'] == -1
+    assert Inventory.adjust(ObjectId(), 1) is None
+
+
+def test_adjust_upserts_missing_items(db):
+    created = Inventory.adjust({'item_name': 'Paint'}, 4, upsert_fields={'location': 'B1'})
+
+    assert created.data['stock_quantity'] == 4
+    assert created.data['location'] == 'B1'
+    assert created.data['reserved_quantity'] == 0
+    with pytest.raises(InsufficientStockError):
+        Inventory.adjust({'item_name': 'Glue'}, -1, allow_negative=False, upsert_fields={})
+    assert db.inventory.count_documents({'item_name': 'Glue'}) == 0
+
+
+def test_adjust_many_reports_rows_that_fell_short(db):
+    plenty = db.inventory.insert_one({'item_name': 'Steel', 'stock_quantity': 10}).inserted_id
+    scarce = db.inventory.insert_one({'item_name': 'Paint', 'stock_quantity': 1}).inserted_id
+
+    with pytest.raises(InsufficientStockError, match='1 of 2'):
+        Inventory.adjust_many([(plenty, -4), (scarce, -2)], allow_negative=False)
+
+    # Without a transaction the rows that had enough stock were still moved
+    assert db.inventory.find_one({'_id': plenty})['stock_quantity'] == 6
+    assert db.inventory.find_one({'_id': scarce})['stock_quantity'] == 1
@@ -0,0 +1,55 @@
+from bson import ObjectId
+
+from models.mo_model import ManufacturingOrder
+
+
+def create_mo(db, total, completed=0, status='in_progress'):
+    return db.manufacturing_orders.insert_one({
+        'status': status, 'total_wo_count': total, 'completed_wo_count': completed
+    }).inserted_id
+
+
+def version(db, collection):
+    doc = db.data_versions.find_one({'_id': collection})
+    return doc['version'] if doc else 0
+
+
+def test_record_wo_transition_moves_completed_counter(db):
+    mo_id = create_mo(db, total=2)
+
+    mo = ManufacturingOrder.record_wo_transition(mo_id, 'in_progress', 'completed')
+    assert mo.data['completed_wo_count'] == 1
+    mo = ManufacturingOrder.record_wo_transition(mo_id, 'completed', 'in_progress')
+    assert mo.data['completed_wo_count'] == 0
+
+
+def test_record_wo_transition_recounts_legacy_mo(db):
+    mo_id = db.manufacturing_orders.insert_one({'status': 'in_progress'}).inserted_id
+    db.work_orders.insert_many([
+        {'mo_id': mo_id, 'status': 'completed'},
+        {'mo_id': mo_id, 'status': 'completed'},
+        {'mo_id': mo_id, 'status': 'pending'}
+    ])
+
+    mo = ManufacturingOrder.record_wo_transition(mo_id, 'pending', 'completed')
+
+    assert (mo.data['total_wo_count'], mo.data['completed_wo_count']) == (3, 2)
+
+
+def test_complete_if_all_work_orders_done(db):
+    mo_id = create_mo(db, total=2, completed=2)
+
+    mo = ManufacturingOrder.complete_if_all_work_orders_done(mo_id)
+
+    assert mo.data['status'] == 'completed'
+    assert ManufacturingOrder.complete_if_all_work_orders_done(mo_id) is None
+
+
+def test_incomplete_mo_is_left_alone_without_a_version_bump(db):
+    mo_id = create_mo(db, total=3, completed=2)
+    before = version(db, 'manufacturing_orders')
+
+    assert ManufacturingOrder.complete_if_all_work_orders_done(mo_id) is None
+    assert ManufacturingOrder.complete_if_all_work_orders_done(ObjectId()) is None
+    assert db.manufacturing_orders.find_one({'_id': mo_id})['status'] == 'in_progress'
+    assert version(db, 'manufacturing_orders') == before
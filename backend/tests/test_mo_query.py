@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from models.mo_model import ManufacturingOrder
+
+
+def test_build_query_translates_filters():
+    bom_id = ObjectId()
+    query = ManufacturingOrder.build_query(
+        status=['planned', 'in_progress'],
+        priority=['high'],
+        bom_id=str(bom_id),
+        deadline_from='2024-03-01',
+        deadline_to='2024-03-31'
+    )
+
+    assert query == {
+        'status': {'$in': ['planned', 'in_progress']},
+        'priority': 'high',
+        'bom_id': bom_id,
+        'deadline': {
+            '$gte': datetime(2024, 3, 1),
+            '$lte': datetime(2024, 3, 31, 23, 59, 59, 999999)
+        }
+    }
+
+
+def test_query_filters_sorts_and_projects(db):
+    assignee = ObjectId()
+    for day, status in ((1, 'planned'), (2, 'completed'), (3, 'planned')):
+        ManufacturingOrder.create(ObjectId(), 5, f'2024-03-0{day}', '2024-04-01', assignee, status=status)
+
+    mos = ManufacturingOrder.query(
+        {'status': ['planned']},
+        sort_field='schedule_start',
+        direction=1,
+        fields=['status', 'schedule_start']
+    )
+
+    assert [mo['schedule_start'] for mo in mos] == [datetime(2024, 3, 1), datetime(2024, 3, 3)]
+    assert set(mos[0]) == {'id', 'status', 'schedule_start'}
+
+
+def test_query_rejects_unindexed_sort(db):
+    with pytest.raises(ValueError):
+        ManufacturingOrder.query(sort_field='notes')
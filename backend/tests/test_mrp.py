@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from services.mrp_service import run_mrp
+
+
+def test_run_mrp_nets_cumulative_demand_against_stock(db):
+    steel = ObjectId()
+    db.products.insert_one({'_id': steel, 'name': 'Steel', 'unit': 'kg'})
+    bom_id = db.boms.insert_one({'product_name': 'Frame', 'version': 1,
+                                 'items': [{'raw_material_id': str(steel), 'quantity': 2}]}).inserted_id
+    db.inventory.insert_many([
+        {'item_name': 'Steel', 'product_id': steel, 'stock_quantity': 15},
+        {'item_name': 'Steel', 'stock_quantity': 5}
+    ])
+    db.manufacturing_orders.insert_many([
+        # Past due: needed in the current week
+        {'bom_id': bom_id, 'quantity': 5, 'status': 'planned', 'schedule_start': datetime(2024, 5, 1)},
+        # Half of its work orders are done, so half of it is still demand
+        {'bom_id': str(bom_id), 'quantity': 20, 'status': 'in_progress', 'deadline': datetime(2024, 5, 22),
+         'total_wo_count': 2, 'completed_wo_count': 1},
+        {'bom_id': bom_id, 'quantity': 100, 'status': 'done', 'deadline': datetime(2024, 5, 22)}
+    ])
+
+    result = run_mrp('week', today=datetime(2024, 5, 15))
+
+    assert result['periods'] == ['2024-05-13', '2024-05-20']
+    assert result['mo_count'] == 2
+    [row] = result['products']
+    assert row['on_hand'] == 20
+    assert row['gross_requirement'] == 30
+    assert row['shortage'] == 10
+    assert row['phased'] == [
+        {'period': '2024-05-13', 'gross': 10, 'net': 0},
+        {'period': '2024-05-20', 'gross': 20, 'net': 10}
+    ]
+
+
+def test_run_mrp_reports_missing_boms(db):
+    missing = ObjectId()
+    db.manufacturing_orders.insert_one({'bom_id': missing, 'quantity': 1, 'status': 'planned'})
+
+    result = run_mrp('day', today=datetime(2024, 5, 15))
+
+    assert result['products'] == []
+    assert list(result['errors']) == [str(missing)]
+
+
+def test_run_mrp_nets_sub_assembly_stock_and_open_mos_before_exploding(db):
+    steel, bolt, frame = ObjectId(), ObjectId(), ObjectId()
+    frame_bom = db.boms.insert_one({'product_name': 'Frame', 'version': 1,
+                                    'items': [{'raw_material_id': steel, 'quantity': 4}]}).inserted_id
+    bike_bom = db.boms.insert_one({'product_name': 'Bike', 'version': 1, 'items': [
+        {'raw_material_id': frame, 'bom_id': str(frame_bom), 'quantity': 1},
+        {'raw_material_id': bolt, 'quantity': 2}
+    ]}).inserted_id
+    db.inventory.insert_one({'item_name': 'Frame', 'product_id': frame, 'stock_quantity': 10})
+    week = datetime(2024, 5, 13)
+    db.manufacturing_orders.insert_many([
+        {'bom_id': bike_bom, 'quantity': 20, 'status': 'planned', 'deadline': week},
+        # Five frames already on the way, their steel still to be drawn
+        {'bom_id': frame_bom, 'quantity': 5, 'status': 'planned', 'deadline': week}
+    ])
+
+    result = run_mrp('week', today=week)
+
+    rows = {row['product_id']: row for row in result['products']}
+    # 20 bikes - 10 frames in stock - 5 on order = 5 frames to make, plus the open frame MO
+    assert rows[str(steel)]['gross_requirement'] == (5 + 5) * 4
+    assert rows[str(bolt)]['gross_requirement'] == 40
+    assert str(frame) not in rows
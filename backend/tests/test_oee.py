@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from config import Config
+from models.oee_model import WorkCenterOEE, production_day
+
+NOW = datetime(2024, 5, 2, 12)
+
+
+def complete(db, work_center, end_time, minutes=60):
+    mo_id = db.manufacturing_orders.insert_one({'quantity': 4, 'completed_quantity': 4}).inserted_id
+    db.work_orders.insert_one({'mo_id': mo_id, 'work_center': work_center, 'status': 'completed',
+                               'end_time': end_time, 'actual_duration': minutes, 'planned_duration': minutes})
+
+
+def run_minutes(db, day):
+    return sum(row['run_minutes'] for row in db.work_center_oee.find({'day': day}))
+
+
+def test_rebuild_skips_work_orders_without_a_center(db):
+    complete(db, 'Lathe', NOW)
+    complete(db, None, NOW)
+    complete(db, '', NOW)
+    db.work_orders.insert_one({'status': 'completed', 'end_time': NOW, 'actual_duration': 5})
+
+    WorkCenterOEE.rebuild(NOW, NOW)
+
+    assert [row['work_center'] for row in db.work_center_oee.find()] == ['Lathe']
+
+
+def test_current_day_is_refreshed_at_most_once_per_interval(db):
+    db.work_center_oee_days.create_index('day', unique=True)
+    today = production_day(NOW)
+    yesterday = today - timedelta(days=1)
+    complete(db, 'Lathe', NOW - timedelta(days=1))
+    complete(db, 'Lathe', NOW)
+
+    WorkCenterOEE.ensure(yesterday, today, NOW)
+    complete(db, 'Lathe', NOW + timedelta(minutes=1), minutes=30)
+    WorkCenterOEE.ensure(yesterday, today, NOW + timedelta(minutes=2))
+
+    assert run_minutes(db, today) == 60
+    assert db.work_center_oee_days.find_one({'day': yesterday})['built_at']
+    assert 'built_at' not in db.work_center_oee_days.find_one({'day': today})
+
+    WorkCenterOEE.ensure(yesterday, today, NOW + timedelta(seconds=Config.OEE_REFRESH_SECONDS + 1))
+
+    assert run_minutes(db, today) == 90
+    assert run_minutes(db, yesterday) == 60
+
+
+def test_final_days_between_missing_days_are_not_rewritten(db):
+    db.work_center_oee_days.create_index('day', unique=True)
+    today = production_day(NOW)
+    first, middle, last = (today - timedelta(days=offset) for offset in (3, 2, 1))
+    complete(db, 'Lathe', NOW - timedelta(days=2))
+    WorkCenterOEE.ensure(middle, middle, NOW)
+    # Arrives after the middle day was finalized
+    complete(db, 'Lathe', NOW - timedelta(days=2), minutes=30)
+
+    WorkCenterOEE.ensure(first, last, NOW)
+
+    assert run_minutes(db, middle) == 60
+    assert {row['day'] for row in db.work_center_oee_days.find({'built_at': {'$exists': True}})} == {first, middle, last}
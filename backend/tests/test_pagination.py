@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from middlewares.error_handler import init_error_handlers
+from utils.pagination import InvalidCursor, decode_cursor, get_page_args, paginate
+
+
+def test_paginate_walks_every_row_once_with_ties(db):
+    created = datetime(2024, 1, 1)
+    db.items.insert_many([
+        {'n': n, 'created_at': created + timedelta(minutes=n // 3)} for n in range(10)
+    ])
+
+    seen = []
+    cursor = None
+    while True:
+        page = paginate(db.items, limit=4, cursor=cursor)
+        seen.extend(item['n'] for item in page)
+        cursor = page.next_cursor
+        if not cursor:
+            break
+
+    assert sorted(seen) == list(range(10))
+    assert len(seen) == 10
+
+
+def test_decode_cursor_rejects_tampered_token():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not-a-cursor')
+
+
+def test_page_args_are_unbounded_without_limit():
+    app = Flask(__name__)
+    with app.test_request_context('/?cursor='):
+        assert get_page_args() == (None, None)
+    with app.test_request_context('/'):
+        assert get_page_args(20) == (20, None)
+    with app.test_request_context('/?limit=100000'):
+        assert get_page_args()[0] == 500
+
+
+def test_invalid_cursor_is_a_bad_request():
+    app = Flask(__name__)
+    init_error_handlers(app)
+
+    @app.route('/items')
+    def items():
+        get_page_args()
+        return 'ok'
+
+    response = app.test_client().get('/items?cursor=garbage')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid pagination cursor'}
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.production_stats_model import DailyProductionStats, NO_WORK_CENTER, PLANT_WIDE
+
+
+def test_rebuild_keys_rows_without_a_work_center(db):
+    day = datetime(2024, 5, 6, 14)
+    db.manufacturing_orders.insert_one({'status': 'completed', 'actual_end_date': day, 'quantity': 4})
+    db.work_orders.insert_many([
+        {'status': 'completed', 'end_time': day, 'work_center': 'wc-1', 'planned_duration': 60, 'actual_duration': 30},
+        {'status': 'completed', 'end_time': day, 'planned_duration': 10, 'actual_duration': 10},
+        {'status': 'completed', 'end_time': day, 'work_center': '', 'planned_duration': 10, 'actual_duration': 20}
+    ])
+
+    DailyProductionStats.rebuild()
+
+    rows = {row['work_center']: row for row in db.daily_production_stats.find()}
+    assert set(rows) == {PLANT_WIDE, NO_WORK_CENTER, 'wc-1'}
+    assert rows[PLANT_WIDE]['quantity_completed'] == 4
+    assert rows[NO_WORK_CENTER]['wo_completed'] == 2
+    assert DailyProductionStats(rows[PLANT_WIDE]).to_dict()['work_center'] is None
+
+
+def test_live_increments_and_rebuild_agree(db):
+    day = datetime(2024, 5, 6, 14)
+    mo = {'_id': ObjectId(), 'status': 'completed', 'actual_end_date': day, 'quantity': 4}
+    wo = {'_id': ObjectId(), 'status': 'completed', 'end_time': day, 'planned_duration': 20, 'actual_duration': 10}
+    db.manufacturing_orders.insert_one(dict(mo))
+    db.work_orders.insert_one(dict(wo))
+
+    DailyProductionStats.record_mo_completion(mo)
+    DailyProductionStats.record_wo_completion(wo)
+    live = DailyProductionStats.summarize(datetime(2024, 5, 1), datetime(2024, 5, 31))
+    DailyProductionStats.rebuild(datetime(2024, 5, 6), datetime(2024, 5, 6))
+    rebuilt = DailyProductionStats.summarize(datetime(2024, 5, 1), datetime(2024, 5, 31))
+
+    for field in ('mo_completed', 'quantity_completed', 'wo_completed', 'planned_minutes', 'utilization_ratio_sum'):
+        assert live[field] == rebuilt[field]
+    assert db.daily_production_stats.count_documents({}) == 2
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from models.report_job_model import ReportJob
+from services.report_job_service import report_param_hash
+
+MANAGER = {'id': 'u1', 'role': 'Manufacturing Manager'}
+
+
+def submit(param_hash, ttl_seconds=900):
+    return ReportJob.submit(param_hash, 'manager', 'pdf', {}, MANAGER, ttl_seconds)
+
+
+def test_identical_requests_share_one_job(db):
+    first, created = submit('hash-1')
+    second, created_again = submit('hash-1')
+
+    assert created and not created_again
+    assert first.data['_id'] == second.data['_id']
+
+
+def test_failed_and_expired_jobs_are_replaced(db):
+    job, _ = submit('hash-1')
+    job.fail('boom')
+    retried, created = submit('hash-1')
+    assert created and retried.data['_id'] != job.data['_id']
+
+    db.report_jobs.update_one({'_id': retried.data['_id']}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    fresh, created = submit('hash-1')
+    assert created and fresh.data['_id'] != retried.data['_id']
+
+
+def test_claim_takes_each_queued_job_once_oldest_first(db):
+    older, _ = submit('hash-1')
+    newer, _ = submit('hash-2')
+
+    assert ReportJob.claim().data['_id'] == older.data['_id']
+    assert ReportJob.claim(newer.data['_id']).data['status'] == 'running'
+    assert ReportJob.claim() is None
+
+
+def test_param_hash_scopes_operator_reports_per_user():
+    params = {'start_date': '2024-01-01'}
+    operator_a = {'id': 'a', 'role': 'Operator'}
+    operator_b = {'id': 'b', 'role': 'Operator'}
+    manager_b = {'id': 'b', 'role': 'Manufacturing Manager'}
+
+    assert report_param_hash('operator', 'pdf', params, operator_a) != report_param_hash('operator', 'pdf', params, operator_b)
+    assert report_param_hash('manager', 'pdf', params, MANAGER) == report_param_hash('manager', 'pdf', params, manager_b)
@@ -0,0 +1,59 @@
+import pytest
+from bson import ObjectId
+
+from models.inventory_model import Inventory, InsufficientStockError
+from models.reservation_model import StockReservation
+from services.atp_service import check_feasibility
+
+
+def stock(db, name, quantity):
+    product_id = db.products.insert_one({'name': name}).inserted_id
+    row = db.inventory.insert_one({'item_name': name, 'product_id': product_id,
+                                   'stock_quantity': quantity, 'reserved_quantity': 0}).inserted_id
+    return product_id, row
+
+
+def test_reservations_hold_stock_until_released(db):
+    steel, row = stock(db, 'Steel', 10)
+    mo_id = ObjectId()
+
+    StockReservation.reserve_for_mo(mo_id, {steel: 8})
+    with pytest.raises(InsufficientStockError):
+        StockReservation.reserve_for_mo(ObjectId(), {steel: 3})
+
+    assert StockReservation.release_for_mo(mo_id) == 1
+    assert StockReservation.release_for_mo(mo_id) == 0
+    assert db.inventory.find_one({'_id': row})['reserved_quantity'] == 0
+    assert [r['status'] for r in StockReservation.find_by_mo(mo_id)] == ['released']
+
+
+def test_manual_decrement_cannot_take_reserved_stock(db):
+    steel, row = stock(db, 'Steel', 10)
+    StockReservation.reserve_for_mo(ObjectId(), {steel: 8})
+
+    with pytest.raises(InsufficientStockError):
+        Inventory.adjust({'item_name': 'Steel'}, -3, allow_negative=False, upsert_fields={})
+    with pytest.raises(InsufficientStockError):
+        Inventory.adjust_many([(row, -3)], allow_negative=False)
+
+    assert Inventory.adjust(row, -2, allow_negative=False).data['stock_quantity'] == 8
+
+
+def test_reservation_is_split_across_rows_as_atp_promises(db):
+    steel, first = stock(db, 'Steel', 5)
+    second = db.inventory.insert_one({'item_name': 'Steel', 'stock_quantity': 5, 'reserved_quantity': 0}).inserted_id
+    mo_id = ObjectId()
+    assert check_feasibility({steel: 8})['feasible']
+
+    reservations, shortages = StockReservation.reserve_for_mo(mo_id, {steel: 8})
+
+    assert shortages == {}
+    assert sorted(reservation.data['quantity'] for reservation in reservations) == [3, 5]
+    assert sum(row['reserved_quantity'] for row in db.inventory.find()) == 8
+    assert not check_feasibility({steel: 3})['feasible']
+
+    drawn, unreserved = StockReservation.consume(mo_id, {steel: 9})
+
+    assert sorted(drawn.values()) == [3, 5] and set(drawn) == {first, second}
+    assert unreserved == {steel: 1}
+    assert sum(row['reserved_quantity'] for row in db.inventory.find()) == 0
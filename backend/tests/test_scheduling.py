@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from services.scheduling_service import reschedule_work_order, schedule_new_work_orders
+
+NOW = datetime(2024, 5, 1, 8)
+HOUR = timedelta(hours=1)
+
+
+def make_mo(db, deadline_days=7):
+    return db.manufacturing_orders.insert_one({
+        'schedule_start': NOW - timedelta(days=1), 'deadline': NOW + timedelta(days=deadline_days), 'priority': 'medium'
+    }).inserted_id
+
+
+def make_wo(db, mo_id, work_center, sequence=0, **fields):
+    wo = {'mo_id': mo_id, 'work_center': work_center, 'planned_duration': 60, 'status': 'pending',
+          'sequence': sequence, 'created_at': NOW}
+    wo.update(fields)
+    return db.work_orders.insert_one(wo).inserted_id
+
+
+def booking(db, wo_id):
+    wo = db.work_orders.find_one({'_id': wo_id})
+    return wo.get('scheduled_start'), wo.get('scheduled_end')
+
+
+def test_new_work_orders_queue_behind_existing_bookings(db):
+    lathe = str(db.work_centers.insert_one({'name': 'Lathe', 'capacity': 1}).inserted_id)
+    mill = str(db.work_centers.insert_one({'name': 'Mill', 'capacity': 1}).inserted_id)
+    first = make_mo(db)
+    booked = make_wo(db, first, lathe, scheduled_start=NOW, scheduled_end=NOW + HOUR, scheduled_slot=0)
+    second = make_mo(db, deadline_days=1)
+    turn = make_wo(db, second, lathe, 0)
+    mill_op = make_wo(db, second, mill, 1)
+
+    assert schedule_new_work_orders([turn, mill_op], now=NOW) == (2, 2)
+
+    # An urgent newcomer does not bump what is already booked
+    assert booking(db, booked) == (NOW, NOW + HOUR)
+    assert booking(db, turn) == (NOW + HOUR, NOW + 2 * HOUR)
+    assert booking(db, mill_op) == (NOW + 2 * HOUR, NOW + 3 * HOUR)
+
+
+def test_closing_a_work_order_pulls_in_only_what_it_blocked(db):
+    lathe = db.work_centers.insert_one({'name': 'Lathe', 'capacity': 1}).inserted_id
+    first = make_wo(db, make_mo(db), str(lathe), status='completed',
+                    scheduled_start=NOW, scheduled_end=NOW + HOUR, scheduled_slot=0)
+    # Same center, referenced by name on an older row
+    waiting = make_wo(db, make_mo(db), 'Lathe',
+                      scheduled_start=NOW + HOUR, scheduled_end=NOW + 2 * HOUR, scheduled_slot=0)
+    # Stale plan on another center: outside the change's reach, so left alone
+    elsewhere = make_wo(db, make_mo(db), 'Press',
+                        scheduled_start=NOW + 5 * HOUR, scheduled_end=NOW + 6 * HOUR, scheduled_slot=0)
+
+    assert reschedule_work_order(first, previous_start=NOW, work_center=str(lathe), now=NOW) == (1, 1)
+
+    assert booking(db, waiting) == (NOW, NOW + HOUR)
+    assert booking(db, elsewhere) == (NOW + 5 * HOUR, NOW + 6 * HOUR)
+
+
+def test_successors_follow_a_moved_operation_across_centers(db):
+    mo_id = make_mo(db)
+    cut = make_wo(db, mo_id, 'Saw', 0, status='in_progress', start_time=NOW + 2 * HOUR,
+                  scheduled_start=NOW, scheduled_end=NOW + HOUR, scheduled_slot=0)
+    weld = make_wo(db, mo_id, 'Welder', 1,
+                   scheduled_start=NOW + HOUR, scheduled_end=NOW + 2 * HOUR, scheduled_slot=0)
+
+    reschedule_work_order(cut, now=NOW)
+
+    assert booking(db, cut) == (NOW + 2 * HOUR, NOW + 3 * HOUR)
+    assert booking(db, weld) == (NOW + 3 * HOUR, NOW + 4 * HOUR)
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from models.stock_ledger_model import StockLedger
+
+
+def test_create_keeps_running_balance_and_sequence(db):
+    product_id = ObjectId()
+    StockLedger.create(product_id, 'PO-1', stock_in=10)
+    entry = StockLedger.create(product_id, 'WO-1', stock_out=4)
+
+    assert entry.data['balance'] == 6
+    assert entry.data['seq'] == 2
+    assert StockLedger.get_current_balance(product_id) == 6
+
+
+def test_first_movement_continues_from_existing_history(db):
+    product_id = ObjectId()
+    db.stock_ledger.insert_many([
+        {'product_id': product_id, 'reference': 'OLD-1', 'stock_in': 5, 'stock_out': 0,
+         'balance': 5, 'created_at': datetime(2024, 1, 1)},
+        {'product_id': product_id, 'reference': 'OLD-2', 'stock_in': 7, 'stock_out': 0,
+         'balance': 12, 'created_at': datetime(2024, 1, 2)}
+    ])
+
+    entry = StockLedger.create(product_id, 'WO-1', stock_out=2)
+
+    assert entry.data['balance'] == 10
+    assert entry.data['seq'] == 3
+
+
+def test_balance_reset_overrides_counter(db):
+    product_id = ObjectId()
+    StockLedger.create(product_id, 'PO-1', stock_in=10)
+    entry = StockLedger.create(product_id, 'COUNT-1', balance=3)
+
+    assert entry.data['balance'] == 3
+    assert StockLedger.get_current_balance(product_id) == 3
+
+
+def test_create_many_numbers_each_row_after_earlier_postings(db):
+    steel, bolts = ObjectId(), ObjectId()
+    StockLedger.create(steel, 'PO-1', stock_in=20)
+
+    rows = StockLedger.create_many([
+        {'product_id': steel, 'reference': 'WO-1', 'stock_out': 5},
+        {'product_id': str(bolts), 'reference': 'WO-1', 'stock_in': 8},
+        {'product_id': steel, 'reference': 'WO-1', 'stock_out': 3}
+    ])
+
+    assert [(row.data['balance'], row.data['seq']) for row in rows] == [(15, 2), (8, 1), (12, 3)]
+    assert StockLedger.get_current_balance(steel) == 12
+    assert db.monthly_stock_usage.find_one({'product_id': steel})['stock_out'] == 8
+
+
+def test_usage_by_product_groups_ledger_rows_in_range(db):
+    steel, paint = ObjectId(), ObjectId()
+    db.products.insert_one({'_id': steel, 'name': 'Steel'})
+    db.stock_ledger.insert_many([
+        {'product_id': steel, 'stock_in': 10, 'stock_out': 0, 'created_at': datetime(2024, 1, 2)},
+        {'product_id': steel, 'stock_in': 0, 'stock_out': 4, 'created_at': datetime(2024, 1, 5)},
+        {'product_id': paint, 'stock_in': 0, 'stock_out': 7, 'created_at': datetime(2024, 1, 6)},
+        {'product_id': steel, 'stock_in': 0, 'stock_out': 100, 'created_at': datetime(2024, 3, 1)}
+    ])
+
+    usage = list(StockLedger.get_usage_by_product(datetime(2024, 1, 1), datetime(2024, 1, 31)))
+
+    assert usage == [
+        {'product_id': str(paint), 'product': str(paint), 'usage': 7, 'stock_in': 0},
+        {'product_id': str(steel), 'product': 'Steel', 'usage': 4, 'stock_in': 10}
+    ]
+
+
+def test_monthly_rollup_rebuild_matches_live_postings(db):
+    product_id = ObjectId()
+    StockLedger.create(product_id, 'PO-1', stock_in=10)
+    StockLedger.create_many([{'product_id': product_id, 'reference': 'WO-1', 'stock_out': 3}])
+    live = db.monthly_stock_usage.find_one({'product_id': product_id}, {'_id': 0})
+
+    StockLedger.rebuild_monthly_usage()
+
+    assert db.monthly_stock_usage.find_one({'product_id': product_id}, {'_id': 0}) == live
+    assert (live['stock_in'], live['stock_out'], live['entries_count']) == (10, 3, 2)
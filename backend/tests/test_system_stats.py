@@ -0,0 +1,18 @@
+import pytest
+
+from services.system_stats_service import SystemStats
+
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_summary_folds_every_count_into_one_result(db, exact):
+    db.inventory.insert_many([{'stock_quantity': 3}, {'stock_quantity': 4.5}])
+    db.manufacturing_orders.insert_many([{}, {}])
+    db.work_orders.insert_many([{}, {}, {}])
+
+    assert SystemStats.summary(exact=exact) == {
+        'total_mos': 2, 'total_wos': 3, 'total_users': 0, 'total_inventory': 7.5, 'inventory_items': 2
+    }
+
+
+def test_summary_of_an_empty_database_is_all_zeros(db):
+    assert set(SystemStats.summary().values()) == {0}
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from models.entry_bucket_model import wo_history
+from services.utilization_service import get_utilization
+
+DAY_ONE = datetime(2024, 5, 1)
+NOW = datetime(2024, 5, 3, 12)
+HOUR = timedelta(hours=1)
+
+
+def busy_hours(result):
+    return {row['day']: row['busy_hours'] for row in result['daily']}
+
+
+def test_open_time_log_ends_with_its_stopped_work_order(db):
+    center = {'_id': db.work_centers.insert_one({'name': 'Lathe', 'capacity': 1}).inserted_id,
+              'name': 'Lathe', 'capacity': 1}
+    done = db.work_orders.insert_one({
+        'work_center': 'Lathe', 'status': 'completed',
+        'start_time': DAY_ONE + 8 * HOUR, 'end_time': DAY_ONE + 10 * HOUR
+    }).inserted_id
+    # Never closed by the operator
+    wo_history.append(done, 'time_logs', [{'start_time': DAY_ONE + 8 * HOUR, 'end_time': None}])
+    running = db.work_orders.insert_one({
+        'work_center': str(center['_id']), 'status': 'in_progress', 'start_time': NOW - 2 * HOUR
+    }).inserted_id
+    wo_history.append(running, 'time_logs', [{'start_time': NOW - 2 * HOUR}])
+
+    result = get_utilization(center, start=DAY_ONE, end=NOW, now=NOW)
+
+    assert busy_hours(result) == {'2024-05-01': 2.0, '2024-05-02': 0.0, '2024-05-03': 2.0}
+    stored = {row['day']: row['busy_seconds'] for row in db.work_center_daily_usage.find()}
+    assert stored == {DAY_ONE: 7200, DAY_ONE + 24 * HOUR: 0}
+
+
+def test_work_orders_that_never_started_are_idle(db):
+    center = {'_id': db.work_centers.insert_one({'name': 'Mill'}).inserted_id, 'name': 'Mill'}
+    db.work_orders.insert_one({'work_center': 'Mill', 'status': 'completed',
+                               'end_time': NOW - HOUR, 'actual_duration': 0})
+
+    assert get_utilization(center, now=NOW)['busy_hours'] == 0
+
+
+def test_work_order_running_since_long_before_the_window_is_busy(db):
+    center = {'_id': db.work_centers.insert_one({'name': 'Kiln'}).inserted_id, 'name': 'Kiln'}
+    db.work_orders.insert_one({'work_center': 'Kiln', 'status': 'in_progress',
+                               'start_time': DAY_ONE - timedelta(days=30)})
+
+    result = get_utilization(center, start=DAY_ONE, end=NOW, now=NOW)
+
+    assert busy_hours(result) == {'2024-05-01': 24.0, '2024-05-02': 24.0, '2024-05-03': 12.0}
+    assert {row['busy_seconds'] for row in db.work_center_daily_usage.find()} == {86400}
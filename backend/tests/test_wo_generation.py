@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+import pytest
+from bson import ObjectId
+
+from models.inventory_model import InsufficientStockError
+from services.wo_generation_service import create_mo_with_work_orders
+from utils.event_bus import bus
+
+START = date.today() + timedelta(days=1)
+
+
+@pytest.fixture
+def events(db):
+    subscription = bus.subscribe({'role': 'Administrator', 'id': 'admin'})
+    yield subscription
+    bus.unsubscribe(subscription)
+
+
+def drain(subscription):
+    received = []
+    while True:
+        event = subscription.get(timeout=0)
+        if event is None:
+            return received
+        received.append(event)
+
+
+def setup_bom(db, stock):
+    steel = db.products.insert_one({'name': 'Steel'}).inserted_id
+    db.inventory.insert_one({'item_name': 'Steel', 'product_id': steel, 'stock_quantity': stock, 'reserved_quantity': 0})
+    lathe = db.work_centers.insert_one({'name': 'Lathe', 'capacity': 1, 'efficiency': 1.0}).inserted_id
+    bom = {'_id': ObjectId(), 'operations': [
+        {'operation_name': 'Turn', 'work_center_id': str(lathe), 'time_required': 10},
+        {'operation_name': 'Polish', 'work_center_id': str(lathe), 'time_required': 5}
+    ]}
+    return bom, steel
+
+
+def test_mo_that_cannot_reserve_its_stock_is_never_written(db, events):
+    bom, steel = setup_bom(db, stock=5)
+
+    with pytest.raises(InsufficientStockError):
+        create_mo_with_work_orders(bom, 2, START, START + timedelta(days=3), ObjectId(), requirements={steel: 8})
+
+    assert db.manufacturing_orders.count_documents({}) == 0
+    assert db.work_orders.count_documents({}) == 0
+    assert db.stock_reservations.count_documents({}) == 0
+    assert drain(events) == []
+
+
+def test_mo_is_created_reserved_published_and_scheduled(db, events):
+    bom, steel = setup_bom(db, stock=10)
+
+    mo, work_orders, reservations, shortages = create_mo_with_work_orders(
+        bom, 2, START, START + timedelta(days=3), ObjectId(), requirements={steel: 8}
+    )
+
+    assert shortages == {}
+    assert [reservation.data['quantity'] for reservation in reservations] == [8]
+    assert db.inventory.find_one({'product_id': steel})['reserved_quantity'] == 8
+    assert db.manufacturing_orders.find_one({'_id': mo.data['_id']})['total_wo_count'] == 2
+    assert [event['type'] for event in drain(events)] == ['manufacturing_order', 'work_order', 'work_order']
+    turn, polish = (db.work_orders.find_one({'_id': wo.data['_id']}) for wo in work_orders)
+    assert turn['scheduled_end'] == polish['scheduled_start']
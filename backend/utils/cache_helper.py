@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from database import get_versions
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+MISSING = object()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class LRUCache:
+    """In-process cache with least-recently-used and TTL eviction"""
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Cache shared between processes, stored as JSON in Redis"""
+
+    def __init__(self, url, ttl_seconds=300, prefix='report-cache:'):
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        payload = self.client.get(self.prefix + key)
+        if payload is None:
+            return MISSING
+        return json.loads(payload)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=self.ttl_seconds)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def get_cache():
+    """Shared Redis cache when REPORT_CACHE_URL is set, else an in-process LRU"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if Config.REPORT_CACHE_URL and redis is not None:
+                    _cache = RedisCache(Config.REPORT_CACHE_URL, Config.REPORT_CACHE_TTL_SECONDS)
+                else:
+                    _cache = LRUCache(Config.REPORT_CACHE_MAX_ENTRIES, Config.REPORT_CACHE_TTL_SECONDS)
+    return _cache
+
+
+def cached(key, dependencies, compute):
+    """Return ``compute()`` for ``key``, reusing it until a dependency changes.
+
+    The current write version of every collection in ``dependencies`` is
+    folded into the key, so any write to them makes old entries unreachable
+    instead of requiring explicit invalidation.
+    """
+    versions = get_versions(dependencies)
+    versioned_key = json.dumps(
+        [key, sorted(versions.items())], sort_keys=True, separators=(',', ':'), default=str
+    )
+    cache = get_cache()
+    value = cache.get(versioned_key)
+    if value is MISSING:
+        value = compute()
+        cache.set(versioned_key, value)
+    return value
@@ -0,0 +1,195 @@
+import json
+import queue
+import threading
+import time
+from bson import ObjectId
+from pymongo.errors import PyMongoError, OperationFailure
+from database import mongo, supports_transactions
+
+# Collections pushed to clients, the event type each produces and the
+# fields an event carries
+EVENT_TYPES = {
+    'work_orders': 'work_order',
+    'manufacturing_orders': 'manufacturing_order',
+    'inventory': 'inventory'
+}
+EVENT_FIELDS = {
+    'work_order': ('mo_id', 'status', 'assigned_to', 'work_center', 'priority', 'updated_at'),
+    'manufacturing_order': ('status', 'completed_wo_count', 'total_wo_count', 'priority', 'deadline', 'updated_at'),
+    'inventory': ('item_name', 'product_id', 'stock_quantity', 'reserved_quantity', 'updated_at')
+}
+# Event types each role may receive; operators only see their own and
+# unassigned work orders (see ``visible``)
+ROLE_EVENTS = {
+    'Administrator': {'work_order', 'manufacturing_order', 'inventory'},
+    'Manufacturing Manager': {'work_order', 'manufacturing_order', 'inventory'},
+    'Inventory Manager': {'manufacturing_order', 'inventory'},
+    'Production Planner': {'manufacturing_order', 'inventory'},
+    'Operator': {'work_order'}
+}
+SUBSCRIBER_QUEUE_SIZE = 256
+WATCH_RETRY_SECONDS = 5
+
+
+def _plain(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def to_event(collection, document):
+    """Event for one changed document, carrying only the fields clients use"""
+    event_type = EVENT_TYPES[collection]
+    event = {'type': event_type, 'id': str(document['_id'])}
+    for field in EVENT_FIELDS[event_type]:
+        if field in document:
+            event[field] = _plain(document[field])
+    return event
+
+
+def visible(event, user):
+    """Whether ``user`` (the decoded token) may receive ``event``"""
+    if event['type'] not in ROLE_EVENTS.get(user.get('role'), ()):
+        return False
+    if user.get('role') == 'Operator':
+        return event.get('assigned_to') in (None, str(user.get('id')))
+    return True
+
+
+class Subscription:
+    """One connected client: a bounded queue of events it may see"""
+
+    def __init__(self, user):
+        self.user = user
+        self.events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event):
+        if not visible(event, self.user):
+            return
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # A stalled client must not hold up the bus; it reloads on reconnect
+            pass
+
+    def get(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process fan-out of document changes to connected clients.
+
+    On a replica set a background thread tails a MongoDB change stream on
+    the pushed collections, so every process sees every write whichever
+    process made it, and ``publish`` from the models is a no-op. Standalone
+    servers have no change streams; there the models' ``publish`` calls feed
+    the bus directly, which reaches the clients of this process only.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.streaming = False
+
+    def subscribe(self, user):
+        self._ensure_watcher()
+        subscription = Subscription(user)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    @property
+    def local_delivery(self):
+        """Whether writers must publish themselves: clients listen, no change stream runs"""
+        return not self.streaming and bool(self._subscriptions)
+
+    def publish(self, collection, document):
+        """Push a changed document unless the change stream already delivers it"""
+        if document and self.local_delivery:
+            self.dispatch(to_event(collection, document))
+
+    def _ensure_watcher(self):
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, name='event-bus-watch', daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        try:
+            if not supports_transactions():
+                return
+        except PyMongoError:
+            return
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': list(EVENT_TYPES)},
+            'operationType': {'$in': ['insert', 'update', 'replace']}
+        }}]
+        resume_token = None
+        while True:
+            try:
+                with mongo.db.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as stream:
+                    self.streaming = True
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        if change.get('fullDocument'):
+                            self.dispatch(to_event(change['ns']['coll'], change['fullDocument']))
+            except PyMongoError as e:
+                # Fall back to local publishing until the stream is back
+                self.streaming = False
+                if isinstance(e, OperationFailure):
+                    # e.g. the resume point fell off the oplog; start from now
+                    resume_token = None
+                time.sleep(WATCH_RETRY_SECONDS)
+
+
+bus = EventBus()
+
+
+def publish(collection, document):
+    """Report a changed document to connected clients (see ``EventBus``)"""
+    bus.publish(collection, document)
+
+
+def sse_stream(user, heartbeat_seconds=15, expires_at=None):
+    """Server-sent events for ``user`` until the client disconnects.
+
+    ``expires_at`` (epoch seconds, as in a JWT ``exp``) ends the stream once
+    the user's session is over; the client has to authenticate again to
+    reconnect. Each open stream occupies a worker thread for its whole life,
+    so serve the app with a threaded or async worker (see the README).
+    """
+    subscription = bus.subscribe(user)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            timeout = heartbeat_seconds
+            if expires_at is not None:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            event = subscription.get(timeout=timeout)
+            if event is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+    finally:
+        bus.unsubscribe(subscription)
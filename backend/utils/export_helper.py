@@ -0,0 +1,146 @@
+import itertools
+import tempfile
+from datetime import datetime
+import openpyxl
+from flask import Response
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+EXCEL_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+PDF_MIMETYPE = 'application/pdf'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# PDFs with more rows than this are not rendered on the request thread
+PDF_INLINE_ROW_LIMIT = 2000
+PDF_FONT = 'Helvetica'
+PDF_FONT_BOLD = 'Helvetica-Bold'
+PDF_FONT_SIZE = 9
+PDF_ROW_HEIGHT = 14
+PDF_MARGIN = 40
+
+
+class InlineLimitExceeded(Exception):
+    """A report too large to render inline; hand it to the report job queue"""
+
+
+def write_excel(rows, headers, sheet_title='Report'):
+    """Write rows into a write-only workbook backed by a temporary file.
+
+    Write-only worksheets serialize each row as it is appended, so memory
+    stays flat no matter how many rows ``rows`` yields.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def stream_file(file_obj, download_name, mimetype):
+    """Stream an open file to the client in chunks, closing it afterwards"""
+    def generate():
+        try:
+            while True:
+                chunk = file_obj.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            file_obj.close()
+
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
+
+
+def excel_response(rows, headers, download_name, sheet_title='Report'):
+    """Build an Excel export from a row iterator and stream it back"""
+    return stream_file(write_excel(rows, headers, sheet_title), download_name, EXCEL_MIMETYPE)
+
+
+def _fit_text(text, width, font, size):
+    """Truncate text with an ellipsis so it fits in ``width`` points"""
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '...', font, size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def write_pdf(rows, headers, title, output):
+    """Render rows as a paginated table into ``output``.
+
+    Rows are drawn as they are pulled from the iterator. When a page fills
+    up it is closed with ``showPage`` and the title bar and column headers
+    are repeated on the next one.
+    """
+    page_width, page_height = letter
+    usable_width = page_width - 2 * PDF_MARGIN
+    column_width = usable_width / max(len(headers), 1)
+    generated_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')
+
+    c = canvas.Canvas(output, pagesize=letter)
+    page_number = 0
+
+    def start_page():
+        nonlocal page_number
+        page_number += 1
+        y = page_height - PDF_MARGIN
+        c.setFont(PDF_FONT_BOLD, 12)
+        c.drawString(PDF_MARGIN, y, title)
+        c.setFont(PDF_FONT, 8)
+        c.drawRightString(page_width - PDF_MARGIN, y, f'Page {page_number}')
+        c.drawString(PDF_MARGIN, PDF_MARGIN / 2, f'Generated {generated_at}')
+        y -= PDF_ROW_HEIGHT * 2
+        c.setFont(PDF_FONT_BOLD, PDF_FONT_SIZE)
+        for index, header in enumerate(headers):
+            c.drawString(PDF_MARGIN + index * column_width, y,
+                         _fit_text(str(header), column_width - 4, PDF_FONT_BOLD, PDF_FONT_SIZE))
+        y -= 4
+        c.line(PDF_MARGIN, y, page_width - PDF_MARGIN, y)
+        c.setFont(PDF_FONT, PDF_FONT_SIZE)
+        return y - PDF_ROW_HEIGHT
+
+    y = start_page()
+    for row in rows:
+        if y < PDF_MARGIN:
+            c.showPage()
+            y = start_page()
+        for index, value in enumerate(row):
+            text = '' if value is None else str(value)
+            c.drawString(PDF_MARGIN + index * column_width, y,
+                         _fit_text(text, column_width - 4, PDF_FONT, PDF_FONT_SIZE))
+        y -= PDF_ROW_HEIGHT
+
+    c.save()
+
+
+def render_pdf(rows, headers, title):
+    """Render rows to a PDF temp file, drawing each row as it is pulled from
+    the iterator, so the rows are never held in memory together"""
+    output = tempfile.TemporaryFile()
+    write_pdf(rows, headers, title, output)
+    output.seek(0)
+    return output
+
+
+def pdf_response(rows, headers, title, download_name, max_rows=PDF_INLINE_ROW_LIMIT):
+    """Build a paginated PDF from a row iterator and stream it back.
+
+    Raises ``InlineLimitExceeded`` once the iterator yields more than
+    ``max_rows`` rows, without drawing anything, so the caller can queue the
+    report as a job instead of tying up the request worker.
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, max_rows + 1))
+    if len(head) > max_rows:
+        raise InlineLimitExceeded(f'More than {max_rows} rows')
+    return stream_file(render_pdf(head, headers, title), download_name, PDF_MIMETYPE)
@@ -12,6 +12,22 @@ def encode_jwt(user):
     }
     return jwt.encode(payload, Config.SECRET_KEY, algorithm='HS256')
 
+def encode_stream_token(payload):
+    """Short-lived token that only opens the event stream.
+
+    EventSource cannot send headers, so this token goes in the URL (and so
+    into access logs) instead of the session JWT. It carries the session's
+    expiry so the stream it opens ends with the session.
+    """
+    stream_payload = {
+        'id': payload.get('id'),
+        'role': payload.get('role'),
+        'scope': 'events',
+        'session_exp': payload.get('exp'),
+        'exp': datetime.utcnow() + timedelta(seconds=Config.STREAM_TOKEN_SECONDS)
+    }
+    return jwt.encode(stream_payload, Config.SECRET_KEY, algorithm='HS256')
+
 def decode_jwt(token):
     try:
         return jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
@@ -0,0 +1,118 @@
+import base64
+import json
+from bson import json_util
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that was not produced by ``encode_cursor``"""
+
+
+class Page(list):
+    """List of results that also carries the cursor for the next page"""
+
+    def __init__(self, items=None, next_cursor=None):
+        super().__init__(items or [])
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(sort_value, document_id):
+    """Encode the (sort value, _id) of the last row into an opaque token"""
+    raw = json_util.dumps({'v': sort_value, 'id': document_id})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into (sort value, _id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return data['v'], data['id']
+    except (ValueError, KeyError, TypeError, json.JSONDecodeError):
+        raise InvalidCursor('Invalid pagination cursor')
+
+
+def keyset_filter(filter_dict, sort_field, direction, cursor):
+    """Combine a query filter with the keyset condition for ``cursor``"""
+    filter_dict = dict(filter_dict or {})
+    if not cursor:
+        return filter_dict
+
+    value, last_id = decode_cursor(cursor)
+    op = '$lt' if direction < 0 else '$gt'
+
+    if sort_field == '_id':
+        condition = {'_id': {op: last_id}}
+    elif value is None and direction > 0:
+        # Nulls sort first ascending, so everything non-null comes after them
+        condition = {'$or': [
+            {sort_field: {'$ne': None}},
+            {sort_field: None, '_id': {op: last_id}}
+        ]}
+    else:
+        condition = {'$or': [
+            {sort_field: {op: value}},
+            {sort_field: value, '_id': {op: last_id}}
+        ]}
+
+    if not filter_dict:
+        return condition
+    return {'$and': [filter_dict, condition]}
+
+
+def paginate(collection, filter_dict=None, sort_field='created_at', direction=-1,
+             limit=None, cursor=None, projection=None, transform=None):
+    """Run a keyset-paginated find on ``collection``.
+
+    Results are ordered on (sort_field, _id) so the next page starts right
+    after the last row returned, whatever the depth. Returns a ``Page`` whose
+    ``next_cursor`` is None once the last page has been reached.
+    """
+    query = keyset_filter(filter_dict, sort_field, direction, cursor)
+    sort = [(sort_field, direction)]
+    if sort_field != '_id':
+        sort.append(('_id', direction))
+
+    mongo_cursor = collection.find(query, projection).sort(sort)
+    if limit:
+        mongo_cursor = mongo_cursor.limit(limit + 1)
+
+    documents = list(mongo_cursor)
+    next_cursor = None
+    if limit and len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last['_id'])
+
+    if transform:
+        documents = [transform(document) for document in documents]
+    return Page(documents, next_cursor)
+
+
+def cursor_headers(page):
+    """Response headers advertising the next page cursor for list endpoints"""
+    return {'X-Next-Cursor': page.next_cursor} if page.next_cursor else {}
+
+
+def get_page_args(default_limit=None):
+    """Read ``limit`` and ``cursor`` query parameters from the current request.
+
+    Without a ``limit`` parameter the page is unbounded unless the endpoint
+    passes a ``default_limit``, so callers that never follow ``next_cursor``
+    still get the whole list. A malformed cursor raises ``InvalidCursor``,
+    which the app turns into a 400.
+    """
+    limit = request.args.get('limit', default_limit)
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = default_limit or DEFAULT_PAGE_SIZE
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor') or None
+    if cursor:
+        decode_cursor(cursor)
+    return limit, cursor
@@ -700,8 +700,9 @@ async function loadUtilization(wcId) {
         });
         const utilization = await response.json();
         document.getElementById('utilizationData').innerHTML = `
-            <p>Utilization Rate: ${utilization.rate}%</p>
-            <p>Downtime Hours: ${utilization.downtime_hours}</p>
+            <p>Utilization Rate: ${utilization.rate}% (${utilization.start} to ${utilization.end})</p>
+            <p>Busy Hours: ${utilization.busy_hours}</p>
+            <p>Idle Hours: ${utilization.idle_hours}</p>
             <!-- Add more utilization metrics as needed -->
         `;
     } catch (error) {